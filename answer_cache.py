@@ -0,0 +1,209 @@
+import re
+import threading
+import time
+import math
+import unicodedata
+from collections import Counter, OrderedDict
+
+# Cosine of character 2/3-gram counts of the normalized questions: reworded repeats pass, while
+# near-identical wording that asks something else ("유아" / "소아" 요금) stays below it
+SIMILARITY_THRESHOLD = 0.9
+NGRAM_SIZES = (2, 3)
+MAX_ENTRIES = 1024
+TTL = 6 * 60 * 60
+
+# Trailing particles/endings that don't change what is being asked ("수하물은" == "수하물")
+_PARTICLES = sorted([
+    "입니까", "인가요", "나요", "까요", "세요", "해요", "에서는", "에서", "으로는", "으로", "로는", "에는", "에게",
+    "하고", "까지", "부터", "이랑", "랑", "은", "는", "이", "가", "을", "를", "에", "로", "도", "의", "와", "과", "요",
+], key=len, reverse=True)
+_PUNCT_RE = re.compile(r"[^\w\s]", re.UNICODE)
+# Numbers and Latin tokens (weights, ages, codes) must be identical for two questions to match
+_ENTITY_RE = re.compile(r"\d+|[a-z]+")
+
+# Anything that points at a specific booking/flight/date needs tools or personal data, and
+# follow-ups ("그럼 국제선은요?") depend on earlier turns; neither may be answered from the cache
+_CONTEXT_RE = re.compile(
+    r"\d{3,}"                       # dates, flight numbers, phone numbers
+    r"|\b[A-Z0-9]{6}\b"             # PNR
+    r"|\b[A-Z]{3}\b"                # IATA airport codes
+    r"|@"                           # e-mail
+    r"|\b(?:LJ|lj)\s?\d+"
+    r"|오늘|내일|모레|어제|이번\s?주|다음\s?주|운항|스케줄|예약\s?(?:번호|조회|확인)|확인서|제\s?(?:예약|항공편|비행기)"
+    r"|그럼|그러면|그건|그거|그것|이거|저거|방금|위에|아까"
+)
+# First-person references and recall ("내 이메일", "제 이름이 뭐라고 했죠?") are answered from this
+# session's history; serving them to another session would leak it
+_PERSONAL_RE = re.compile(
+    r"(?<![가-힣\w])(?:내|제|저|나|내가|제가|나는|저는|나를|저를|나도|저도|나의|저의|나한테|저한테|저희|우리)(?![가-힣\w])"
+    r"|기억|말했|말씀드린|알려\s?드렸|했었|했죠|했지|뭐였|뭐라고"
+)
+# Personal data in an answer: e-mail, phone, passport and PNR-like codes, passenger names
+_PERSONAL_DATA_RE = re.compile(
+    r"[\w.+-]+@[\w-]+\.[\w.-]+"
+    r"|\d{2,4}[-\s]?\d{3,4}[-\s]?\d{4}"
+    r"|\b[A-Z]{1,2}\d{7,8}\b"
+    r"|\b[A-Z0-9]{6}\b"
+    r"|\b[A-Z]{2,}\s?/\s?[A-Z]{2,}\b"
+    r"|(?<![가-힣])(?!고객|승객|탑승객|손님|회원|여러분|보호자|여행객|부모|어르신|선생|승무원|기장)[가-힣]{2,4}\s?님"
+)
+MIN_QUESTION_CHARS = 4
+
+
+def normalize_question(text):
+    """Lowercase, strip punctuation and trailing particles per word, then drop spacing."""
+    text = _PUNCT_RE.sub(" ", unicodedata.normalize("NFC", str(text)).lower())
+    words = []
+    for word in text.split():
+        # Up to two stacked endings ("요금은요" -> "요금")
+        for _ in range(2):
+            particle = next((p for p in _PARTICLES if len(word) > len(p) + 1 and word.endswith(p)), None)
+            if particle is None:
+                break
+            word = word[:-len(particle)]
+        words.append(word)
+    return "".join(words)
+
+
+def features(normalized):
+    """(n-gram counts, their norm, entity tokens) of a normalized question."""
+    grams = Counter(normalized[i:i + n] for n in NGRAM_SIZES for i in range(len(normalized) - n + 1))
+    return grams, math.sqrt(sum(count * count for count in grams.values())), frozenset(_ENTITY_RE.findall(normalized))
+
+
+def similarity(a, b):
+    """Cosine similarity of two features(); 0.0 when their entity tokens differ."""
+    (a_grams, a_norm, a_entities), (b_grams, b_norm, b_entities) = a, b
+    if a_entities != b_entities or not a_norm or not b_norm:
+        return 0.0
+    if len(a_grams) > len(b_grams):
+        a_grams, b_grams = b_grams, a_grams
+    return sum(count * b_grams[gram] for gram, count in a_grams.items() if gram in b_grams) / (a_norm * b_norm)
+
+
+def is_cacheable_question(text):
+    """
+    Standalone FAQ-style question: no slots (dates, flight numbers, PNR, codes, e-mail), no follow-up
+    or first-person reference, mostly Korean.
+    """
+    if _CONTEXT_RE.search(str(text)) or _PERSONAL_RE.search(str(text)) or \
+            len(normalize_question(text)) < MIN_QUESTION_CHARS:
+        return False
+    letters = [ch for ch in str(text) if ch.isalpha()]
+    hangul = sum(1 for ch in letters if "가" <= ch <= "힣")
+    return bool(letters) and hangul / len(letters) >= 0.5
+
+
+def contains_personal_data(answer):
+    """True when an answer carries an e-mail, phone/passport number, PNR-like code or a passenger's name."""
+    return bool(_PERSONAL_DATA_RE.search(str(answer)))
+
+
+class AnswerCache:
+    """
+    Answers repeated FAQ questions without a model call.
+    Questions are compared after normalization (case, punctuation, spacing and trailing particles
+    ignored): identical text matches directly, a rewording needs `threshold` similarity and the same
+    numbers/Latin tokens (similarity()).
+    Learned entries (question -> model answer) are LRU/TTL-evicted; FAQ rows are matched via `faq_lookup`.
+    """
+
+    def __init__(self, faq_lookup=None, threshold=SIMILARITY_THRESHOLD, max_entries=MAX_ENTRIES, ttl=TTL):
+        self.faq_lookup = faq_lookup
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()    # normalized question -> (features, answer, expires_at, model_ms)
+        self.lock = threading.Lock()
+        self.metrics = {"hits": 0, "faq_hits": 0, "misses": 0, "skipped": 0, "stores": 0, "refused": 0,
+                        "evictions": 0, "invalidations": 0, "latency_saved_ms": 0.0}
+        self._model_ms_total = 0.0
+        self._model_ms_count = 0
+
+    def lookup(self, question):
+        """Returns a cached answer or None. Only standalone FAQ-style questions are served."""
+        start = time.perf_counter()
+        if not is_cacheable_question(question):
+            with self.lock:
+                self.metrics["skipped"] += 1
+            return None
+        normalized = normalize_question(question)
+        question_features = features(normalized)
+        now = time.monotonic()
+
+        with self.lock:
+            answer, model_ms = self._lookup_learned(normalized, question_features, now)
+        if answer is None and self.faq_lookup is not None:
+            answer, model_ms = self._lookup_faq(question, question_features), None
+
+        with self.lock:
+            if answer is None:
+                self.metrics["misses"] += 1
+                return None
+            self.metrics["hits"] += 1
+            if model_ms is None:
+                self.metrics["faq_hits"] += 1
+                model_ms = self._model_ms_total / self._model_ms_count if self._model_ms_count else 0.0
+            self.metrics["latency_saved_ms"] += max(0.0, model_ms - (time.perf_counter() - start) * 1000)
+        return answer
+
+    def _lookup_learned(self, normalized, question_features, now):
+        entry = self.entries.get(normalized)
+        if entry is not None and entry[2] > now:
+            self.entries.move_to_end(normalized)
+            return entry[1], entry[3] or 0.0
+        best_key, best_score = None, self.threshold
+        for key, (entry_features, _, expires_at, _) in self.entries.items():
+            if expires_at <= now:
+                continue
+            score = similarity(question_features, entry_features)
+            if score >= best_score:
+                best_key, best_score = key, score
+        if best_key is None:
+            return None, None
+        self.entries.move_to_end(best_key)
+        _, answer, _, model_ms = self.entries[best_key]
+        return answer, model_ms or 0.0
+
+    def _lookup_faq(self, question, question_features):
+        for row in self.faq_lookup(question):
+            if similarity(question_features, features(normalize_question(row["question"]))) >= self.threshold:
+                return str(row["answer"])
+        return None
+
+    def store(self, question, answer, model_ms=None):
+        """
+        Remembers a model answer for a standalone FAQ-style question. The caller only offers answers
+        produced without conversation history; answers carrying personal data are refused anyway.
+        """
+        if not answer or not is_cacheable_question(question):
+            return False
+        if contains_personal_data(answer):
+            with self.lock:
+                self.metrics["refused"] += 1
+            return False
+        normalized = normalize_question(question)
+        with self.lock:
+            if model_ms:
+                self._model_ms_total += model_ms
+                self._model_ms_count += 1
+            self.entries[normalized] = (features(normalized), answer, time.monotonic() + self.ttl, model_ms)
+            self.entries.move_to_end(normalized)
+            self.metrics["stores"] += 1
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.metrics["evictions"] += 1
+        return True
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.metrics["invalidations"] += 1
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.metrics)
+            stats["entries"] = len(self.entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
@@ -1,9 +1,13 @@
 import streamlit as st
-import google.generativeai as genai
-import requests
+import chat_client
+import chat_history
+import chat_engine
+import conversation_memory
+import health
+import http_client
+import pnr_cache
+import rate_limiter
 import utils
-from google.api_core.exceptions import ResourceExhausted
-import datetime
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -13,80 +17,33 @@ st.set_page_config(
 )
 
 # --- Helper Functions ---
-@st.cache_data(show_spinner=False)
-def load_faq():
-    """FAQ 데이터를 캐싱하여 로드합니다."""
-    return utils.get_faq_as_text()
-
-def get_flight_schedule(departure: str, arrival: str, date: str):
-    """
-    실시간 항공 스케줄을 조회하는 함수입니다.
-    
-    Args:
-        departure: 출발 공항 코드 (예: GMP)
-        arrival: 도착 공항 코드 (예: CJU)
-        date: 날짜 (형식: YYYYMMDD, 예: 20250618)
-    """
-    base_url = utils.FLIGHT_API_BASE_URL
-    url = f"{base_url}/API/Flight"
-    params = {
-        'departure': departure,
-        'arrival': arrival,
-        'date': date,
-        'lang': 'ko'
-    }
-    try:
-        response = requests.get(url, params=params)
-        return response.json()
-    except Exception as e:
-        return {"error": str(e)}
-
-def send_operation_confirmation(flight_date: str, flight_number: str, email: str):
-    """
-    운항정보확인서를 이메일로 발송하는 함수입니다.
-    
-    Args:
-        flight_date: 날짜 (형식: YYYYMMDD, 예: 20240703)
-        flight_number: 편명 (예: LJ507)
-        email: 수신 이메일 주소
-    """
-    return utils.send_operation_confirmation_api(flight_date, flight_number, email)
-
-def get_pnr_detail(pnr: str, first_name: str, last_name: str, departure_date: str):
-    """
-    예약 번호, 탑승객 성, 이름, 출발일을 사용하여 예약 상세 내역을 조회하는 함수입니다.
-    
-    Args:
-        pnr: 예약 번호 (예: X3AJUP)
-        first_name: 탑승객 이름 (예: GILDONG)
-        last_name: 탑승객 성 (예: HONG)
-        departure_date: 출발일 (형식: YYYYMMDD, 예: 20240206)
-    """
-    return utils.get_pnr_detail_api(pnr, first_name, last_name, departure_date)
-
-def get_flight_operation_info(date: str, departure: str, arrival: str):
-    """
-    운항 정보를 조회하는 함수입니다.
-    
-    Args:
-        date: 날짜 (형식: YYYYMMDD, 예: 20240206)
-        departure: 출발 공항 코드 (예: ICN)
-        arrival: 도착 공항 코드 (예: NRT)
-    """
-
-    return utils.get_flight_operation_info_api(date, departure, arrival)
-
-def get_flight_operation_detail(date: str, flight_no: str, departure: str, arrival: str):
-    """
-    운항 정보 상세 조회 (편명 검색) 함수입니다.
-    
-    Args:
-        date: 날짜 (형식: YYYYMMDD, 예: 20240206)
-        flight_no: 편명 (예: LJ201)
-        departure: 출발 공항 코드 (예: ICN)
-        arrival: 도착 공항 코드 (예: BKK)
-    """
-    return utils.get_flight_operation_info_detail_api(date, flight_no, departure, arrival)
+@st.cache_resource(show_spinner=False)
+def start_email_queue():
+    """운항정보확인서 발송 작업자를 시작합니다 (재시작 전에 남은 작업도 이어서 발송)."""
+    return utils.get_email_queue()
+
+@st.cache_resource(show_spinner=False)
+def start_background_prefetch():
+    """주요 노선의 오늘/내일 운항 정보를 백그라운드에서 미리 갱신합니다 (프로세스당 1회)."""
+    return utils.start_flight_prefetch()
+
+@st.cache_resource(show_spinner=False)
+def start_history_reaper():
+    """오래 사용하지 않은 대화의 메모리를 회수하고 만료된 대화 기록을 정리합니다 (프로세스당 1회)."""
+    return utils.get_history_store().start()
+
+@st.cache_resource(show_spinner=False)
+def start_health_prober():
+    """연동 API(스케줄/운항정보/예약조회/확인서 발송) 상태를 백그라운드에서 주기적으로 점검합니다."""
+    return utils.start_health_prober()
+
+# With CHAT_API_URL the chat_server.py workers keep their own flight caches warm
+if utils.PREFETCH_ENABLED and not utils.CHAT_API_URL:
+    start_background_prefetch()
+start_email_queue()
+start_history_reaper()
+if utils.HEALTH_PROBE_ENABLED:
+    start_health_prober()
 
 
 # --- Sidebar: Configuration ---
@@ -102,6 +59,16 @@ with st.sidebar:
     st.markdown("---")
     st.markdown("👈 관리자 페이지에서 FAQ를 수정할 수 있습니다.")
 
+    upstream_health = utils.get_upstream_health()
+    if upstream_health:
+        with st.expander("🩺 연동 API 상태"):
+            icons = {"up": "🟢", "degraded": "🟡", "down": "🔴", "unknown": "⚪"}
+            for name, status in upstream_health.items():
+                latency = status.get("latency_ms", {})
+                st.markdown(f"{icons.get(status['state'], '⚪')} **{health.LABELS.get(name, name)}** "
+                            f"p50 {latency.get('p50') or '-'} ms / p95 {latency.get('p95') or '-'} ms, "
+                            f"오류율 {status.get('error_rate', 0):.0%}")
+
 # --- Main Interface ---
 st.title("진에어 AI 고객센터 ✈️")
 
@@ -128,113 +95,96 @@ if st.session_state.get("show_op_form", False):
             submitted = st.form_submit_button("발송하기")
             if submitted:
                 if f_date and f_num and f_email:
-                    with st.spinner("발송 중..."):
-                        result = utils.send_operation_confirmation_api(f_date, f_num, f_email)
-                        # Check if "error" key exists AND is not None/Empty string
-                        if result and result.get("error"):
-                            st.error(f"발송 실패: {result['error']}")
-                        else:
-                            st.success("운항정보 확인서가 이메일로 발송되었습니다!")
-                            st.session_state.messages.append({"role": "assistant", "content": f"운항정보 확인서를 {f_email}로 발송했습니다. (편명: {f_num}, 날짜: {f_date})"})
-                            st.session_state.show_op_form = False
-                            st.rerun()
+                    # Queued and sent in the background; a repeated submit returns the same job
+                    result = utils.enqueue_operation_confirmation(f_date, f_num, f_email)
+                    # Check if "error" key exists AND is not None/Empty string
+                    if result and result.get("error"):
+                        st.error(f"발송 실패: {result['error']}")
+                    else:
+                        st.success(f"운항정보 확인서 발송이 접수되었습니다! (접수번호: {result['job_id']})")
+                        notice = "이미 접수된 요청입니다. " if result["duplicate"] else ""
+                        st.session_state.messages.append({"role": "assistant", "content": f"{notice}운항정보 확인서를 {result['email']}로 발송 접수했습니다. (편명: {result['flight_number']}, 날짜: {result['flight_date']}, 접수번호: {result['job_id']}) 발송 상태는 접수번호로 물어보시면 확인해 드립니다."})
+                        st.session_state.show_op_form = False
+                        st.rerun()
                 else:
                     st.warning("모든 정보를 입력해주세요.")
 
 
 
 
-# Initialize chat history
+# Initialize chat history (recent messages in memory, older ones spilled to disk)
 if "messages" not in st.session_state:
-    st.session_state.messages = []
+    st.session_state.messages = utils.new_chat_history()
+    st.session_state.visible_messages = chat_history.PAGE_SIZE
 
-# Display chat messages from history on app rerun
-for message in st.session_state.messages:
+def load_earlier_messages():
+    st.session_state.visible_messages += chat_history.PAGE_SIZE
+
+# Display only the latest messages on rerun; earlier ones are loaded a page at a time
+first_visible, visible_messages = st.session_state.messages.page(st.session_state.visible_messages)
+if first_visible > 0:
+    st.button(f"⬆️ 이전 대화 더 보기 ({first_visible}개)", on_click=load_earlier_messages)
+for message in visible_messages:
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
 
 # --- Chat Logic ---
 if api_key:
-    # 1. Configure GenAI
-    genai.configure(api_key=api_key)
-    
-    # 2. Update System Instruction with FAQ from CSV (Cached) and Bot Rules
-    faq_content = load_faq()
-    rules_content = utils.load_bot_rules()
-    
-    now = datetime.datetime.now()
-    current_time_str = now.strftime("%Y년 %m월 %d일 %H시 %M분 %S초")
-    
-    system_instruction = f"""Role: JinAir Agent. Lang: Korean.
-    Instruction: 기본적으로 한국어로 답변하세요. 단, 사용자가 다른 언어로 질문하면 그 언어에 맞춰 답변하세요.
-    현재 (Current Time): {current_time_str}
-Rules: {rules_content}
-FAQ:
-{faq_content}
-
-    Instr:
-    1. Source: FAQ only. Else "죄송합니다. 제공된 정보에는 해당 내용이 없습니다." (translated).
-    2. Flight Query: Use `get_flight_schedule`. Format: "N flights. Fastest: [F] [T]. List: ..." (translated)
-    3. Operation Confirmation: Ask for Date (YYYYMMDD), Flight Num, and Email. Use `send_operation_confirmation`.
-    4. PNR Lookup: Ask for 6-char PNR, First Name, Last Name, and Departure Date (YYYYMMDD). Use `get_pnr_detail`. Summarize: Flight, Date, Passengers.
-    5. Flight Operation Info (Route): Ask for Date (YYYYMMDD), Departure (Code), Arrival (Code). Use `get_flight_operation_info`. Report: Flight No, Times (Schedule/Actual), Status.
-    6. Flight Operation Detail (Flight No): Ask for Date (YYYYMMDD), Flight No (e.g., LJ201), Departure (Code), Arrival (Code). Use `get_flight_operation_detail`. 
-       - Response Format: "[FlightNo]편은 [DepartureScheduleTime]에 출발하여([DepartureDisplayTitle]), [ArrivalActualTime]에 도착했습니다([ArrivalDisplayTitle]). 현재 상태는 [Status]입니다."
-       - Translate titles/status to Korean naturally.
-    7. Be concise. Link URLs.
-    8. Date Conversion: If the user provides relative dates like "오늘", "내일", "어제", "모레" or days of the week, automatically calculate the target date based on the "Current Time" above and convert it to YYYYMMDD format before calling any tools.
-"""
-
-    # 3. Create Model
-    model = genai.GenerativeModel(
-        'gemini-2.5-flash',
-        system_instruction=system_instruction,
-        tools=[get_flight_schedule, send_operation_confirmation, get_pnr_detail, get_flight_operation_info, get_flight_operation_detail]
-    )
-
-    # 4. Handle User Input
+    # 1. Handle User Input
     if prompt := st.chat_input("궁금한 점을 물어보세요!"):
         # Display user message in chat message container
         with st.chat_message("user"):
             st.markdown(prompt)
-        # Add user message to chat history
-        st.session_state.messages.append({"role": "user", "content": prompt})
-
-        # Generate response
         with st.chat_message("assistant"):
-            with st.spinner("답변 생성 중..."):
-                try:
-                    # Reconstruct history for API (Limited to save tokens)
-                    history_for_api = []
-                    # Current message is already in session_state, exclude it for history
-                    past_messages = st.session_state.messages[:-1]
-                    # Limit to last 6 messages (3 turns) - Extreme Optimization
-                    if len(past_messages) > 6:
-                        past_messages = past_messages[-6:]
-                    
-                    for msg in past_messages:
-                        role = "user" if msg["role"] == "user" else "model"
-                        history_for_api.append({"role": role, "parts": [msg["content"]]})
-                    
-                    chat = model.start_chat(history=history_for_api, enable_automatic_function_calling=True)
-                    response = chat.send_message(prompt)
-                    
-                    # Log Usage
-                    if response.usage_metadata:
-                        utils.log_usage(
-                            model_name='gemini-2.5-flash',
-                            prompt_tokens=response.usage_metadata.prompt_token_count,
-                            candidate_tokens=response.usage_metadata.candidates_token_count
-                        )
-                    
-                    st.markdown(response.text)
-                    st.session_state.messages.append({"role": "assistant", "content": response.text})
-                
-                except ResourceExhausted:
-                    error_msg = "⚠️ API 사용량이 초과되었습니다 (Quota Exceeded). 잠시 후 다시 시도해주세요."
-                    st.error(error_msg)
-                
-                except Exception as e:
+            wait_notice = st.empty()
+            def show_wait(seconds, position):
+                wait_notice.info(f"⏳ 요청이 많아 잠시 대기 중입니다. (예상 대기 약 {max(1, round(seconds))}초, 대기 순서 {position + 1})")
+            try:
+                if utils.CHAT_API_URL:
+                    # Thin client: the turn runs in a chat_server.py worker, this process only renders it
+                    client = chat_client.ChatClient(utils.CHAT_API_URL, api_key)
+                    if "chat_session_id" not in st.session_state:
+                        st.session_state.chat_session_id = client.create_session()
+                    st.session_state.messages.append({"role": "user", "content": prompt})
+                    chunks = client.stream_turn(st.session_state.chat_session_id, prompt, on_wait=show_wait)
+                else:
+                    # Same pipeline in this process: cache/router answers, per-turn context, rate-limited model
+                    # turn with tools; it adds the user message and the answer to the history itself
+                    session = {"messages": st.session_state.messages,
+                               "memory": st.session_state.setdefault("memory", conversation_memory.new_memory()),
+                               "pnr_cache": st.session_state.setdefault("pnr_cache", pnr_cache.PnrCache())}
+                    chunks = chat_engine.stream_turn(session, prompt, api_key=api_key, limiter=utils.get_rate_limiter(),
+                                                     stream=utils.STREAM_RESPONSES, on_wait=show_wait)
+                if utils.STREAM_RESPONSES:
+                    response_text = st.write_stream(chunks)
+                else:
+                    with st.spinner("답변 생성 중..."):
+                        response_text = "".join(chunks)
+                    st.markdown(response_text)
+                wait_notice.empty()
+                if utils.CHAT_API_URL:
+                    st.session_state.messages.append({"role": "assistant", "content": response_text})
+
+            except rate_limiter.RateLimited as e:
+                wait_notice.empty()
+                st.error(f"⚠️ {e} 잠시 후 다시 시도해주세요.")
+
+            except http_client.CircuitOpenError:
+                # The chat server stopped answering: no request is sent until the breaker's cooldown ends
+                wait_notice.empty()
+                st.error("⚠️ 채팅 서버에 일시적으로 연결할 수 없습니다. 잠시 후 다시 시도해주세요.")
+
+            except chat_client.ChatAPIError as e:
+                wait_notice.empty()
+                if e.status == 404:
+                    # Session expired on the server: the next question starts a new one
+                    st.session_state.pop("chat_session_id", None)
+                st.error(str(e))
+
+            except Exception as e:
+                if chat_engine.is_quota_error(e):
+                    st.error("⚠️ API 사용량이 초과되었습니다 (Quota Exceeded). 잠시 후 다시 시도해주세요.")
+                else:
                     st.error(f"오류가 발생했습니다: {e}")
 else:
     st.info("👈 왼쪽 사이드바에 API Key를 입력하고 대화를 시작하세요.")
\ No newline at end of file
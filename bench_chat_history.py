@@ -0,0 +1,111 @@
+"""
+Streamlit rerun cost and memory of chat histories at 10 / 100 / 1000 messages per session across
+many sessions: plain in-memory lists rendered in full (the previous app) against chat_history
+(latest WINDOW messages in memory, older ones in SQLite, latest PAGE_SIZE rendered).
+
+    python bench_chat_history.py --sessions 200
+
+Each configuration runs in a fresh process so RSS is comparable. A rerun is measured as what the
+app does with the history on every rerun: pick the messages to show and serialize one markdown
+element per message (the st.markdown delta), without Streamlit itself.
+"""
+import chat_history
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SIZES = [10, 100, 1000]
+USER_TEXT = "{i}번째 질문입니다. 2월 6일 김포에서 제주 가는 항공편 운항 정보 알려주세요."
+ASSISTANT_TEXT = ("{i}번째 답변입니다. 문의하신 항공편은 정상 운항 예정이며 출발 40분 전까지 탑승구에 도착해 주세요. "
+                  "수하물은 1인당 15kg까지 무료이며 초과 시 추가 요금이 부과됩니다. ") * 3
+RERUNS = 50
+
+
+def rss_mb():
+    """Current resident set size (Linux /proc), else the peak."""
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20, 1)
+    except OSError:
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def message(i):
+    if i % 2 == 0:
+        return {"role": "user", "content": USER_TEXT.format(i=i)}
+    return {"role": "assistant", "content": ASSISTANT_TEXT.format(i=i)}
+
+
+def render(messages):
+    return sum(len(json.dumps({"markdown": {"body": m["content"]}, "chat_message": m["role"]}, ensure_ascii=False))
+               for m in messages)
+
+
+def run_child(mode, size, sessions):
+    result = {"mode": mode, "messages": size, "sessions": sessions, "rss_start_mb": rss_mb()}
+    with tempfile.TemporaryDirectory() as tmp:
+        store = chat_history.HistoryStore(os.path.join(tmp, "chat_history.db"))
+        histories = []
+        start = time.perf_counter()
+        for _ in range(sessions):
+            history = [] if mode == "list" else chat_history.ChatHistory(store)
+            for i in range(size):
+                history.append(message(i))
+            histories.append(history)
+        result["build_ms_per_message"] = round((time.perf_counter() - start) * 1000 / (sessions * size), 4)
+        result["rss_mb"] = rss_mb()
+
+        samples = []
+        for history in histories[:RERUNS]:
+            start = time.perf_counter()
+            if mode == "list":
+                render(history)
+            else:
+                render(history.page(chat_history.PAGE_SIZE)[1])
+            samples.append((time.perf_counter() - start) * 1000)
+        result["rerun_ms"] = round(statistics.median(samples), 3)
+
+        if mode != "list":
+            history = histories[0]
+            start = time.perf_counter()
+            # One page beyond the in-memory window comes from disk
+            history.page(chat_history.WINDOW + chat_history.PAGE_SIZE)
+            result["load_earlier_ms"] = round((time.perf_counter() - start) * 1000, 3)
+            result["same_messages"] = history[:] == [message(i) for i in range(size)]
+            result["in_memory_messages"] = store.get_stats()["messages_in_memory"]
+            # Every session idle: the reaper writes out and drops their windows
+            start = time.perf_counter()
+            store.reclaim_idle(idle_seconds=0)
+            result["reclaim_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            result["rss_after_reclaim_mb"] = rss_mb()
+            result["in_memory_after_reclaim"] = store.get_stats()["messages_in_memory"]
+            start = time.perf_counter()
+            render(histories[1].page(chat_history.PAGE_SIZE)[1])
+            result["rerun_after_reclaim_ms"] = round((time.perf_counter() - start) * 1000, 3)
+            result["db_mb"] = round(os.path.getsize(os.path.join(tmp, "chat_history.db")) / 2 ** 20, 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--child", nargs=3, metavar=("MODE", "SIZE", "SESSIONS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(run_child(args.child[0], int(args.child[1]), int(args.child[2])), ensure_ascii=False))
+        return
+    for size in SIZES:
+        for mode in ("list", "windowed"):
+            output = subprocess.run([sys.executable, __file__, "--child", mode, str(size), str(args.sessions)],
+                                    capture_output=True, text=True, check=True).stdout
+            print(output.strip())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Chat turns per second and per CPU core: the in-process path (what each Streamlit session runs:
+chat_engine turns on the script thread, all sessions sharing one interpreter) against
+chat_server.py with 1..N workers. Both drive the same fake Gemini model and an upstream stub
+running in its own process, with bench_load's turn mix.
+
+    python bench_chat_server.py --sessions 50 --turns 6 --workers 1,2,4
+
+turns_per_cpu_s is turns divided by the CPU seconds of the process(es) running the pipeline
+(the bench process for "inprocess", the server processes for "server"); Streamlit's own
+rerun/render cost is not included in "inprocess".
+"""
+import bench_load
+import chat_client
+import chat_engine
+import fakes
+import flight_cache
+import http_client
+import utils
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+STUB_SCRIPT = ("import fakes, sys; stub = fakes.StubUpstream(latency=float(sys.argv[1])).start(); "
+               "print(stub.url, flush=True); sys.stdin.read()")
+
+
+def make_scripts(sessions, turns, seed):
+    rng = random.Random(seed)
+    kinds, weights = list(bench_load.TURN_MIX), list(bench_load.TURN_MIX.values())
+    faq_questions = bench_load.load_faq_questions()
+    return [[bench_load.make_prompt(kind, rng, faq_questions) for kind in rng.choices(kinds, weights, k=turns)]
+            for _ in range(sessions)]
+
+
+def children_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run_sessions(scripts, run_session):
+    """Runs every script on its own thread; returns (wall seconds, [turn results])."""
+    results, lock = [], threading.Lock()
+
+    def session(script):
+        for turn in run_session(script):
+            with lock:
+                results.append(turn)
+
+    threads = [threading.Thread(target=session, args=(script,)) for script in scripts]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, results
+
+
+def report(mode, workers, wall, cpu, results):
+    ok = [r for r in results if r["error"] is None]
+    return {
+        "mode": mode, "workers": workers, "turns": len(results), "errors": len(results) - len(ok),
+        "wall_s": round(wall, 2), "turns_per_s": round(len(ok) / wall, 2),
+        "cpu_s": round(cpu, 2), "cores_used": round(cpu / wall, 2),
+        "turns_per_cpu_s": round(len(ok) / cpu, 1) if cpu else None,
+        "latency_ms": bench_load.percentiles([r["latency_ms"] for r in ok]),
+        "ttfb_ms": bench_load.percentiles([r["ttfb_ms"] for r in ok]),
+    }
+
+
+def run_inprocess(scripts, upstream, tmp, model_ttft, chunk_delay):
+    utils.FLIGHT_API_BASE_URL = upstream
+    utils.FLIGHT_OPERATION_INFO_API_URL = upstream + fakes.FLIGHT_OPERATION_INFO_PATH
+    utils.PNR_DETAIL_API_URL = upstream + fakes.PNR_DETAIL_PATH
+    utils.OPERATION_CONFIRMATION_API_URL = upstream + fakes.OPERATION_CONFIRMATION_PATH
+    utils.USAGE_DB_FILE = os.path.join(tmp, "usage_log.db")
+    utils.USAGE_LOG_FILE = os.path.join(tmp, "usage_log.csv")
+    http_client.reset()
+    flight_cache.flight_operation_cache.clear()
+    utils.get_answer_cache().clear()
+    _, system_instruction = utils.get_system_prefix()
+    model = fakes.FakeGenerativeModel(system_instruction=system_instruction, tools=chat_engine.TOOLS, ttft=model_ttft,
+                                      chunk_delay=chunk_delay, tool_calls=fakes.realistic_tool_calls)
+
+    def run_session(script):
+        state = chat_engine.new_session()
+        for prompt in script:
+            start = time.perf_counter()
+            try:
+                turn = chat_engine.run_turn(state, prompt, model)
+                yield {"error": None, "latency_ms": turn["latency_ms"], "ttfb_ms": turn["ttfb_ms"]}
+            except Exception as e:
+                yield {"error": type(e).__name__, "latency_ms": (time.perf_counter() - start) * 1000}
+
+    cpu_before = time.process_time()
+    wall, results = run_sessions(scripts, run_session)
+    return report("inprocess", 1, wall, time.process_time() - cpu_before, results)
+
+
+def run_server(scripts, upstream, tmp, workers, model_ttft, chunk_delay):
+    data_dir = tempfile.mkdtemp(dir=tmp)
+    cpu_before = children_cpu()
+    server = subprocess.Popen([sys.executable, "chat_server.py", "--port", "0", "--workers", str(workers),
+                               "--fake-model", "--model-ttft", str(model_ttft), "--chunk-delay", str(chunk_delay),
+                               "--upstream", upstream, "--data-dir", data_dir],
+                              stdout=subprocess.PIPE, text=True)
+    try:
+        url = json.loads(server.stdout.readline())["listening"]
+        client = chat_client.ChatClient(url)
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                http_client.get("health_check", url + "/healthz")
+                break
+            except Exception:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.1)
+
+        def run_session(script):
+            session_id = client.create_session()
+            for prompt in script:
+                start = time.perf_counter()
+                ttfb = None
+                try:
+                    for _ in client.stream_turn(session_id, prompt):
+                        if ttfb is None:
+                            ttfb = (time.perf_counter() - start) * 1000
+                    yield {"error": None, "latency_ms": (time.perf_counter() - start) * 1000, "ttfb_ms": ttfb}
+                except Exception as e:
+                    yield {"error": type(e).__name__, "latency_ms": (time.perf_counter() - start) * 1000}
+
+        wall, results = run_sessions(scripts, run_session)
+    finally:
+        server.terminate()
+        server.wait()
+    # The server's CPU (and its workers', reaped by it) is credited to us once it has exited
+    return report("server", workers, wall, children_cpu() - cpu_before, results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=6, help="turns per session")
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated server worker counts")
+    parser.add_argument("--model-ttft", type=float, default=0.3)
+    parser.add_argument("--chunk-delay", type=float, default=0.02)
+    parser.add_argument("--upstream-latency", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    scripts = make_scripts(args.sessions, args.turns, args.seed)
+    stub = subprocess.Popen([sys.executable, "-c", STUB_SCRIPT, str(args.upstream_latency)],
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    try:
+        upstream = stub.stdout.readline().strip()
+        with tempfile.TemporaryDirectory() as tmp:
+            results = [run_inprocess(scripts, upstream, tmp, args.model_ttft, args.chunk_delay)]
+            for workers in (int(n) for n in args.workers.split(",")):
+                results.append(run_server(scripts, upstream, tmp, workers, args.model_ttft, args.chunk_delay))
+    finally:
+        stub.stdin.close()
+        stub.wait()
+    for result in results:
+        print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import conversation_memory
+import utils
+import json
+import random
+import statistics
+
+TURNS = 24
+# Slots the user gives once at the start and that the closing question depends on
+DIALOGUE_SLOTS = [
+    ("ABC123", "HONG", "GILDONG", "20240703", "LJ201", "ICN", "BKK", "hong@example.com"),
+    ("XYZ789", "KIM", "MINSU", "20240815", "LJ73", "GMP", "CJU", "minsu@example.com"),
+    ("Q1W2E3", "LEE", "JIHYE", "20241102", "LJ007", "PUS", "NRT", "jihye@example.com"),
+]
+SMALL_TALK = [
+    "수하물 규정이 어떻게 되나요?", "기내식은 유료인가요?", "좌석 지정은 언제부터 가능해요?",
+    "반려동물 동반 탑승 되나요?", "환불 수수료가 궁금해요", "온라인 체크인은 몇 시간 전부터죠?",
+]
+
+def long_tool_answer(rng, slots):
+    """Shape of an answer built from a tool result: a long table of flights."""
+    lines = [f"{slots[3][:4]}년 {slots[3][4:6]}월 {slots[3][6:]}일 {slots[5]} → {slots[6]} 운항 정보"]
+    for _ in range(rng.randint(8, 14)):
+        lines.append(f"- LJ{rng.randint(1, 999)}: 출발 {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d} (실제 -), "
+                     f"도착 {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d} (실제 -) · 정상")
+    return "\n".join(lines)
+
+def make_dialogue(seed):
+    rng = random.Random(seed)
+    slots = DIALOGUE_SLOTS[seed % len(DIALOGUE_SLOTS)]
+    pnr, last, first, date, flight, dep, arr, email = slots
+    messages = [
+        {"role": "user", "content": f"예약번호 {pnr}, 이름 {last}/{first} 입니다. {date} {dep}에서 {arr} 가는 {flight} 예약했어요."},
+        {"role": "assistant", "content": f"예약번호 {pnr} 예약 내역을 확인했습니다."},
+        {"role": "user", "content": f"확인서는 {email}로 보내주세요."},
+        {"role": "assistant", "content": "네, 확인서 발송을 도와드릴게요."},
+    ]
+    while len(messages) < (TURNS - 1) * 2:
+        if rng.random() < 0.4:
+            messages.append({"role": "user", "content": "그 날 운항 편 전체 보여주세요"})
+            messages.append({"role": "assistant", "content": long_tool_answer(rng, slots)})
+        else:
+            messages.append({"role": "user", "content": rng.choice(SMALL_TALK)})
+            messages.append({"role": "assistant", "content": "관련 규정은 다음과 같습니다. " * rng.randint(3, 12)})
+    # Closing question relies on slots from the first turns
+    messages.append({"role": "user", "content": "처음에 말한 예약 다시 조회하고 확인서도 보내주세요"})
+    return messages, slots
+
+def last_six(past):
+    window = past[-6:] if len(past) > 6 else past
+    return [{"role": "user" if m["role"] == "user" else "model", "parts": [m["content"]]} for m in window], ""
+
+def context_tokens(history, memory_context, prompt):
+    text = "\n".join(part for entry in history for part in entry["parts"])
+    return utils.estimate_tokens(text) + utils.estimate_tokens(utils.build_turn_message(prompt, "2024년 02월 06일 10시 00분", None, memory_context))
+
+def replay(messages, slots, strategy):
+    """Returns per-turn prompt tokens and whether the final turn still sees every slot."""
+    memory = conversation_memory.new_memory()
+    tokens = []
+    for end in range(1, len(messages) + 1, 2):
+        past, prompt = messages[:end - 1], messages[end - 1]["content"]
+        if strategy == "last_6":
+            history, memory_context = last_six(past)
+        else:
+            history, memory_context = conversation_memory.build_history(past, memory)
+        tokens.append(context_tokens(history, memory_context, prompt))
+    visible = "\n".join(part for entry in history for part in entry["parts"]) + "\n" + memory_context
+    return tokens, all(value in visible for value in slots)
+
+def run_benchmark(dialogues=30):
+    report = {}
+    for strategy in ("last_6", "token_budget"):
+        per_turn, completed = [], 0
+        for seed in range(dialogues):
+            messages, slots = make_dialogue(seed)
+            tokens, complete = replay(messages, slots, strategy)
+            per_turn.extend(tokens)
+            completed += complete
+        report[strategy] = {
+            "prompt_tokens_mean": round(statistics.mean(per_turn), 1),
+            "prompt_tokens_p95": round(statistics.quantiles(per_turn, n=20)[18], 1),
+            "prompt_tokens_max": max(per_turn),
+            "task_completion": round(completed / dialogues, 3),
+        }
+    report["settings"] = {
+        "turns": TURNS, "dialogues": dialogues,
+        "history_token_budget": conversation_memory.HISTORY_TOKEN_BUDGET,
+        "message_token_cap": conversation_memory.MESSAGE_TOKEN_CAP,
+        "summary_every_n_turns": conversation_memory.SUMMARY_EVERY_N_TURNS,
+    }
+    print(json.dumps(report, indent=4, ensure_ascii=False))
+    return report
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,88 @@
+import utils
+import json
+import os
+import time
+import statistics
+
+# Paraphrased customer questions -> substring of the FAQ question that should be retrieved
+SAMPLE_QUERIES = [
+    ("기내에 들고 탈 수 있는 가방 크기가 궁금해요", "기내 휴대 수하물"),
+    ("공짜로 부칠 수 있는 짐은 몇 kg?", "무료 위탁 수하물"),
+    ("강아지 데리고 비행기 탈 수 있어요?", "반려동물"),
+    ("보조배터리 부쳐도 되나요", "보조배터리"),
+    ("국내선 환불 규정 알려줘", "국내선 항공권 환불"),
+    ("임신 중인데 좌석 배려 받을 수 있나요", "임산부"),
+    ("와이파이 되는 비행기인가요?", "Wi-Fi"),
+    ("온라인 체크인은 언제부터 돼?", "체크인"),
+]
+
+def time_ms(fn, repeat=20):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(samples)
+
+def count_tokens(model, text):
+    if model is None:
+        return utils.estimate_tokens(text)
+    return model.count_tokens(text).total_tokens
+
+def run_benchmark():
+    rules = utils.load_bot_rules()
+    current_time_str = "2024년 02월 06일 10시 00분"
+
+    # Real token counts / turn latency need an API key; otherwise fall back to the offline estimate
+    model = None
+    api_key = os.environ.get("GOOGLE_API_KEY")
+    if api_key:
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        model = genai.GenerativeModel('gemini-2.5-flash')
+
+    _, index_build_ms = time_ms(lambda: utils.faq_index.build_index(utils.load_faq_rows()), repeat=5)
+    utils.get_faq_index()
+
+    results = []
+    for query, expected in SAMPLE_QUERIES:
+        full_prompt, full_ms = time_ms(lambda: utils.build_system_instruction(utils.get_faq_as_text(), rules)
+                                       + utils.build_turn_message(query, current_time_str))
+        faq_text, retrieval_ms = time_ms(lambda: utils.get_relevant_faq_text(query))
+        retrieval_prompt = utils.build_system_instruction(utils.RETRIEVED_FAQ_NOTE, rules) \
+            + utils.build_turn_message(query, current_time_str, faq_text)
+
+        row = {
+            "query": query,
+            "hit": expected in faq_text,
+            "full_tokens": count_tokens(model, full_prompt),
+            "retrieval_tokens": count_tokens(model, retrieval_prompt),
+            "full_build_ms": round(full_ms, 3),
+            "retrieval_build_ms": round(retrieval_ms, 3),
+        }
+
+        if model is not None:
+            for mode, prompt in (("full", full_prompt), ("retrieval", retrieval_prompt)):
+                start = time.perf_counter()
+                model.generate_content(prompt)
+                row[f"{mode}_turn_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+        results.append(row)
+        print(json.dumps(row, ensure_ascii=False))
+
+    summary = {
+        "faq_rows": len(utils.get_faq_index()),
+        "top_k": utils.FAQ_TOP_K,
+        "token_source": "count_tokens" if model is not None else "estimate",
+        "index_build_ms": round(index_build_ms, 3),
+        "recall_at_k": sum(r["hit"] for r in results) / len(results),
+        "avg_full_tokens": statistics.mean(r["full_tokens"] for r in results),
+        "avg_retrieval_tokens": statistics.mean(r["retrieval_tokens"] for r in results),
+    }
+    if model is not None:
+        summary["avg_full_turn_ms"] = statistics.mean(r["full_turn_ms"] for r in results)
+        summary["avg_retrieval_turn_ms"] = statistics.mean(r["retrieval_turn_ms"] for r in results)
+    print(json.dumps(summary, indent=4, ensure_ascii=False))
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,100 @@
+"""
+FAQ prompt text at 50 / 5k / 50k rows: the pandas read_csv + iterrows formatter against the
+compiled faq_store (first compile, load by a fresh process from the compiled copy, cached
+snapshot in a running process, category/language slices and an admin save).
+"""
+import faq_store
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+SIZES = [50, 5000, 50000]
+CATEGORIES = ['수하물', '체크인', '변경/환불', '기내서비스', '반려동물', '운송', '기내식', '공동운항']
+QUESTIONS = {
+    "ko": "{category} 관련 {i}번째 문의입니다. 규정이 어떻게 되나요?",
+    "en": "Question {i} about {category} (JinAir): what is the policy?",
+    "ja": "{category}について{i}番目の質問です。規定はどうなりますか？",
+}
+ANSWER = "답변 {i}: 자세한 내용은 진에어 홈페이지 또는 고객센터(1600-6200)를 통해 확인해 주세요. " * 2
+
+
+def write_faq(path, rows, seed=7):
+    rng = random.Random(seed)
+    data = []
+    for i in range(rows):
+        category = rng.choice(CATEGORIES)
+        lang = rng.choice(list(QUESTIONS))
+        data.append({'category': category, 'question': QUESTIONS[lang].format(category=category, i=i),
+                     'answer': ANSWER.format(i=i)})
+    faq_store.write_csv(path, data)
+
+
+def time_ms(fn, repeat=5):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return result, round(statistics.median(samples), 3)
+
+
+def pandas_text(path):
+    """The previous get_faq_as_text: pd.read_csv, then iterrows with += concatenation."""
+    import pandas as pd
+
+    df = pd.read_csv(path)
+    faq_text = ""
+    for index, row in df.iterrows():
+        faq_text += f"Q: {row['question']}\nA: {row['answer']}\n"
+    return faq_text
+
+
+def run_size(rows):
+    repeat = 3 if rows >= 50000 else 5
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path, db_path = os.path.join(tmp, "faq.csv"), os.path.join(tmp, "faq_store.db")
+        write_faq(csv_path, rows)
+        result = {"rows": rows, "csv_kb": round(os.path.getsize(csv_path) / 1024, 1)}
+
+        try:
+            _, result["pandas_iterrows_ms"] = time_ms(lambda: pandas_text(csv_path), repeat)
+        except ImportError:
+            result["pandas_iterrows_ms"] = None    # pandas not installed
+
+        def compile_fresh():
+            if os.path.exists(db_path):
+                os.remove(db_path)
+            return faq_store.FaqStore(db_path, csv_path).snapshot()
+        snapshot, result["store_compile_ms"] = time_ms(compile_fresh, repeat)
+        # A new process finds the compiled copy and skips CSV parsing
+        _, result["store_process_load_ms"] = time_ms(lambda: faq_store.FaqStore(db_path, csv_path).snapshot(), repeat)
+
+        store = faq_store.FaqStore(db_path, csv_path)
+        store.snapshot()
+        _, result["store_cached_text_us"] = time_ms(lambda: store.snapshot().text, 1000)
+        result["store_cached_text_us"] = round(result["store_cached_text_us"] * 1000, 2)
+        _, result["category_slice_us"] = time_ms(lambda: store.snapshot().slice(category='수하물'), 1000)
+        result["category_slice_us"] = round(result["category_slice_us"] * 1000, 2)
+        _, result["lang_slice_us"] = time_ms(lambda: store.snapshot().slice(lang='en'), 1000)
+        result["lang_slice_us"] = round(result["lang_slice_us"] * 1000, 2)
+        _, result["admin_save_ms"] = time_ms(lambda: store.save(snapshot.rows), repeat)
+
+        result["text_chars"] = len(snapshot.text)
+        result["categories"] = len(snapshot.by_category)
+        result["langs"] = sorted(snapshot.by_lang)
+        if result["pandas_iterrows_ms"] is not None:
+            result["same_text_as_pandas"] = pandas_text(csv_path) == snapshot.text
+    return result
+
+
+def main():
+    results = [run_size(rows) for rows in SIZES]
+    for result in results:
+        print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import intent_router
+import csv
+import json
+import time
+import statistics
+from datetime import datetime
+
+CORPUS_FILE = 'router_corpus.csv'
+# Relative dates in the corpus are labeled against this "today"
+CORPUS_NOW = datetime(2024, 2, 6, 10, 0)
+
+def load_corpus():
+    with open(CORPUS_FILE, newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    return [(row['message'], intent_router.Intent(row['tool'], json.loads(row['args'])) if row['tool'] else None)
+            for row in rows]
+
+def run_benchmark(repeat=200):
+    corpus = load_corpus()
+    per_tool = {}
+    mistakes = []
+    for message, expected in corpus:
+        got = intent_router.route(message, CORPUS_NOW)
+        for intent in {i.tool for i in (expected, got) if i is not None}:
+            per_tool.setdefault(intent, {"tp": 0, "fp": 0, "fn": 0})
+        if got is not None and got == expected:
+            per_tool[got.tool]["tp"] += 1
+        else:
+            if got is not None:
+                per_tool[got.tool]["fp"] += 1
+            if expected is not None:
+                per_tool[expected.tool]["fn"] += 1
+            mistakes.append({"message": message, "expected": repr(expected), "got": repr(got)})
+
+    samples = []
+    for _ in range(repeat):
+        for message, _ in corpus:
+            start = time.perf_counter()
+            intent_router.route(message, CORPUS_NOW)
+            samples.append((time.perf_counter() - start) * 1e6)
+
+    totals = {k: sum(t[k] for t in per_tool.values()) for k in ("tp", "fp", "fn")}
+    def pr(t):
+        precision = t["tp"] / (t["tp"] + t["fp"]) if t["tp"] + t["fp"] else 1.0
+        recall = t["tp"] / (t["tp"] + t["fn"]) if t["tp"] + t["fn"] else 1.0
+        return {"precision": round(precision, 3), "recall": round(recall, 3), **t}
+
+    report = {
+        "corpus_size": len(corpus),
+        "routable": sum(1 for _, expected in corpus if expected is not None),
+        "overall": pr(totals),
+        "per_tool": {tool: pr(t) for tool, t in sorted(per_tool.items())},
+        "route_us_p50": round(statistics.median(samples), 1),
+        "route_us_p99": round(statistics.quantiles(samples, n=100)[98], 1),
+        "mistakes": mistakes,
+    }
+    print(json.dumps(report, indent=4, ensure_ascii=False))
+    return report
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,212 @@
+"""
+Load test: N concurrent chat sessions run chat_engine turns against the fake Gemini model and the
+local upstream stub. Prints (and optionally writes) a JSON report; --compare diffs it against an earlier run.
+
+    python bench_load.py --sessions 50 --turns 6 --output load.json
+    python bench_load.py --sessions 50 --turns 6 --compare load.json
+    python bench_load.py --trace-rate 1 --trace-file traces.jsonl && python trace_report.py
+"""
+import chat_engine
+import fakes
+import flight_cache
+import http_client
+import tracing
+import utils
+import argparse
+import csv
+import json
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+# Share of each turn kind in a session
+TURN_MIX = {
+    "faq": 0.30,               # question straight from the FAQ (answer cache)
+    "faq_novel": 0.15,         # general question the FAQ does not cover (model)
+    "schedule": 0.15,          # get_flight_schedule via the model
+    "pnr": 0.15,               # get_pnr_detail via the model
+    "operation_routed": 0.10,  # fully specified operation lookup (intent router)
+    "operation": 0.15,         # operation lookup without a date (model + tool)
+}
+NOVEL_QUESTIONS = ["라운지 이용이 가능한가요?", "유아 동반 시 유모차를 가져갈 수 있나요?", "좌석 업그레이드 비용이 궁금해요",
+                   "기내에서 와이파이가 되나요?", "단체 예약 할인이 있나요?", "마일리지 적립은 어떻게 하나요?"]
+ROUTES = [("GMP", "CJU"), ("ICN", "NRT"), ("ICN", "BKK"), ("PUS", "CJU"), ("ICN", "DAD")]
+
+# Metrics compared by --compare (lower is better unless listed in HIGHER_IS_BETTER)
+COMPARED = ["throughput_tps", "latency_ms.p50", "latency_ms.p95", "latency_ms.p99", "tokens.per_model_turn",
+            "upstream_calls.total", "error_rate"]
+HIGHER_IS_BETTER = {"throughput_tps"}
+
+def load_faq_questions():
+    with open(utils.FAQ_FILE, newline='', encoding='utf-8') as f:
+        return [row['question'] for row in csv.DictReader(f)]
+
+def make_prompt(kind, rng, faq_questions):
+    departure, arrival = rng.choice(ROUTES)
+    date = f"202402{rng.randint(1, 28):02d}"
+    if kind == "faq":
+        return rng.choice(faq_questions)
+    if kind == "faq_novel":
+        return rng.choice(NOVEL_QUESTIONS)
+    if kind == "schedule":
+        return f"{date} {departure}에서 {arrival} 가는 항공편 스케줄 알려주세요"
+    if kind == "pnr":
+        return f"예약번호 {rng.choice(['X3AJUP', 'ABC123', 'Q1W2E3'])} HONG/GILDONG {date} 출발 예약 확인해주세요"
+    if kind == "operation_routed":
+        return f"{date} {departure}에서 {arrival} 운항 정보 알려주세요"
+    return f"{departure}에서 {arrival} 가는 편 운항 현황 알려주세요"
+
+def percentiles(values):
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "mean": None}
+    if len(values) == 1:
+        return {"p50": values[0], "p95": values[0], "p99": values[0], "mean": values[0]}
+    cuts = statistics.quantiles(values, n=100)
+    return {"p50": round(statistics.median(values), 1), "p95": round(cuts[94], 1), "p99": round(cuts[98], 1),
+            "mean": round(statistics.mean(values), 1)}
+
+def run_load(sessions=20, turns=5, model_ttft=0.3, chunk_delay=0.02, model_error_rate=0.0, upstream_latency=0.1,
+             upstream_error_rate=0.0, flights=12, answer_words=60, think_time=0.0, seed=7, trace_rate=0.0,
+             trace_file=None):
+    config = dict(locals())
+    rng = random.Random(seed)
+    kinds, weights = list(TURN_MIX), list(TURN_MIX.values())
+    faq_questions = load_faq_questions()
+    # Pre-draw every session's script so runs with the same seed send the same prompts
+    scripts = [[(kind, make_prompt(kind, rng, faq_questions)) for kind in rng.choices(kinds, weights, k=turns)]
+               for _ in range(sessions)]
+
+    with tempfile.TemporaryDirectory() as tmp, \
+            fakes.StubUpstream(latency=upstream_latency, error_rate=upstream_error_rate, flights_per_route=flights) as stub:
+        stub.point_utils_at()
+        utils.USAGE_DB_FILE = os.path.join(tmp, "usage_log.db")
+        utils.USAGE_LOG_FILE = os.path.join(tmp, "usage_log.csv")
+        http_client.reset()
+        flight_cache.flight_operation_cache.clear()
+        utils.get_answer_cache().clear()
+        tracing.configure(rate=trace_rate, path=trace_file or False, ring_size=sessions * turns)
+
+        _, system_instruction = utils.get_system_prefix()
+        model = fakes.FakeGenerativeModel(
+            system_instruction=system_instruction, tools=chat_engine.TOOLS, ttft=model_ttft, chunk_delay=chunk_delay,
+            tool_calls=fakes.realistic_tool_calls, answer_text="문의하신 내용에 대한 답변입니다. " * (answer_words // 3),
+            error_rate=model_error_rate)
+
+        results = []
+        lock = threading.Lock()
+        def session(script):
+            state = chat_engine.new_session()
+            for kind, prompt in script:
+                start = time.perf_counter()
+                try:
+                    turn = chat_engine.run_turn(state, prompt, model)
+                    turn.update(kind=kind, error=None)
+                except Exception as e:
+                    turn = {"kind": kind, "source": "error", "error": type(e).__name__,
+                            "latency_ms": (time.perf_counter() - start) * 1000}
+                with lock:
+                    results.append(turn)
+                if think_time:
+                    time.sleep(think_time)
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=session, args=(script,)) for script in scripts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duration = time.perf_counter() - start
+        upstream = dict(stub.calls)
+
+    ok = [r for r in results if r["error"] is None]
+    model_turns = [r for r in ok if r["source"] == chat_engine.MODEL_NAME]
+    prompt_tokens = sum(r["prompt_tokens"] for r in ok)
+    candidate_tokens = sum(r["candidate_tokens"] for r in ok)
+    by_kind = {}
+    for kind in kinds:
+        rows = [r for r in results if r["kind"] == kind]
+        if rows:
+            by_kind[kind] = {"turns": len(rows), "errors": sum(1 for r in rows if r["error"]),
+                             "latency_ms": percentiles([r["latency_ms"] for r in rows if not r["error"]])}
+    errors = {}
+    for r in results:
+        if r["error"]:
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+
+    report = {
+        "config": config,
+        "turns": len(results),
+        "duration_s": round(duration, 2),
+        "throughput_tps": round(len(ok) / duration, 2),
+        "error_rate": round(1 - len(ok) / len(results), 4) if results else 0.0,
+        "errors": errors,
+        "latency_ms": percentiles([r["latency_ms"] for r in ok]),
+        "ttfb_ms": percentiles([r["ttfb_ms"] for r in ok if r["ttfb_ms"] is not None]),
+        "by_kind": by_kind,
+        "by_source": {source: sum(1 for r in ok if r["source"] == source) for source in sorted({r["source"] for r in ok})},
+        "tokens": {"prompt": prompt_tokens, "candidate": candidate_tokens,
+                   "per_model_turn": round((prompt_tokens + candidate_tokens) / len(model_turns), 1) if model_turns else 0},
+        "model_calls": model.calls,
+        "tool_calls": sum(r["tool_calls"] for r in ok),
+        "upstream_calls": {"total": sum(upstream.values()), **upstream},
+        "flight_cache": utils.get_flight_operation_cache_stats(),
+    }
+    if trace_rate:
+        summary = tracing.summarize(list(tracing.ring_buffer.traces), top=3)
+        report["traces"] = {"turns": summary["turns"], "top_level_share": summary["top_level_share"],
+                            "stages": summary["stages"]}
+    return report
+
+def _metric(report, path):
+    value = report
+    for key in path.split("."):
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+def compare(report, baseline):
+    """Per-metric change against a baseline report (positive 'better' means an improvement)."""
+    diff = {}
+    for path in COMPARED:
+        new, old = _metric(report, path), _metric(baseline, path)
+        if new is None or old is None:
+            continue
+        change = (new - old) / old if old else 0.0
+        diff[path] = {"baseline": old, "current": new, "change": round(change, 3),
+                      "better": change > 0 if path in HIGHER_IS_BETTER else change < 0}
+    return diff
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=5, help="turns per session")
+    parser.add_argument("--model-ttft", type=float, default=0.3, help="seconds to first chunk per model round-trip")
+    parser.add_argument("--chunk-delay", type=float, default=0.02)
+    parser.add_argument("--model-error-rate", type=float, default=0.0)
+    parser.add_argument("--upstream-latency", type=float, default=0.1)
+    parser.add_argument("--upstream-error-rate", type=float, default=0.0)
+    parser.add_argument("--flights", type=int, default=12, help="flights per route in stub payloads")
+    parser.add_argument("--answer-words", type=int, default=60)
+    parser.add_argument("--think-time", type=float, default=0.0, help="seconds between a session's turns")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--trace-rate", type=float, default=0.0, help="share of turns traced (0 disables tracing)")
+    parser.add_argument("--trace-file", help="also append sampled traces to this JSONL file")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="baseline JSON report to diff against")
+    args = parser.parse_args()
+
+    report = run_load(args.sessions, args.turns, args.model_ttft, args.chunk_delay, args.model_error_rate,
+                      args.upstream_latency, args.upstream_error_rate, args.flights, args.answer_words,
+                      args.think_time, args.seed, args.trace_rate, args.trace_file)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            report["comparison"] = compare(report, json.load(f))
+    print(json.dumps(report, indent=4, ensure_ascii=False))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=4, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import utils
+import google.generativeai as genai
+import json
+import os
+import time
+import statistics
+from datetime import datetime
+
+TURNS = 50
+PROMPT = "기내 휴대 수하물 규정이 어떻게 되나요?"
+
+def setup_before():
+    """Per-turn setup as app.py did it: reload FAQ and rules, second-precision timestamp, new model."""
+    faq_content = utils.get_faq_as_text()
+    rules_content = utils.load_bot_rules()
+    current_time_str = datetime.now().strftime("%Y년 %m월 %d일 %H시 %M분 %S초")
+    instruction = utils.build_system_instruction(faq_content, rules_content) + current_time_str
+    return genai.GenerativeModel('gemini-2.5-flash', system_instruction=instruction), PROMPT
+
+_models = {}
+
+def setup_after():
+    """Versioned prefix + model cached per (api key, prompt version); time and FAQ travel with the message."""
+    faq_content = utils.get_relevant_faq_text(PROMPT) if utils.FAQ_CONTEXT_MODE == "retrieval" else None
+    turn_message = utils.build_turn_message(PROMPT, datetime.now().strftime("%Y년 %m월 %d일 %H시 %M분"), faq_content)
+    version, instruction = utils.get_system_prefix()
+    key = ("bench-key", version)
+    if key not in _models:
+        _models[key] = genai.GenerativeModel('gemini-2.5-flash', system_instruction=instruction)
+        utils.prompt_metrics["model_builds"] += 1
+    return _models[key], turn_message
+
+def measure(setup):
+    samples = []
+    for _ in range(TURNS):
+        start = time.perf_counter()
+        setup()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def run_benchmark():
+    before = measure(setup_before)
+    after = measure(setup_after)
+
+    # Touching bot_rules.txt without changing it rebuilds the prefix but keeps its version (no new model)
+    os.utime(utils.BOT_RULES_FILE)
+    after += measure(setup_after)
+
+    report = {
+        "turns": TURNS,
+        "before": {
+            "prompt_rebuilds": TURNS,
+            "model_builds": TURNS,
+            "setup_ms_p50": round(statistics.median(before), 3),
+            "setup_ms_p95": round(statistics.quantiles(before, n=20)[18], 3),
+        },
+        "after": {
+            "prompt_rebuilds": utils.prompt_metrics["prefix_builds"],
+            "model_builds": utils.prompt_metrics["model_builds"],
+            "setup_ms_p50": round(statistics.median(after), 3),
+            "setup_ms_p95": round(statistics.quantiles(after, n=20)[18], 3),
+        },
+        "prompt_version": utils.get_system_prefix()[0],
+    }
+    print(json.dumps(report, indent=4, ensure_ascii=False))
+    return report
+
+if __name__ == "__main__":
+    run_benchmark()
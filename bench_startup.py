@@ -0,0 +1,83 @@
+"""
+Cold-start import cost of the chat app. Each scenario imports a module set in a fresh interpreter
+(`python -X importtime`), repeated to take the median, and lists the heaviest imports.
+
+- eager: what app.py pulled in at startup before the imports were made lazy (pandas via utils,
+  google.generativeai and requests at module level)
+- rerun: what app.py imports now, i.e. every cold start and every page render
+- prompt: rerun + the GenAI SDK and requests, loaded when the first prompt is sent
+- admin: rerun + pandas, loaded only by the admin/analytics loaders
+
+    python bench_startup.py [--repeat 5] [--with-streamlit]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+APP_MODULES = ["chat_engine", "conversation_memory", "rate_limiter", "tool_runner", "tracing", "usage_log", "utils"]
+SCENARIOS = {
+    "eager": APP_MODULES + ["pandas", "google.generativeai", "google.api_core.exceptions", "requests"],
+    "rerun": APP_MODULES,
+    "prompt": APP_MODULES + ["google.generativeai", "google.api_core.exceptions", "requests"],
+    "admin": APP_MODULES + ["pandas"],
+}
+TOP_IMPORTS = 8
+
+
+def profile(modules):
+    """Returns (total import ms, {top-level package: ms spent importing its modules}) for one fresh interpreter."""
+    code = "; ".join(f"import {module}" for module in modules)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True,
+                          cwd=os.path.dirname(os.path.abspath(__file__)))
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    packages = {}
+    for line in proc.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package" (nested imports are indented)
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0.0) + int(self_us) / 1000
+    return sum(packages.values()), packages
+
+
+def run(repeat=5, with_streamlit=False):
+    report = {}
+    for name, modules in SCENARIOS.items():
+        modules = (["streamlit"] if with_streamlit else []) + modules
+        try:
+            runs = [profile(modules) for _ in range(repeat)]
+        except RuntimeError as e:
+            report[name] = {"error": str(e)}
+            continue
+        totals = [total for total, _ in runs]
+        packages = {}
+        for _, per_package in runs:
+            for package, ms in per_package.items():
+                packages.setdefault(package, []).append(ms)
+        heaviest = sorted(((statistics.median(values), package) for package, values in packages.items()), reverse=True)
+        report[name] = {
+            "import_ms_median": round(statistics.median(totals), 1),
+            "import_ms_min": round(min(totals), 1),
+            "heaviest": {package: round(ms, 1) for ms, package in heaviest[:TOP_IMPORTS]},
+        }
+    if "error" not in report["eager"] and "error" not in report["rerun"]:
+        report["saved_per_cold_start_ms"] = round(
+            report["eager"]["import_ms_median"] - report["rerun"]["import_ms_median"], 1)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--with-streamlit", action="store_true", help="include the streamlit import itself")
+    args = parser.parse_args()
+    print(json.dumps(run(args.repeat, args.with_streamlit), indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import fakes
+import tool_runner
+import json
+import time
+import statistics
+
+PROMPTS = [
+    "기내 휴대 수하물 규정이 어떻게 되나요?",
+    "20240206 인천-나리타 왕복 운항 정보 알려주세요",
+    "반려동물 동반 규정이 어떻게 되나요?",
+    "ICN NRT 20240206 운항 현황",
+]
+
+def fake_tools():
+    def get_flight_operation_info(date, departure, arrival):
+        return fakes.sample_flight_operation_info(date, departure, arrival)
+    return [get_flight_operation_info]
+
+def run_turn(model, prompt, stream):
+    chat = model.start_chat(history=[], enable_automatic_function_calling=False)
+    tools = fake_tools()
+    start = time.perf_counter()
+    if stream:
+        usage = {}
+        text = "".join(tool_runner.stream_message_with_tools(chat, prompt, tools, usage))
+    else:
+        response, usage = tool_runner.send_message_with_tools(chat, prompt, tools)
+        text = response.text
+    usage["wall_ms"] = (time.perf_counter() - start) * 1000
+    usage["chars"] = len(text)
+    return usage
+
+def run_benchmark(ttft=0.4, chunk_delay=0.05, chunks=20, repeat=3):
+    model = fakes.FakeGenerativeModel(tools=fake_tools(), ttft=ttft, chunk_delay=chunk_delay, chunks=chunks)
+    report = {"ttft_s": ttft, "chunk_delay_s": chunk_delay, "chunks": chunks, "modes": {}}
+    for mode, stream in (("blocking", False), ("streaming", True)):
+        turns = [run_turn(model, prompt, stream) for _ in range(repeat) for prompt in PROMPTS]
+        report["modes"][mode] = {
+            "ttfb_ms_p50": round(statistics.median(t["ttfb_ms"] for t in turns), 1),
+            "total_ms_p50": round(statistics.median(t["total_ms"] for t in turns), 1),
+            "ttfb_ms_max": round(max(t["ttfb_ms"] for t in turns), 1),
+            "tool_calls": sum(t["tool_calls"] for t in turns),
+            "prompt_tokens": sum(t["prompt_tokens"] for t in turns),
+            "candidate_tokens": sum(t["candidate_tokens"] for t in turns),
+        }
+    blocking, streaming = report["modes"]["blocking"], report["modes"]["streaming"]
+    report["ttfb_reduction"] = round(1 - streaming["ttfb_ms_p50"] / blocking["ttfb_ms_p50"], 3)
+    print(json.dumps(report, indent=4, ensure_ascii=False))
+    return report
+
+if __name__ == "__main__":
+    run_benchmark()
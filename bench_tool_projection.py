@@ -0,0 +1,73 @@
+import utils
+import fakes
+import schedule_store
+import tool_projection
+import json
+
+def schedule_results():
+    """What the schedule tools return (ScheduleDay summaries), from a store over fake /API/Flight payloads."""
+    def fetch(date, departure, arrival):
+        payload = fakes.sample_flight_schedule(departure, arrival, date)
+        # Other routes in the payload are dropped by schedule_store.normalize
+        payload["flights"] += fakes.sample_flight_schedule(departure, "PUS", date, flights=4)["flights"]
+        return payload
+    utils._schedule_store = schedule_store.ScheduleStore(fetch)
+    try:
+        return (utils.get_flight_schedule_api("GMP", "CJU", "20240206"),
+                utils.get_flight_schedule_range_api("GMP", "CJU", "20240206", 7))
+    finally:
+        utils._schedule_store = None
+
+def sample_cases():
+    """(case, tool name, args, tool result) for every tool whose result goes back to the model."""
+    op_args = {"date": "20240206", "departure": "ICN", "arrival": "NRT"}
+    mixed = fakes.sample_flight_operation_info("20240206", "ICN", "NRT", flights=8)
+    # Upstream sometimes returns other routes from the same airport
+    mixed["FlightInfo"] += fakes.sample_flight_operation_info("20240206", "ICN", "BKK", flights=6)["FlightInfo"]
+    detail = fakes.sample_flight_operation_info("20240206", "ICN", "BKK", flights=1)["FlightInfo"][0]
+    day, week = schedule_results()
+    return [
+        ("get_flight_operation_info (2 flights)", "get_flight_operation_info", op_args,
+         fakes.sample_flight_operation_info("20240206", "ICN", "NRT", flights=2)),
+        ("get_flight_operation_info (12 flights)", "get_flight_operation_info", op_args,
+         fakes.sample_flight_operation_info("20240206", "ICN", "NRT", flights=12)),
+        ("get_flight_operation_info (mixed routes)", "get_flight_operation_info", op_args, mixed),
+        ("get_flight_operation_detail", "get_flight_operation_detail",
+         {"date": "20240206", "flight_no": "LJ201", "departure": "ICN", "arrival": "BKK"}, detail),
+        ("get_pnr_detail", "get_pnr_detail",
+         {"pnr": "X3AJUP", "first_name": "GILDONG", "last_name": "HONG", "departure_date": "20240206"},
+         fakes.sample_pnr_detail("X3AJUP")),
+        # Already compact: passed through unchanged
+        ("get_flight_schedule (10 flights)", "get_flight_schedule",
+         {"departure": "GMP", "arrival": "CJU", "date": "20240206"}, day),
+        ("get_flight_schedule_range (7 days)", "get_flight_schedule_range",
+         {"departure": "GMP", "arrival": "CJU", "start_date": "20240206", "days": 7}, week),
+    ]
+
+def run_benchmark():
+    results = []
+    for label, tool, args, raw in sample_cases():
+        if tool.startswith("get_flight_schedule"):
+            assert "error" not in raw and tool_projection.project(tool, args, raw) is raw, (label, raw)
+        raw_tokens = utils.estimate_tokens(tool_projection.serialize(raw))
+        projected = tool_projection.project(tool, args, raw)
+        projected_tokens = utils.estimate_tokens(tool_projection.serialize(projected))
+        # Same projection without the tabular encoding, to show what the columns/rows form adds
+        tabular_min = tool_projection.TABULAR_MIN_ROWS
+        tool_projection.TABULAR_MIN_ROWS = 10 ** 9
+        try:
+            keyed_tokens = utils.estimate_tokens(tool_projection.serialize(tool_projection.project(tool, args, raw)))
+        finally:
+            tool_projection.TABULAR_MIN_ROWS = tabular_min
+        results.append({
+            "case": label,
+            "raw_tokens": raw_tokens,
+            "projected_keyed_tokens": keyed_tokens,
+            "projected_tokens": projected_tokens,
+            "savings": round(1 - projected_tokens / raw_tokens, 3),
+        })
+    print(json.dumps(results, indent=4, ensure_ascii=False))
+    return results
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,61 @@
+import utils
+import fakes
+import http_client
+import tool_runner
+import json
+import time
+import statistics
+
+TOOLS = {
+    "get_flight_operation_info": utils.get_flight_operation_info_api,
+    "get_flight_operation_detail": utils.get_flight_operation_info_detail_api,
+    "get_pnr_detail": utils.get_pnr_detail_api,
+}
+
+# One model turn asking for a round trip: both legs' operation info, one flight detail and the booking
+CALLS = [
+    ("get_flight_operation_info", {"date": "20240206", "departure": "ICN", "arrival": "NRT"}),
+    ("get_flight_operation_info", {"date": "20240210", "departure": "NRT", "arrival": "ICN"}),
+    ("get_flight_operation_detail", {"date": "20240207", "flight_no": "LJ201", "departure": "ICN", "arrival": "BKK"}),
+    ("get_pnr_detail", {"pnr": "X3AJUP", "first_name": "GILDONG", "last_name": "HONG", "departure_date": "20240206"}),
+]
+
+def run_sequential():
+    return [TOOLS[name](**args) for name, args in CALLS]
+
+def run_concurrent():
+    return tool_runner.run_tool_calls(CALLS, TOOLS)
+
+def measure(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        utils.flight_cache.flight_operation_cache.clear()
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+def run_benchmark(latencies=(0.05, 0.2, 0.5), repeat=5):
+    report = []
+    for latency in latencies:
+        with fakes.StubUpstream(latency=latency) as stub:
+            stub.point_utils_at()
+            http_client.reset()
+            sequential_ms = measure(run_sequential, repeat)
+            concurrent_ms = measure(run_concurrent, repeat)
+            # Results must come back in the order the model asked for them
+            ordered = [r.get("FlightNo") or len(r.get("FlightInfo", [])) or r.get("pnrNumber") for r in run_concurrent()]
+        row = {
+            "upstream_latency_ms": latency * 1000,
+            "calls_per_turn": len(CALLS),
+            "sequential_ms": round(sequential_ms, 1),
+            "concurrent_ms": round(concurrent_ms, 1),
+            "speedup": round(sequential_ms / concurrent_ms, 2),
+            "results_in_order": ordered,
+        }
+        report.append(row)
+        print(json.dumps(row, ensure_ascii=False))
+    return report
+
+if __name__ == "__main__":
+    run_benchmark()
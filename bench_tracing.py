@@ -0,0 +1,61 @@
+"""
+Overhead of the span instrumentation on the hot path: an instrumented turn-shaped call tree
+(prompt build, model round, tool round with HTTP and cache spans) with tracing sampled out,
+sampled in (in-memory sink) and without any spans at all.
+"""
+import tracing
+import json
+import time
+
+ITERATIONS = 20000
+
+
+def plain_turn():
+    total = 0
+    for i in range(6):
+        total += i
+    return total
+
+
+def instrumented_turn():
+    with tracing.start_trace("turn"):
+        with tracing.span("cache.answer") as span:
+            span.set(outcome="miss")
+        with tracing.span("prompt_build"):
+            with tracing.span("prompt_build.faq_retrieval"):
+                pass
+            with tracing.span("prompt_build.memory"):
+                pass
+        with tracing.span("model_round", round=0):
+            pass
+        with tracing.span("tool_round", calls=1):
+            with tracing.span("tool.get_flight_operation_info"):
+                with tracing.span("cache.flight_route") as span:
+                    span.set(outcome="miss")
+                    with tracing.span("http.flight_operation") as http_span:
+                        if http_span.recording:
+                            http_span.set(status=200, bytes=2048, attempts=1)
+        with tracing.span("model_round", round=1):
+            pass
+        return plain_turn()
+
+
+def per_turn_us(func):
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        func()
+    return (time.perf_counter() - start) / ITERATIONS * 1e6
+
+
+def main():
+    results = {"baseline_us": round(per_turn_us(plain_turn), 2)}
+    for label, rate in (("sampled_out_us", 0.0), ("sample_10pct_us", 0.1), ("sampled_in_us", 1.0)):
+        tracing.configure(rate=rate, path=False)
+        results[label] = round(per_turn_us(instrumented_turn), 2)
+    results["sampled_out_overhead_us"] = round(results["sampled_out_us"] - results["baseline_us"], 2)
+    results["spans_per_turn"] = len(tracing.ring_buffer.traces[-1]["spans"]) if tracing.ring_buffer.traces else 0
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import usage_log
+import rollups
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+MODELS = ['gemini-2.5-flash', 'gemini-2.5-pro']
+SPAN_DAYS = 180
+QUERY_DAYS = 7
+BATCH = 50000
+
+def generate(path, rows):
+    """Writes synthetic raw rows and their rollups the same way the background writer does."""
+    conn = usage_log.connect(path)
+    end = datetime.now()
+    start = end - timedelta(days=SPAN_DAYS)
+    step = (end - start).total_seconds() / rows
+    written = 0
+    while written < rows:
+        batch = []
+        for i in range(written, min(rows, written + BATCH)):
+            ts = (start + timedelta(seconds=i * step)).strftime("%Y-%m-%d %H:%M:%S")
+            batch.append((ts, random.choice(MODELS), random.randint(800, 4000), random.randint(20, 400),
+                          random.lognormvariate(7, 0.6), random.lognormvariate(6, 0.5), random.randint(0, 2), random.randint(0, 1)))
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(f"INSERT INTO usage ({', '.join(usage_log.COLUMNS)}) VALUES ({', '.join('?' * len(usage_log.COLUMNS))})", batch)
+            rollups.apply(conn, batch)
+        written += len(batch)
+    conn.close()
+
+def full_load_tokens_per_hour(path, days):
+    """The previous path: load every raw row, parse timestamps, then aggregate."""
+    columns, rows = usage_log.query(path)
+    df = pd.DataFrame.from_records(rows, columns=columns)
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    df = df[df['timestamp'] >= datetime.now() - timedelta(days=days)]
+    return df.groupby([df['timestamp'].dt.floor('h'), 'model'])[['prompt_tokens', 'candidate_tokens']].sum()
+
+def rollup_tokens_per_hour(path, days):
+    return usage_log.query_rollups(path, 'hour', start=datetime.now() - timedelta(days=days))
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+def run_benchmark(sizes):
+    report = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in sizes:
+            path = os.path.join(tmp, f"usage_{rows}.db")
+            _, generate_ms = timed(generate, path, rows)
+            full, full_ms = timed(full_load_tokens_per_hour, path, QUERY_DAYS)
+            rolled, rollup_ms = timed(rollup_tokens_per_hour, path, QUERY_DAYS)
+            conn = usage_log.connect(path)
+            latency, sketch_ms = timed(rollups.merged_latency, conn, 'hour', datetime.now() - timedelta(days=QUERY_DAYS))
+            conn.close()
+            row = {
+                "raw_rows": rows,
+                "query": f"tokens per hour, last {QUERY_DAYS} days",
+                "ingest_rows_per_s": round(rows / (generate_ms / 1000)),
+                "full_load_ms": round(full_ms, 1),
+                "rollup_ms": round(rollup_ms, 1),
+                "speedup": round(full_ms / rollup_ms, 1),
+                "buckets": len(rolled),
+                "full_load_groups": len(full),
+                "latency_percentiles_ms": {k: round(v, 1) for k, v in latency.items()},
+                "latency_merge_ms": round(sketch_ms, 1),
+                "db_mb": round(os.path.getsize(path) / 1e6, 1),
+            }
+            report.append(row)
+            print(json.dumps(row, ensure_ascii=False))
+    return report
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1_000_000, 10_000_000]
+    run_benchmark(sizes)
@@ -0,0 +1,67 @@
+"""
+Client of the chat API (chat_server.py); app.py uses it when utils.CHAT_API_URL is set.
+"""
+import json
+
+import http_client
+
+
+class ChatAPIError(Exception):
+    """The chat API refused or failed the request; the message is meant for the user."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _error(response):
+    try:
+        message = response.json().get("error")
+    except ValueError:
+        message = None
+    return ChatAPIError(response.status_code, message or f"채팅 서버 오류 (HTTP {response.status_code})")
+
+
+class ChatClient:
+    def __init__(self, base_url, api_key=None):
+        self.base_url = base_url.rstrip("/")
+        self.headers = {"X-Api-Key": api_key} if api_key else {}
+
+    def create_session(self):
+        response = http_client.post("chat_api", f"{self.base_url}/v1/sessions", headers=self.headers)
+        if response.status_code != 201:
+            raise _error(response)
+        return response.json()["session_id"]
+
+    def get_session(self, session_id):
+        response = http_client.get("chat_api", f"{self.base_url}/v1/sessions/{session_id}", headers=self.headers)
+        if response.status_code != 200:
+            raise _error(response)
+        return response.json()
+
+    def stream_turn(self, session_id, prompt, result=None, on_wait=None):
+        """
+        Sends one turn and yields the answer text as the server streams it. `result` gets the
+        turn metrics of the final "done" event; on_wait(seconds, position) is called while the
+        turn waits for Gemini quota. Raises ChatAPIError for a refused or failed turn.
+        """
+        response = http_client.post("chat_api", f"{self.base_url}/v1/sessions/{session_id}/turns",
+                                    json={"prompt": prompt, "stream": True}, headers=self.headers, stream=True)
+        try:
+            if response.status_code != 200:
+                raise _error(response)
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                kind = event.pop("event")
+                if kind == "chunk":
+                    yield event["text"]
+                elif kind == "wait" and on_wait is not None:
+                    on_wait(event["seconds"], event["position"])
+                elif kind == "done" and result is not None:
+                    result.update(event)
+                elif kind == "error":
+                    raise ChatAPIError(event["status"], event["error"])
+        finally:
+            response.close()
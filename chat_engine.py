@@ -0,0 +1,300 @@
+"""
+Chat turn pipeline without the Streamlit UI: the tools exposed to the model, the local
+(cache/router) answers and the per-turn context. app.py renders these; load tests drive run_turn.
+"""
+import datetime
+import threading
+import time
+
+import chat_history
+import conversation_memory
+import intent_router
+import pnr_cache
+import rate_limiter
+import tool_runner
+import tracing
+import usage_log
+import utils
+
+MODEL_NAME = 'gemini-2.5-flash'
+MAX_MODELS = 16    # (api key, prompt version) pairs kept per process
+
+
+def get_flight_schedule(departure: str, arrival: str, date: str):
+    """
+    실시간 항공 스케줄을 조회하는 함수입니다.
+    
+    Args:
+        departure: 출발 공항 코드 (예: GMP)
+        arrival: 도착 공항 코드 (예: CJU)
+        date: 날짜 (형식: YYYYMMDD, 예: 20250618)
+    """
+    return utils.get_flight_schedule_api(departure, arrival, date)
+
+def get_flight_schedule_range(departure: str, arrival: str, start_date: str, days: int):
+    """
+    여러 날짜(예: 앞으로 7일)의 항공 스케줄 요약을 한 번에 조회하는 함수입니다.
+    
+    Args:
+        departure: 출발 공항 코드 (예: GMP)
+        arrival: 도착 공항 코드 (예: CJU)
+        start_date: 시작 날짜 (형식: YYYYMMDD, 예: 20250618)
+        days: 조회할 일수 (1~14)
+    """
+    return utils.get_flight_schedule_range_api(departure, arrival, start_date, days)
+
+def send_operation_confirmation(flight_date: str, flight_number: str, email: str):
+    """
+    운항정보확인서 이메일 발송을 접수하는 함수입니다. 발송은 백그라운드에서 진행되며 접수번호(job_id)를 바로 반환합니다.
+    
+    Args:
+        flight_date: 날짜 (형식: YYYYMMDD, 예: 20240703)
+        flight_number: 편명 (예: LJ507)
+        email: 수신 이메일 주소
+    """
+    return utils.enqueue_operation_confirmation(flight_date, flight_number, email)
+
+def get_operation_confirmation_status(job_id: str):
+    """
+    운항정보확인서 발송 상태를 접수번호로 조회하는 함수입니다. (queued: 접수, sending/retrying: 발송 중, sent: 발송 완료, failed: 실패)
+    
+    Args:
+        job_id: 발송 접수번호 (예: 3F9A1C0B2D)
+    """
+    return utils.get_operation_confirmation_status(job_id)
+
+def get_pnr_detail(pnr: str, first_name: str, last_name: str, departure_date: str):
+    """
+    예약 번호, 탑승객 성, 이름, 출발일을 사용하여 예약 상세 내역을 조회하는 함수입니다.
+    
+    Args:
+        pnr: 예약 번호 (예: X3AJUP)
+        first_name: 탑승객 이름 (예: GILDONG)
+        last_name: 탑승객 성 (예: HONG)
+        departure_date: 출발일 (형식: YYYYMMDD, 예: 20240206)
+    """
+    return utils.get_pnr_detail_api(pnr, first_name, last_name, departure_date)
+
+def get_flight_operation_info(date: str, departure: str, arrival: str):
+    """
+    운항 정보를 조회하는 함수입니다.
+    
+    Args:
+        date: 날짜 (형식: YYYYMMDD, 예: 20240206)
+        departure: 출발 공항 코드 (예: ICN)
+        arrival: 도착 공항 코드 (예: NRT)
+    """
+
+    return utils.get_flight_operation_info_api(date, departure, arrival)
+
+def get_flight_operation_detail(date: str, flight_no: str, departure: str, arrival: str):
+    """
+    운항 정보 상세 조회 (편명 검색) 함수입니다.
+    
+    Args:
+        date: 날짜 (형식: YYYYMMDD, 예: 20240206)
+        flight_no: 편명 (예: LJ201)
+        departure: 출발 공항 코드 (예: ICN)
+        arrival: 도착 공항 코드 (예: BKK)
+    """
+    return utils.get_flight_operation_info_detail_api(date, flight_no, departure, arrival)
+
+def get_flight_operations_bulk(queries: list[str]):
+    """
+    여러 날짜/노선(왕복, 일주일 일정 등)의 운항 정보를 한 번에 조회하는 함수입니다.
+    결과는 "LJ편명/날짜" 키로 합쳐서 반환됩니다.
+    
+    Args:
+        queries: 조회 목록. 각 항목은 "날짜,출발,도착" 또는 "날짜,출발,도착,편명" (예: ["20240206,ICN,BKK,LJ201", "20240210,BKK,ICN"])
+    """
+    parsed = []
+    for query in queries:
+        parts = [part.strip() for part in str(query).replace(" ", ",").split(",") if part.strip()]
+        if len(parts) not in (3, 4):
+            return {"error": f"조회 형식이 올바르지 않습니다: {query}"}
+        parsed.append(tuple(parts))
+    return utils.get_flight_operations_bulk_api(parsed)
+
+
+TOOLS = [get_flight_schedule, get_flight_schedule_range, send_operation_confirmation, get_operation_confirmation_status, get_pnr_detail,
+         get_flight_operation_info, get_flight_operation_detail, get_flight_operations_bulk]
+TOOL_MAP = {func.__name__: func for func in TOOLS}
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def new_session():
+    return {"messages": [], "memory": conversation_memory.new_memory(), "pnr_cache": pnr_cache.PnrCache()}
+
+
+def answer_locally(prompt):
+    """Returns (answer_text, source, tool_calls) when the turn needs no model call, else None."""
+    # Repeated FAQ questions are answered from the cache without a model call
+    with tracing.span("cache.answer") as span:
+        cached_answer = utils.lookup_cached_answer(prompt)
+        span.set(outcome="miss" if cached_answer is None else "hit")
+    if cached_answer is not None:
+        return cached_answer, 'answer_cache', 0
+    # Structured lookups with every slot present (e.g. "LJ201 ICN BKK 20240206 운항정보") skip the model
+    with tracing.span("intent_router") as span:
+        routed = intent_router.answer(prompt, TOOL_MAP)
+        span.set(routed=routed is not None)
+    if routed is not None:
+        return routed[1], 'intent_router', 1
+    return None
+
+
+def prepare_model_turn(messages, memory, prompt, now=None):
+    """
+    Per-turn context: current time, relevant FAQ entries and conversation memory go with the
+    message, not the system instruction. `messages` already ends with the current prompt; only its
+    in-memory part is read (a ChatHistory's spilled messages stay on disk). Returns (history_for_api, turn_message, standalone); standalone is True when neither earlier
+    messages nor conversation memory went into the turn.
+    """
+    with tracing.span("prompt_build") as span:
+        offset, recent = chat_history.tail(messages)
+        faq_content = None
+        if utils.FAQ_CONTEXT_MODE == "retrieval":
+            with tracing.span("prompt_build.faq_retrieval"):
+                # Include the previous user message so short follow-ups ("국제선은요?") still retrieve the topic
+                user_messages = [m["content"] for m in recent[-4:] if m["role"] == "user"]
+                faq_content = utils.get_relevant_faq_text(" ".join(user_messages[-2:]))
+
+        # Recent turns verbatim within a token budget; older ones as known slots + rolling summary
+        with tracing.span("prompt_build.memory"):
+            history_for_api, memory_context = conversation_memory.build_history(recent[:-1], memory, offset=offset)
+
+        now = now or datetime.datetime.now()
+        current_time_str = now.strftime("%Y년 %m월 %d일 %H시 %M분")
+        turn_message = utils.build_turn_message(prompt, current_time_str, faq_content, memory_context)
+        if span.recording:
+            span.set(history_messages=len(history_for_api), message_chars=len(turn_message))
+        return history_for_api, turn_message, not history_for_api and not memory_context
+
+
+def get_model(api_key):
+    """
+    GenerativeModel for the API key and the current system-instruction version, built once per
+    process with a client bound to that key (the SDK is imported on the first call, not at startup).
+    """
+    prompt_version, system_instruction = utils.get_system_prefix()
+    key = (api_key, prompt_version)
+    with _models_lock:
+        model = _models.get(key)
+        if model is None:
+            import google.generativeai as genai
+            from google.ai.generativelanguage import GenerativeServiceClient
+
+            utils.prompt_metrics["model_builds"] += 1
+            model = genai.GenerativeModel(MODEL_NAME, system_instruction=system_instruction, tools=TOOLS)
+            # Own client per key: genai.configure() is process-wide, and a model without a client binds
+            # to whichever key was configured last when it first generates
+            model._client = GenerativeServiceClient(client_options={"api_key": api_key})
+            _models[key] = model
+            while len(_models) > MAX_MODELS:
+                del _models[next(iter(_models))]
+        return model
+
+
+def is_quota_error(error):
+    """True for Gemini's ResourceExhausted (429) without importing the SDK when it isn't loaded."""
+    try:
+        from google.api_core.exceptions import ResourceExhausted
+    except ImportError:
+        return False
+    return isinstance(error, ResourceExhausted)
+
+
+def stream_turn(session, prompt, model=None, api_key="local", limiter=None, stream=True, on_wait=None, result=None):
+    """
+    Runs one chat turn and yields the answer text as it is produced (local answers in one chunk).
+    Appends the user message and the answer to session["messages"] (session["pnr_cache"] keeps the
+    session's PNR lookups for a short while), logs usage and fills `result`
+    with the turn metrics once the generator is exhausted. model=None uses get_model(api_key);
+    with a limiter every model round-trip waits for quota (on_wait(seconds, position) while waiting).
+    """
+    result = {} if result is None else result
+    trace = tracing.start_trace("turn", stream=stream)
+    try:
+        yield from _stream_turn(session, prompt, model, api_key, limiter, stream, on_wait, result)
+        trace.set(source=result["source"], tool_calls=result["tool_calls"],
+                  prompt_tokens=result["prompt_tokens"], candidate_tokens=result["candidate_tokens"])
+    except Exception as e:
+        # Quota gone anyway (e.g. another app on the same key): make the others wait for the refill
+        if limiter is not None and is_quota_error(e):
+            limiter.exhausted(api_key)
+        trace.set(error=type(e).__name__)
+        raise
+    finally:
+        trace.end()
+
+
+def _stream_turn(session, prompt, model, api_key, limiter, stream, on_wait, result):
+    started = time.perf_counter()
+    session["messages"].append({"role": "user", "content": prompt})
+    turn_stats = usage_log.start_turn()
+    # PNR lookups made by this turn's tools see only this session's bookings
+    pnr_cache.current.set(session.setdefault("pnr_cache", pnr_cache.PnrCache()))
+
+    # Answer cache / intent router: no model call needed
+    local = answer_locally(prompt)
+    if local is not None:
+        text, source, tool_calls = local
+        yield text
+        cache_hits = 1 if source == 'answer_cache' else turn_stats["cache_hits"]
+        latency_ms = (time.perf_counter() - started) * 1000
+        session["messages"].append({"role": "assistant", "content": text})
+        utils.log_usage(source, 0, 0, latency_ms=latency_ms, tool_calls=tool_calls, cache_hits=cache_hits)
+        result.update(text=text, source=source, latency_ms=latency_ms, ttfb_ms=latency_ms, prompt_tokens=0,
+                      candidate_tokens=0, tool_calls=tool_calls, cache_hits=cache_hits)
+        return
+
+    history_for_api, turn_message, standalone = prepare_model_turn(session["messages"], session.setdefault(
+        "memory", conversation_memory.new_memory()), prompt)
+    model = model or get_model(api_key)
+    utils.prompt_metrics["last_setup_ms"] = (time.perf_counter() - started) * 1000
+    # Function calls are executed by tool_runner so parallel calls in one model turn run concurrently
+    chat = model.start_chat(history=history_for_api, enable_automatic_function_calling=False)
+    if limiter is not None:
+        # Wait for quota (per key and across processes) instead of failing with ResourceExhausted;
+        # conversations already in progress are served before new ones
+        priority = rate_limiter.PRIORITY_CONTINUING if history_for_api else rate_limiter.PRIORITY_NEW
+        chat = rate_limiter.LimitedChat(chat, limiter, api_key, utils.estimate_turn_tokens(), priority, on_wait)
+    if stream:
+        # Text chunks as they arrive; tool calls are resolved between stream rounds
+        usage, parts = {}, []
+        for chunk in tool_runner.stream_message_with_tools(chat, turn_message, TOOLS, usage):
+            parts.append(chunk)
+            yield chunk
+        text = "".join(parts)
+    else:
+        response, usage = tool_runner.send_message_with_tools(chat, turn_message, TOOLS)
+        text = response.text
+        yield text
+    if limiter is not None:
+        limiter.settle(api_key, chat.reserved_tokens, usage["prompt_tokens"] + usage["candidate_tokens"])
+
+    # Log Usage (summed over every model round-trip of this turn)
+    if usage["prompt_tokens"] or usage["candidate_tokens"]:
+        utils.log_usage(MODEL_NAME, usage["prompt_tokens"], usage["candidate_tokens"], latency_ms=usage["total_ms"],
+                        ttfb_ms=usage["ttfb_ms"], tool_calls=usage["tool_calls"], cache_hits=turn_stats["cache_hits"])
+    session["messages"].append({"role": "assistant", "content": text})
+    # Only answers that could not have drawn on this session's history may be served to other sessions
+    if usage["tool_calls"] == 0 and standalone:
+        utils.remember_answer(prompt, text, usage["total_ms"])
+    result.update(text=text, source=MODEL_NAME, latency_ms=(time.perf_counter() - started) * 1000,
+                  ttfb_ms=usage["ttfb_ms"], prompt_tokens=usage["prompt_tokens"],
+                  candidate_tokens=usage["candidate_tokens"], tool_calls=usage["tool_calls"],
+                  cache_hits=turn_stats["cache_hits"])
+
+
+def run_turn(session, prompt, model=None, api_key="local", limiter=None, stream=True):
+    """
+    Runs one chat turn to completion and returns its metrics
+    (text, source, latency_ms, ttfb_ms, prompt/candidate tokens, tool_calls, cache_hits).
+    """
+    result = {}
+    for _ in stream_turn(session, prompt, model, api_key, limiter, stream, result=result):
+        pass
+    return result
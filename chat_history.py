@@ -0,0 +1,234 @@
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+
+WINDOW = 40                 # messages kept in memory per session
+SPILL_BATCH = 20            # older messages are written to disk this many at a time
+PAGE_SIZE = 20              # messages rendered at first and per "load earlier"
+IDLE_SECONDS = 15 * 60.0    # sessions untouched this long drop their in-memory window
+REAP_INTERVAL = 60.0
+HISTORY_TTL = 24 * 60 * 60.0
+BUSY_TIMEOUT_MS = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_message (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+"""
+
+
+class HistoryStore:
+    """
+    On-disk part of every session's chat history (SQLite, one row per message keyed by session and
+    position). Also tracks the live ChatHistory objects so idle ones can give their memory back.
+    """
+
+    def __init__(self, path, idle_seconds=IDLE_SECONDS, ttl=HISTORY_TTL, reap_interval=REAP_INTERVAL):
+        self.path = path
+        self.idle_seconds = idle_seconds
+        self.ttl = ttl
+        self.reap_interval = reap_interval
+        self.live = weakref.WeakSet()
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.last_purge = 0.0
+        self.stats = {"spilled": 0, "loaded": 0, "reclaimed_sessions": 0, "purged": 0}
+        conn = self._connect()
+        conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def write(self, session_id, first_seq, messages):
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("INSERT OR REPLACE INTO chat_message (session_id, seq, role, content, stored_at) "
+                             "VALUES (?, ?, ?, ?, ?)",
+                             [(session_id, first_seq + i, message["role"], message["content"], now)
+                              for i, message in enumerate(messages)])
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        with self.lock:
+            self.stats["spilled"] += len(messages)
+
+    def load(self, session_id, start, stop):
+        """Messages [start, stop) of a session, in order."""
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT role, content FROM chat_message WHERE session_id = ? AND seq >= ? AND seq < ? "
+                                "ORDER BY seq", (session_id, start, stop)).fetchall()
+        finally:
+            conn.close()
+        with self.lock:
+            self.stats["loaded"] += len(rows)
+        return [{"role": role, "content": content} for role, content in rows]
+
+    def register(self, history):
+        with self.lock:
+            self.live.add(history)
+
+    def reclaim_idle(self, idle_seconds=None):
+        """Writes out and drops the in-memory window of every session idle for idle_seconds; returns how many."""
+        cutoff = time.monotonic() - (self.idle_seconds if idle_seconds is None else idle_seconds)
+        with self.lock:
+            histories = list(self.live)
+        reclaimed = sum(1 for history in histories if history.last_access <= cutoff and history.reclaim())
+        with self.lock:
+            self.stats["reclaimed_sessions"] += reclaimed
+        return reclaimed
+
+    def purge(self):
+        """Deletes sessions whose last message is older than the TTL."""
+        conn = self._connect()
+        try:
+            purged = conn.execute("DELETE FROM chat_message WHERE session_id IN (SELECT session_id FROM chat_message "
+                                  "GROUP BY session_id HAVING MAX(stored_at) < ?)", (time.time() - self.ttl,)).rowcount
+        finally:
+            conn.close()
+        with self.lock:
+            self.stats["purged"] += purged
+        return purged
+
+    def _run(self):
+        while not self.stop_event.wait(self.reap_interval):
+            try:
+                self.reclaim_idle()
+                if time.monotonic() - self.last_purge >= 60 * 60:
+                    self.last_purge = time.monotonic()
+                    self.purge()
+            except Exception as e:
+                print(f"Chat history reaper failed: {e}")
+
+    def start(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.stop_event.clear()
+                self.thread = threading.Thread(target=self._run, name="chat-history-reaper", daemon=True)
+                self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=1)
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            histories = list(self.live)
+        stats["live_sessions"] = len(histories)
+        stats["messages_in_memory"] = sum(len(history.recent) for history in histories)
+        return stats
+
+
+def tail(messages):
+    """ChatHistory.tail() for a ChatHistory or a plain message list (all of it in memory)."""
+    if isinstance(messages, ChatHistory):
+        return messages.tail()
+    return 0, messages
+
+
+class ChatHistory:
+    """
+    One session's messages, used like a list (len, append, indexing, slicing) by the chat pipeline.
+    Only the latest WINDOW messages stay in memory; older ones are spilled to the HistoryStore in
+    batches and read back only when asked for (e.g. "load earlier"). Indices are absolute.
+    """
+
+    def __init__(self, store, session_id=None, window=WINDOW, spill_batch=SPILL_BATCH):
+        self.store = store
+        self.session_id = session_id or uuid.uuid4().hex
+        self.window = window
+        self.spill_batch = spill_batch
+        self.recent = []
+        self.offset = 0         # absolute index of recent[0]
+        self.persisted = 0      # messages [0, persisted) are on disk
+        self.reclaimed = False
+        self.last_access = time.monotonic()
+        self.lock = threading.RLock()
+        store.register(self)
+
+    def __len__(self):
+        return self.offset + len(self.recent)
+
+    def _touch(self):
+        self.last_access = time.monotonic()
+        if self.reclaimed:
+            total = self.offset
+            self.offset = max(0, total - self.window)
+            self.recent = self.store.load(self.session_id, self.offset, total)
+            self.reclaimed = False
+
+    def _write_upto(self, stop):
+        if stop > self.persisted:
+            self.store.write(self.session_id, self.persisted, self.recent[self.persisted - self.offset:stop - self.offset])
+            self.persisted = stop
+
+    def append(self, message):
+        with self.lock:
+            self._touch()
+            self.recent.append({"role": message["role"], "content": message["content"]})
+            if len(self.recent) >= self.window + self.spill_batch:
+                cut = len(self) - self.window
+                self._write_upto(cut)
+                del self.recent[:cut - self.offset]
+                self.offset = cut
+
+    def reclaim(self):
+        """Writes every message to disk and drops the in-memory window (reloaded on next use)."""
+        with self.lock:
+            if self.reclaimed:
+                return False
+            self._write_upto(len(self))
+            self.offset += len(self.recent)
+            self.recent = []
+            self.reclaimed = True
+            return True
+
+    def _range(self, start, stop):
+        self._touch()
+        if start >= stop:
+            return []
+        messages = self.store.load(self.session_id, start, min(stop, self.offset)) if start < self.offset else []
+        return messages + self.recent[max(start, self.offset) - self.offset:max(0, stop - self.offset)]
+
+    def __getitem__(self, index):
+        with self.lock:
+            if isinstance(index, slice):
+                start, stop, step = index.indices(len(self))
+                return self._range(start, stop) if step == 1 else self._range(0, len(self))[index]
+            if index < 0:
+                index += len(self)
+            if not 0 <= index < len(self):
+                raise IndexError("chat history index out of range")
+            return self._range(index, index + 1)[0]
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def tail(self):
+        """(absolute index of the first in-memory message, those messages): the turn's view, no disk read."""
+        with self.lock:
+            self._touch()
+            return self.offset, list(self.recent)
+
+    def page(self, count):
+        """(start index, the latest `count` messages) for rendering."""
+        with self.lock:
+            start = max(0, len(self) - count)
+            return start, self._range(start, len(self))
@@ -0,0 +1,430 @@
+"""
+Headless chat API: runs chat_engine turns behind a small asyncio HTTP/1.1 server so the
+Streamlit app (or any client) only renders. Sessions live in utils.SESSION_DB_FILE, so any
+worker can serve any turn; --workers N pre-forks N processes on one listening socket.
+
+    python chat_server.py --port 8600 --workers 4
+    CHAT_API_URL=http://127.0.0.1:8600 streamlit run app.py
+
+    POST /v1/sessions                       -> 201 {"session_id"}
+    GET  /v1/sessions/{id}                  -> {"session_id", "turns", "messages"} (same API key only)
+    POST /v1/sessions/{id}/turns            {"prompt", "stream": true}
+         stream: chunked NDJSON events {"event": "wait" | "chunk" | "done" | "error", ...}
+         otherwise: {"text", "source", "latency_ms", ...}
+    GET  /v1/stats, /healthz (with the upstream health from the background prober)
+
+The Gemini API key comes from the X-Api-Key header or GOOGLE_API_KEY. A session belongs to the
+key that created it: any other key gets 404 for its transcript and its turns.
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import chat_engine
+import conversation_memory
+import pnr_cache
+import rate_limiter
+import session_store
+import tracing
+import utils
+
+HOST = "127.0.0.1"
+PORT = 8600
+WORKERS = 1
+TURN_THREADS = 32           # concurrent turns per worker (each mostly waits on Gemini / upstream I/O)
+PNR_CACHE_SESSIONS = 1024   # sessions whose PNR lookups a worker keeps (in memory, never in the session store)
+MAX_BODY_BYTES = 64 * 1024
+MAX_PROMPT_CHARS = 4000
+KEEPALIVE_TIMEOUT = 75.0
+SHUTDOWN_GRACE = 30.0       # seconds running turns get to finish (and release their leases) on SIGTERM
+
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+           405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large", 429: "Too Many Requests",
+           500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def error_status(error):
+    """HTTP status and user-facing message for an exception raised by a turn."""
+    if isinstance(error, HttpError):
+        return error.status, str(error)
+    if isinstance(error, session_store.SessionNotFound):
+        return 404, "세션을 찾을 수 없습니다."
+    if isinstance(error, session_store.SessionBusy):
+        return 409, "이전 질문에 대한 답변을 아직 생성하고 있습니다."
+    if isinstance(error, rate_limiter.RateLimited):
+        return 429, f"⚠️ {error} 잠시 후 다시 시도해주세요."
+    if chat_engine.is_quota_error(error):
+        return 429, "⚠️ API 사용량이 초과되었습니다 (Quota Exceeded). 잠시 후 다시 시도해주세요."
+    return 500, f"오류가 발생했습니다: {error}"
+
+
+class ChatService:
+    """
+    One worker's turn runner: leases the session, runs chat_engine.stream_turn on a thread pool
+    and hands the chunks back to the event loop.
+    """
+
+    def __init__(self, store, model=None, limiter=None, api_key=None, threads=TURN_THREADS):
+        self.store = store
+        self.model = model          # None: chat_engine.get_model(api_key) per key
+        self.limiter = limiter
+        self.api_key = api_key
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="chat-turn")
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.lock = threading.Lock()
+        self.stats = {"turns": 0, "errors": 0, "in_flight": 0, "busy": 0}
+        self.pnr_caches = OrderedDict()
+
+    def _pnr_cache(self, session_id):
+        """The session's own PnrCache in this worker (a turn served by another worker starts empty)."""
+        with self.lock:
+            cache = self.pnr_caches.pop(session_id, None) or pnr_cache.PnrCache()
+            self.pnr_caches[session_id] = cache
+            while len(self.pnr_caches) > PNR_CACHE_SESSIONS:
+                self.pnr_caches.popitem(last=False)
+            return cache
+
+    def create_session(self, api_key):
+        return self.store.create(conversation_memory.new_memory(), api_key)
+
+    def _work(self, session_id, prompt, api_key, stream, emit):
+        """Runs one turn on a pool thread; every event goes through emit(), the last one is None."""
+        turn_owner = f"{self.owner}:{threading.get_ident()}"
+        with self.lock:
+            self.stats["in_flight"] += 1
+        try:
+            session = self.store.begin_turn(session_id, turn_owner, api_key)
+            session["pnr_cache"] = self._pnr_cache(session_id)
+            try:
+                result = {}
+                on_wait = lambda seconds, position: emit({"event": "wait", "seconds": round(seconds, 1),
+                                                          "position": position})
+                for chunk in chat_engine.stream_turn(session, prompt, self.model, api_key, self.limiter, stream,
+                                                     on_wait, result):
+                    emit({"event": "chunk", "text": chunk})
+                # The text already went out as chunks
+                emit({"event": "done", **{key: round(value, 1) if isinstance(value, float) else value
+                                          for key, value in result.items() if key != "text"}})
+                with self.lock:
+                    self.stats["turns"] += 1
+            finally:
+                self.store.end_turn(session_id, turn_owner, session)
+        except Exception as e:
+            status, message = error_status(e)
+            with self.lock:
+                self.stats["busy" if status == 409 else "errors"] += 1
+            emit({"event": "error", "status": status, "error": message})
+        finally:
+            with self.lock:
+                self.stats["in_flight"] -= 1
+            emit(None)
+
+    async def run_turn(self, session_id, prompt, api_key, stream):
+        """Async iterator of the turn's events."""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        emit = lambda event: loop.call_soon_threadsafe(queue.put_nowait, event)
+        loop.run_in_executor(self.executor, contextvars.copy_context().run,
+                             self._work, session_id, prompt, api_key, stream, emit)
+        while (event := await queue.get()) is not None:
+            yield event
+
+    def idle(self):
+        """True when no turn is running on this worker."""
+        with self.lock:
+            return self.stats["in_flight"] == 0
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats, pnr_cache_sessions=len(self.pnr_caches))
+        stats.update(pid=os.getpid(), sessions=self.store.get_stats())
+        return stats
+
+
+async def read_request(reader):
+    """(method, path, headers, body) of the next request on a keep-alive connection, or None at EOF."""
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEPALIVE_TIMEOUT)
+    except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+        return None
+    except asyncio.LimitOverrunError:
+        raise HttpError(413, "헤더가 너무 깁니다.")
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, path, _ = lines[0].split(" ", 2)
+    except ValueError:
+        raise HttpError(400, "잘못된 요청입니다.")
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise HttpError(400, "잘못된 Content-Length입니다.")
+    if length > MAX_BODY_BYTES:
+        raise HttpError(413, "요청 본문이 너무 깁니다.")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), path.split("?", 1)[0], headers, body
+
+
+def response_head(status, headers):
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, 'OK')}"] + [f"{name}: {value}" for name, value in headers]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def send_json(writer, status, payload, keep_alive=True):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    writer.write(response_head(status, [("Content-Type", "application/json; charset=utf-8"),
+                                        ("Content-Length", len(body)),
+                                        ("Connection", "keep-alive" if keep_alive else "close")]) + body)
+    await writer.drain()
+
+
+class ChatServer:
+    def __init__(self, service, default_api_key=None):
+        self.service = service
+        self.default_api_key = default_api_key
+        self.connections = {}       # handle task -> writer
+        self.busy = set()           # writers with a request being answered
+        self.closing = False
+
+    def api_key(self, headers):
+        """The caller's Gemini key ("local" when there is none), which also owns the sessions it creates."""
+        return headers.get("x-api-key") or self.default_api_key or "local"
+
+    async def handle(self, reader, writer):
+        self.connections[asyncio.current_task()] = writer
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HttpError as e:
+                    await send_json(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close" and not self.closing
+                self.busy.add(writer)
+                try:
+                    await self.route(writer, method, path, headers, body, keep_alive)
+                except HttpError as e:
+                    await send_json(writer, e.status, {"error": str(e)}, keep_alive)
+                finally:
+                    self.busy.discard(writer)
+                if not keep_alive or self.closing:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            # Cancelled: the worker is shutting down and this connection outlived the grace period
+            pass
+        finally:
+            self.connections.pop(asyncio.current_task(), None)
+            writer.close()
+
+    async def shutdown(self, grace=SHUTDOWN_GRACE):
+        """
+        After the listening socket stopped accepting: lets running turns finish (their leases are
+        released by end_turn) for up to `grace` seconds, then closes the idle keep-alive connections.
+        """
+        self.closing = True
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + grace
+        while not self.service.idle() and loop.time() < deadline:
+            await asyncio.sleep(0.05)
+        for writer in list(self.connections.values()):
+            if writer not in self.busy:
+                writer.close()      # the handler's pending read sees EOF and returns
+        if self.connections:
+            await asyncio.wait(list(self.connections), timeout=max(0.1, deadline - loop.time()))
+
+    async def route(self, writer, method, path, headers, body, keep_alive):
+        parts = [part for part in path.split("/") if part]
+        if parts == ["healthz"]:
+            return await send_json(writer, 200, {"ok": True, "pid": os.getpid(),
+                                                 "upstreams": utils.get_upstream_health()}, keep_alive)
+        if parts == ["v1", "stats"]:
+            return await send_json(writer, 200, self.service.get_stats(), keep_alive)
+        if parts[:2] != ["v1", "sessions"]:
+            raise HttpError(404, "없는 경로입니다.")
+        if len(parts) == 2:
+            if method != "POST":
+                raise HttpError(405, "POST만 지원합니다.")
+            session_id = await asyncio.get_running_loop().run_in_executor(
+                self.service.executor, self.service.create_session, self.api_key(headers))
+            return await send_json(writer, 201, {"session_id": session_id}, keep_alive)
+        if len(parts) == 3 and method == "GET":
+            session = await asyncio.get_running_loop().run_in_executor(
+                self.service.executor, self.service.store.get, parts[2], self.api_key(headers))
+            if session is None:
+                raise HttpError(404, "세션을 찾을 수 없습니다.")
+            return await send_json(writer, 200, {"session_id": parts[2], "turns": session["turns"],
+                                                 "messages": session["messages"]}, keep_alive)
+        if len(parts) == 4 and parts[3] == "turns" and method == "POST":
+            return await self.turn(writer, parts[2], headers, body, keep_alive)
+        raise HttpError(404, "없는 경로입니다.")
+
+    async def turn(self, writer, session_id, headers, body, keep_alive):
+        try:
+            request = json.loads(body or b"{}")
+            prompt = str(request.get("prompt") or "").strip()
+        except (ValueError, AttributeError):
+            raise HttpError(400, "요청 본문은 JSON이어야 합니다.")
+        if not prompt:
+            raise HttpError(400, "prompt가 비어 있습니다.")
+        if len(prompt) > MAX_PROMPT_CHARS:
+            raise HttpError(413, f"질문은 {MAX_PROMPT_CHARS}자 이내로 입력해 주세요.")
+        api_key = self.api_key(headers)
+        if api_key == "local" and self.service.model is None:
+            raise HttpError(401, "API Key가 필요합니다.")
+        events = self.service.run_turn(session_id, prompt, api_key, bool(request.get("stream", True)))
+
+        if not request.get("stream", True):
+            text, result = [], None
+            async for event in events:
+                if event["event"] == "chunk":
+                    text.append(event["text"])
+                elif event["event"] in ("done", "error"):
+                    result = event
+            if result["event"] == "error":
+                return await send_json(writer, result["status"], {"error": result["error"]}, keep_alive)
+            result.pop("event")
+            return await send_json(writer, 200, {"text": "".join(text), **result}, keep_alive)
+
+        # Errors before the first chunk (unknown session, busy, quota) get their own status;
+        # once streaming has started they arrive as an "error" event
+        first = await events.__anext__()
+        if first["event"] == "error":
+            async for _ in events:
+                pass
+            return await send_json(writer, first["status"], {"error": first["error"]}, keep_alive)
+        writer.write(response_head(200, [("Content-Type", "application/x-ndjson; charset=utf-8"),
+                                         ("Transfer-Encoding", "chunked"), ("Cache-Control", "no-cache"),
+                                         ("Connection", "keep-alive" if keep_alive else "close")]))
+        event = first
+        while True:
+            data = json.dumps(event, ensure_ascii=False).encode("utf-8") + b"\n"
+            writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+            await writer.drain()
+            try:
+                event = await events.__anext__()
+            except StopAsyncIteration:
+                break
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+
+def build_service(fake_model=False, model_ttft=0.3, chunk_delay=0.02):
+    model = None
+    if fake_model:
+        import fakes
+
+        _, system_instruction = utils.get_system_prefix()
+        model = fakes.FakeGenerativeModel(system_instruction=system_instruction, tools=chat_engine.TOOLS,
+                                          ttft=model_ttft, chunk_delay=chunk_delay, tool_calls=fakes.realistic_tool_calls)
+    limiter = None if fake_model else utils.get_rate_limiter()
+    return ChatService(utils.get_session_store(), model=model, limiter=limiter,
+                       api_key=os.environ.get("GOOGLE_API_KEY"))
+
+
+def serve(sock, args):
+    """Runs one worker on the shared listening socket until SIGTERM/SIGINT."""
+    if args.upstream:
+        import fakes
+
+        utils.FLIGHT_API_BASE_URL = args.upstream
+        utils.FLIGHT_OPERATION_INFO_API_URL = args.upstream + fakes.FLIGHT_OPERATION_INFO_PATH
+        utils.PNR_DETAIL_API_URL = args.upstream + fakes.PNR_DETAIL_PATH
+        utils.OPERATION_CONFIRMATION_API_URL = args.upstream + fakes.OPERATION_CONFIRMATION_PATH
+    service = build_service(args.fake_model, args.model_ttft, args.chunk_delay)
+    utils.get_email_queue()
+    if utils.HEALTH_PROBE_ENABLED:
+        utils.start_health_prober()
+    if utils.PREFETCH_ENABLED and not args.upstream:
+        # Every worker has its own flight cache, so every worker keeps its own copy warm
+        utils.start_flight_prefetch()
+    service.store.purge_idle()
+    server = ChatServer(service, service.api_key)
+
+    async def main():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
+        listener = await asyncio.start_server(server.handle, sock=sock, limit=MAX_BODY_BYTES)
+        await stop.wait()
+        listener.close()    # no new connections; the other workers keep serving
+        await server.shutdown()
+        # Turns still queued never took a lease; anything past the grace period is abandoned
+        service.executor.shutdown(wait=False, cancel_futures=True)
+
+    asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT, help="0 picks a free port (printed on startup)")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--fake-model", action="store_true", help="fakes.FakeGenerativeModel instead of Gemini")
+    parser.add_argument("--model-ttft", type=float, default=0.3)
+    parser.add_argument("--chunk-delay", type=float, default=0.02)
+    parser.add_argument("--upstream", help="base URL replacing every jinair upstream (e.g. a fakes.StubUpstream)")
+    parser.add_argument("--data-dir", help="directory for the SQLite files (sessions, chat history, FAQ store, "
+                                           "usage log, rate limits, email queue) and the trace file")
+    args = parser.parse_args()
+    if args.data_dir:
+        for name in ("SESSION_DB_FILE", "HISTORY_DB_FILE", "FAQ_STORE_FILE", "USAGE_DB_FILE", "USAGE_LOG_FILE",
+                     "RATE_LIMIT_DB_FILE", "EMAIL_QUEUE_DB_FILE"):
+            setattr(utils, name, os.path.join(args.data_dir, os.path.basename(getattr(utils, name))))
+        tracing.configure(path=os.path.join(args.data_dir, os.path.basename(tracing.TRACE_FILE)))
+
+    # One listening socket shared by every worker; the kernel hands each connection to one of them
+    sock = socket.create_server((args.host, args.port), backlog=1024)
+    sock.set_inheritable(True)
+    print(json.dumps({"listening": f"http://{args.host}:{sock.getsockname()[1]}", "workers": args.workers}),
+          flush=True)
+    if args.workers <= 1:
+        serve(sock, args)
+        return
+
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=serve, args=(sock, args), name=f"chat-worker-{i}") for i in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    stopping = False
+
+    def stop(*_):
+        nonlocal stopping
+        stopping = True
+        for worker in workers:
+            if worker.is_alive():
+                os.kill(worker.pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    while not stopping and all(worker.is_alive() for worker in workers):
+        time.sleep(0.5)
+    stop()
+    for worker in workers:
+        worker.join()
+
+
+if __name__ == "__main__":
+    main()
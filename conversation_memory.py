@@ -0,0 +1,133 @@
+import re
+
+import intent_router
+import utils
+
+HISTORY_TOKEN_BUDGET = 400     # verbatim recent turns
+MESSAGE_TOKEN_CAP = 150        # long (tool-derived) answers are clipped to this
+SUMMARY_TOKEN_BUDGET = 150
+SUMMARY_EVERY_N_TURNS = 4      # refresh the rolling summary at most this often
+SUMMARY_LINE_CHARS = 60
+
+EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)+")
+
+SLOT_LABELS = {
+    "pnr": "예약번호", "last_name": "성", "first_name": "이름", "date": "날짜",
+    "flight_no": "편명", "departure": "출발", "arrival": "도착", "email": "이메일",
+}
+
+
+def new_memory():
+    return {"slots": {}, "summary_lines": [], "summarized_upto": 0, "scanned_upto": 0, "last_refresh_turn": 0,
+            "user_turns": 0}
+
+
+def extract_slots(text, now=None):
+    """Pulls the slots tools need (PNR, names, date, flight, route, e-mail) out of one user message."""
+    text = str(text)
+    slots = {}
+    flight_nos = intent_router.FLIGHT_NO_RE.findall(text)
+    if flight_nos:
+        slots["flight_no"] = f"LJ{flight_nos[-1]}"
+    dates = intent_router.extract_dates(text, now)
+    if len(dates) == 1:
+        slots["date"] = next(iter(dates))
+    names = intent_router.extract_names(text)
+    if names is not None:
+        slots["first_name"], slots["last_name"] = names
+    name_tokens = set(names or ())
+    # "KIM/MINSU" must not count as an airport code
+    airports = [a for a in intent_router.extract_airports(text) if a[1] not in name_tokens]
+    pair = intent_router._route_pair(airports)
+    if pair is not None:
+        slots["departure"], slots["arrival"] = pair
+    pnrs = [token for token in intent_router.PNR_TOKEN_RE.findall(text)
+            if token not in name_tokens and not token.isdigit() and token not in dates]
+    if len(pnrs) == 1:
+        slots["pnr"] = pnrs[0]
+    email = EMAIL_RE.search(text)
+    if email:
+        slots["email"] = email.group(0)
+    return slots
+
+
+def clip_to_tokens(text, max_tokens):
+    text = str(text)
+    if utils.estimate_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if utils.estimate_tokens(text[:mid]) <= max_tokens - 1:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low] + "…"
+
+
+def _summary_line(message):
+    content = " ".join(str(message["content"]).split())
+    if len(content) > SUMMARY_LINE_CHARS:
+        content = content[:SUMMARY_LINE_CHARS] + "…"
+    return f"- {content}"
+
+
+def _select_window(messages, budget):
+    """Index of the oldest message that still fits the token budget (newest first, never before messages[0])."""
+    used = 0
+    start = len(messages)
+    for i in range(len(messages) - 1, -1, -1):
+        cost = utils.estimate_tokens(clip_to_tokens(messages[i]["content"], MESSAGE_TOKEN_CAP))
+        if used + cost > budget:
+            break
+        used += cost
+        start = i
+    # Gemini history should start with a user turn
+    while start < len(messages) and messages[start]["role"] != "user":
+        start += 1
+    return start
+
+
+def build_history(messages, memory, budget=HISTORY_TOKEN_BUDGET, every_n=SUMMARY_EVERY_N_TURNS, offset=0):
+    """
+    Returns (history_for_api, memory_context) for the next model call.
+    Recent messages are kept verbatim up to `budget` tokens (each clipped to MESSAGE_TOKEN_CAP);
+    older turns survive as the known-slots record and a rolling summary refreshed every `every_n` turns.
+    `memory` (from new_memory) is updated in place and should live in the session state.
+    `messages` may be only the latest part of the conversation, messages[0] being message number
+    `offset` (chat_history keeps older ones on disk); nothing before it is read, and the positions
+    in `memory` are absolute.
+    """
+    for message in messages[max(0, memory["scanned_upto"] - offset):]:
+        if message["role"] == "user":
+            memory["slots"].update(extract_slots(message["content"]))
+            memory["user_turns"] += 1
+    memory["scanned_upto"] = offset + len(messages)
+
+    start = offset + _select_window(messages, budget)
+    turn = memory["user_turns"]
+    if start > memory["summarized_upto"] and turn - memory["last_refresh_turn"] >= every_n:
+        # What the customer asked is kept; answers are dropped (their slots are already in the record)
+        memory["summary_lines"].extend(
+            _summary_line(m) for m in messages[max(0, memory["summarized_upto"] - offset):start - offset]
+            if m["role"] == "user")
+        while memory["summary_lines"] and utils.estimate_tokens("\n".join(memory["summary_lines"])) > SUMMARY_TOKEN_BUDGET:
+            memory["summary_lines"].pop(0)
+        memory["summarized_upto"] = start
+        memory["last_refresh_turn"] = turn
+
+    history_for_api = []
+    for message in messages[start - offset:]:
+        role = "user" if message["role"] == "user" else "model"
+        history_for_api.append({"role": role, "parts": [clip_to_tokens(message["content"], MESSAGE_TOKEN_CAP)]})
+    return history_for_api, format_memory_context(memory)
+
+
+def format_memory_context(memory):
+    parts = []
+    if memory["slots"]:
+        known = ", ".join(f"{SLOT_LABELS[key]} {value}" for key, value in memory["slots"].items() if key in SLOT_LABELS)
+        parts.append(f"[고객이 앞서 알려준 정보] {known}")
+    if memory["summary_lines"]:
+        parts.append("[이전 대화에서 고객이 문의한 내용]\n" + "\n".join(memory["summary_lines"]))
+    return "\n".join(parts)
@@ -0,0 +1,239 @@
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+# A repeat request for the same flight/date/email inside this window returns the existing job
+DEDUPE_WINDOW = 10 * 60.0
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 5.0          # seconds before the first retry, doubled per attempt (full jitter)
+BACKOFF_MAX = 5 * 60.0
+WORKERS = 2
+POLL_INTERVAL = 2.0         # workers also wake up immediately when a job is enqueued
+LEASE_SECONDS = 60.0        # a "sending" job whose worker died is picked up again after this
+BUSY_TIMEOUT_MS = 5000
+
+# Job states
+QUEUED = "queued"
+SENDING = "sending"
+RETRYING = "retrying"
+SENT = "sent"
+FAILED = "failed"
+
+# Outcomes returned by the send callable
+OUTCOME_SENT = "sent"
+OUTCOME_RETRY = "retry"     # the request certainly did not go through (connection refused, 503/429, circuit open)
+OUTCOME_FAILED = "failed"   # rejected, or unknown whether it was sent: never retried so no email goes out twice
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS email_job (
+    id TEXT PRIMARY KEY,
+    dedupe_key TEXT NOT NULL,
+    flight_date TEXT NOT NULL,
+    flight_number TEXT NOT NULL,
+    email TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    lease_until REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    sent_at REAL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS email_job_dedupe ON email_job (dedupe_key, created_at);
+CREATE INDEX IF NOT EXISTS email_job_due ON email_job (status, next_attempt_at);
+"""
+COLUMNS = ["id", "flight_date", "flight_number", "email", "status", "attempts", "next_attempt_at", "last_error",
+           "created_at", "updated_at", "sent_at"]
+
+
+def normalize_request(flight_date, flight_number, email):
+    """'lj 507' / '507' -> 'LJ507', email lower-cased, date digits only."""
+    date = ''.join(filter(str.isdigit, str(flight_date)))
+    number = str(flight_number).replace(" ", "").upper()
+    if number.isdigit():
+        number = "LJ" + number
+    return date, number, str(email).strip().lower()
+
+
+def dedupe_key(flight_date, flight_number, email):
+    return "|".join(normalize_request(flight_date, flight_number, email))
+
+
+def _backoff(attempts, base):
+    return random.uniform(base / 2, min(BACKOFF_MAX, base * (2 ** (attempts - 1))))
+
+
+class EmailQueue:
+    """
+    Durable queue of operation-confirmation emails in SQLite. enqueue() returns at once with a job id;
+    worker threads send in the background and retry only failures that certainly did not reach the
+    email service. Every process serving the app can run workers: a job is claimed in a transaction,
+    so it is sent by one worker only.
+    """
+
+    def __init__(self, path, send, workers=WORKERS, dedupe_window=DEDUPE_WINDOW, max_attempts=MAX_ATTEMPTS,
+                 backoff_base=BACKOFF_BASE, poll_interval=POLL_INTERVAL):
+        self.path = path
+        self.send = send              # send(flight_date, flight_number, email) -> (outcome, detail)
+        self.workers = workers
+        self.dedupe_window = dedupe_window
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.poll_interval = poll_interval
+        self.wakeup = threading.Event()
+        self.stop_event = threading.Event()
+        self.threads = []
+        self.lock = threading.Lock()
+        self.stats = {"enqueued": 0, "deduplicated": 0, "sent": 0, "retried": 0, "failed": 0}
+        conn = self._connect()
+        conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def enqueue(self, flight_date, flight_number, email):
+        """Returns (job, created). A job for the same request inside the dedupe window is returned instead."""
+        flight_date, flight_number, email = normalize_request(flight_date, flight_number, email)
+        key = f"{flight_date}|{flight_number}|{email}"
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # Failed jobs don't block a new request; everything else (even sent) does within the window
+            row = conn.execute("SELECT * FROM email_job WHERE dedupe_key = ? AND created_at >= ? AND status != ? "
+                               "ORDER BY created_at DESC LIMIT 1", (key, now - self.dedupe_window, FAILED)).fetchone()
+            if row is not None:
+                conn.execute("COMMIT")
+                with self.lock:
+                    self.stats["deduplicated"] += 1
+                return self._job(row), False
+            job_id = uuid.uuid4().hex[:10].upper()
+            conn.execute("INSERT INTO email_job (id, dedupe_key, flight_date, flight_number, email, status, attempts, "
+                         "next_attempt_at, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?, ?)",
+                         (job_id, key, flight_date, flight_number, email, QUEUED, now, now, now))
+            conn.execute("COMMIT")
+            row = conn.execute("SELECT * FROM email_job WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        with self.lock:
+            self.stats["enqueued"] += 1
+        self.wakeup.set()
+        return self._job(row), True
+
+    def get(self, job_id):
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM email_job WHERE id = ?", (str(job_id).strip().upper(),)).fetchone()
+        finally:
+            conn.close()
+        return self._job(row) if row is not None else None
+
+    def _job(self, row):
+        return {column: row[column] for column in COLUMNS}
+
+    def _claim(self):
+        """Atomically takes the next due job (or an expired lease) and marks it as sending."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT * FROM email_job WHERE (status IN (?, ?) AND next_attempt_at <= ?) "
+                "OR (status = ? AND lease_until < ?) ORDER BY next_attempt_at LIMIT 1",
+                (QUEUED, RETRYING, now, SENDING, now)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            if row["status"] == SENDING:
+                # The previous worker died mid-send: whether the email went out is unknown
+                conn.execute("UPDATE email_job SET status = ?, last_error = ?, updated_at = ? WHERE id = ?",
+                             (FAILED, "발송 중 작업이 중단되었습니다 (발송 여부 확인 필요)", now, row["id"]))
+                conn.execute("COMMIT")
+                with self.lock:
+                    self.stats["failed"] += 1
+                return self._claim()
+            conn.execute("UPDATE email_job SET status = ?, attempts = attempts + 1, lease_until = ?, updated_at = ? "
+                         "WHERE id = ?", (SENDING, now + LEASE_SECONDS, now, row["id"]))
+            conn.execute("COMMIT")
+            return self._job(row)
+        finally:
+            conn.close()
+
+    def _finish(self, job, outcome, detail):
+        now = time.time()
+        attempts = job["attempts"] + 1
+        if outcome == OUTCOME_SENT:
+            update = (SENT, now, None, now)
+            stat = "sent"
+        elif outcome == OUTCOME_RETRY and attempts < self.max_attempts:
+            update = (RETRYING, now + _backoff(attempts, self.backoff_base), detail, None)
+            stat = "retried"
+        else:
+            update = (FAILED, now, detail, None)
+            stat = "failed"
+        conn = self._connect()
+        try:
+            conn.execute("UPDATE email_job SET status = ?, next_attempt_at = ?, last_error = ?, sent_at = ?, "
+                         "lease_until = NULL, updated_at = ? WHERE id = ?", (*update, now, job["id"]))
+        finally:
+            conn.close()
+        with self.lock:
+            self.stats[stat] += 1
+
+    def run_once(self):
+        """Sends one due job if there is one; returns True when a job was processed."""
+        job = self._claim()
+        if job is None:
+            return False
+        try:
+            outcome, detail = self.send(job["flight_date"], job["flight_number"], job["email"])
+        except Exception as e:
+            # Unexpected error inside the sender: the request may have gone out, don't retry
+            outcome, detail = OUTCOME_FAILED, str(e)
+        self._finish(job, outcome, None if detail is None else str(detail)[:500])
+        return True
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                if self.run_once():
+                    continue
+            except Exception as e:
+                print(f"Email queue worker failed: {e}")
+            self.wakeup.wait(self.poll_interval)
+            self.wakeup.clear()
+
+    def start(self):
+        with self.lock:
+            self.threads = [thread for thread in self.threads if thread.is_alive()]
+            self.stop_event.clear()
+            while len(self.threads) < self.workers:
+                thread = threading.Thread(target=self._run, name=f"email-queue-{len(self.threads)}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        self.wakeup.set()
+        for thread in self.threads:
+            thread.join(timeout=self.poll_interval + 1)
+
+    def get_stats(self):
+        conn = self._connect()
+        try:
+            by_status = dict(conn.execute("SELECT status, COUNT(*) FROM email_job GROUP BY status").fetchall())
+        finally:
+            conn.close()
+        with self.lock:
+            stats = dict(self.stats)
+        stats["jobs"] = by_status
+        return stats
@@ -0,0 +1,416 @@
+"""
+Local stand-ins for the jinair upstreams and the Gemini model, used by verify_*/bench_* scripts.
+Nothing here touches the real extapi/ccs/ccsstg endpoints or the Gemini API.
+"""
+import json
+import random
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import intent_router
+import utils
+
+FLIGHT_OPERATION_INFO_PATH = "/event/getFlightOpererationInfo"
+PNR_DETAIL_PATH = "/event/getPnrDetail"
+OPERATION_CONFIRMATION_PATH = "/event/sendOperationConfirmation"
+FLIGHT_SCHEDULE_PATH = "/API/Flight"
+
+
+def sample_flight_operation_info(date, departure, arrival, flights=12):
+    """Builds a FlightInfo payload shaped like getFlightOpererationInfo, including the display-only fields."""
+    info = []
+    for i in range(flights):
+        hour = 6 + i
+        info.append({
+            "FlightNo": str(201 + i * 2),
+            "FlightDate": date,
+            "Departure": departure,
+            "Arrival": arrival,
+            "DepartureScheduleTime": f"{hour:02d}:00",
+            "DepartureActualTime": f"{hour:02d}:{5 * (i % 3):02d}",
+            "ArrivalScheduleTime": f"{hour + 1:02d}:10",
+            "ArrivalActualTime": f"{hour + 1:02d}:{10 + 5 * (i % 3):02d}",
+            "DepartureScheduleTitle": "출발예정",
+            "ArrivalScheduleTitle": "도착예정",
+            "DepartureDisplayTitle": "정시출발" if i % 3 == 0 else "지연출발",
+            "ArrivalDisplayTitle": "정시도착" if i % 3 == 0 else "지연도착",
+            "Status": "도착" if i % 5 else "지연",
+            "DepartureAirportName": f"{departure} 공항",
+            "ArrivalAirportName": f"{arrival} 공항",
+            "AircraftType": "B737-800",
+            "Gate": str(10 + i),
+            "Terminal": "T1",
+            "CodeShare": "",
+            "Remark": "",
+        })
+    return {"FlightInfo": info}
+
+
+def sample_pnr_detail(pnr, first_name="GILDONG", last_name="HONG", departure_date="20240206"):
+    """Builds a getPnrDetail payload (guestDetails / itineraryDetails)."""
+    date = f"{departure_date[:4]}-{departure_date[4:6]}-{departure_date[6:]}"
+    return {
+        "pnrNumber": pnr,
+        "guestDetails": [
+            {"firstName": first_name, "lastName": last_name, "paxType": "ADT", "gender": "M", "dateOfBirth": "19900101"},
+            {"firstName": "CHUNHYANG", "lastName": "SEONG", "paxType": "ADT", "gender": "F", "dateOfBirth": "19920202"},
+        ],
+        "itineraryDetails": [{
+            "itinerarySegments": [{
+                "flightNumber": "LJ201",
+                "departureAirport": "ICN",
+                "arrivalAirport": "BKK",
+                "departureDateTime": f"{date}T10:00:00",
+                "arrivalDateTime": f"{date}T14:00:00",
+                "bookingClass": "Y",
+                "segmentStatus": "HK",
+            }]
+        }],
+    }
+
+
+def sample_flight_schedule(departure, arrival, date, flights=10):
+    """Builds an /API/Flight schedule payload."""
+    items = []
+    for i in range(flights):
+        dep = 7 * 60 + i * 75
+        duration = 65 + (i * 7) % 20
+        items.append({
+            "flightNo": f"LJ{301 + i * 2}",
+            "departure": departure,
+            "arrival": arrival,
+            "date": date,
+            "departureTime": f"{dep // 60:02d}{dep % 60:02d}",
+            "arrivalTime": f"{(dep + duration) // 60:02d}{(dep + duration) % 60:02d}",
+            "duration": duration,
+        })
+    return {"flights": items}
+
+
+class StubUpstream:
+    """
+    Threaded HTTP server that answers the four upstream endpoints.
+
+    latency: seconds to sleep before answering (or a callable(path) -> seconds)
+    error_rate: probability of answering 503
+    fail_next: number of upcoming requests answered with 503 regardless of error_rate
+    fail_status: status code of those failures (503 by default)
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, flights_per_route=12):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.fail_next = 0
+        self.fail_status = 503
+        self.flights_per_route = flights_per_route
+        self.unknown_pnrs = set()   # answered with a not-found payload
+        self.calls = {}
+        self.connections = set()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def call_count(self, path=None):
+        with self.lock:
+            if path is None:
+                return sum(self.calls.values())
+            return self.calls.get(path, 0)
+
+    def point_utils_at(self):
+        """Redirects utils' upstream URLs to this stub."""
+        utils.FLIGHT_API_BASE_URL = self.url
+        utils.FLIGHT_OPERATION_INFO_API_URL = self.url + FLIGHT_OPERATION_INFO_PATH
+        utils.PNR_DETAIL_API_URL = self.url + PNR_DETAIL_PATH
+        utils.OPERATION_CONFIRMATION_API_URL = self.url + OPERATION_CONFIRMATION_PATH
+
+    def respond(self, method, path, params):
+        if path == FLIGHT_OPERATION_INFO_PATH:
+            return sample_flight_operation_info(params.get("date", ""), params.get("departure", ""),
+                                                params.get("arrival", ""), self.flights_per_route)
+        if path == PNR_DETAIL_PATH:
+            if params.get("searchNumber") in self.unknown_pnrs:
+                return {"resultCode": "NOT_FOUND", "resultMessage": "예약 정보가 없습니다."}
+            return sample_pnr_detail(params.get("searchNumber", ""))
+        if path == OPERATION_CONFIRMATION_PATH:
+            return {"result": "success", "email": params.get("email")}
+        if path == FLIGHT_SCHEDULE_PATH:
+            return sample_flight_schedule(params.get("departure", ""), params.get("arrival", ""), params.get("date", ""))
+        return None
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _handle(self, method):
+                parts = urlsplit(self.path)
+                params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    params.update(json.loads(self.rfile.read(length) or b"{}"))
+
+                with stub.lock:
+                    stub.calls[parts.path] = stub.calls.get(parts.path, 0) + 1
+                    stub.connections.add(self.client_address)
+                    fail = stub.fail_next > 0 or random.random() < stub.error_rate
+                    if stub.fail_next > 0:
+                        stub.fail_next -= 1
+                    stub.in_flight += 1
+                    stub.peak_in_flight = max(stub.peak_in_flight, stub.in_flight)
+
+                delay = stub.latency(parts.path) if callable(stub.latency) else stub.latency
+                if delay:
+                    time.sleep(delay)
+                with stub.lock:
+                    stub.in_flight -= 1
+
+                body = None if fail else stub.respond(method, parts.path, params)
+                status = stub.fail_status if fail else (200 if body is not None else 404)
+                data = json.dumps(body if body is not None else {"error": "unavailable"}, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+        return Handler
+
+
+# --- Fake Gemini backend ---
+
+class FakeFunctionCall:
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+
+class FakePart:
+    def __init__(self, text="", function_call=None):
+        self.text = text
+        self.function_call = function_call
+
+
+class FakeContent:
+    def __init__(self, parts, role="model"):
+        self.parts = parts
+        self.role = role
+
+
+class FakeCandidate:
+    def __init__(self, parts):
+        self.content = FakeContent(parts)
+
+
+class FakeUsage:
+    def __init__(self, prompt_token_count, candidates_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+
+class FakeResponse:
+    """Mimics GenerateContentResponse; iterating a streamed response yields one chunk per text part."""
+
+    def __init__(self, parts, usage, chunk_delay=0.0, stream=False):
+        self.candidates = [FakeCandidate(parts)]
+        self.usage_metadata = usage
+        self.chunk_delay = chunk_delay
+        self.stream = stream
+
+    @property
+    def text(self):
+        return "".join(part.text for part in self.candidates[0].content.parts if part.text)
+
+    @property
+    def parts(self):
+        return self.candidates[0].content.parts
+
+    def __iter__(self):
+        for i, part in enumerate(self.candidates[0].content.parts):
+            if i and self.chunk_delay:
+                time.sleep(self.chunk_delay)
+            yield FakeResponse([part], self.usage_metadata)
+
+
+try:
+    from google.api_core.exceptions import ResourceExhausted
+except ImportError:
+    class ResourceExhausted(Exception):
+        """Stand-in for google.api_core.exceptions.ResourceExhausted when the SDK is not installed."""
+
+
+class FakeModelError(Exception):
+    """Transient model-side failure (503/500)."""
+
+
+class FakeQuota:
+    """Gemini-style quota shared by fake models: requests and tokens per sliding `window` seconds."""
+
+    def __init__(self, rpm=10, tpm=250000, window=60.0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window = window
+        self.requests = []    # (time, tokens)
+        self.rejected = 0
+        self.accepted = 0
+        self.lock = threading.Lock()
+
+    def charge(self, tokens):
+        now = time.monotonic()
+        with self.lock:
+            self.requests = [(t, n) for t, n in self.requests if t > now - self.window]
+            if len(self.requests) >= self.rpm or sum(n for _, n in self.requests) + tokens > self.tpm:
+                self.rejected += 1
+                raise ResourceExhausted("429 Resource has been exhausted (e.g. check quota).")
+            self.requests.append((now, tokens))
+            self.accepted += 1
+
+
+class FakeChat:
+    def __init__(self, model, history):
+        self.model = model
+        self.history = list(history or [])
+
+    def send_message(self, content, stream=False, tool_config=None):
+        model = self.model
+        with model.lock:
+            model.calls += 1
+        prompt_tokens = utils.estimate_tokens(model.system_instruction or "") + sum(
+            utils.estimate_tokens(part) for msg in self.history for part in msg.get("parts", []))
+
+        if isinstance(content, str):
+            prompt_tokens += utils.estimate_tokens(content)
+            calls = model.tool_calls(content) if model.tools and tool_config is None else []
+        else:
+            # Function responses coming back from the tool runner
+            prompt_tokens += sum(utils.estimate_tokens(repr(part)) for part in content)
+            calls = []
+
+        if model.quota is not None:
+            model.quota.charge(prompt_tokens)
+        if model.error_rate and random.random() < model.error_rate:
+            with model.lock:
+                model.errors += 1
+            raise FakeModelError("503 The model is overloaded. Please try again later.")
+        time.sleep(model.ttft)
+        if calls:
+            parts = [FakePart(function_call=FakeFunctionCall(name, args)) for name, args in calls]
+            usage = FakeUsage(prompt_tokens, 10 * len(calls))
+        else:
+            words = model.answer_text.split(" ")
+            size = max(1, len(words) // model.chunks)
+            pieces = [" ".join(words[i:i + size]) + " " for i in range(0, len(words), size)]
+            parts = [FakePart(text=piece) for piece in pieces]
+            usage = FakeUsage(prompt_tokens, utils.estimate_tokens(model.answer_text))
+            if not stream:
+                # Non-streaming calls return only after the whole answer is generated
+                time.sleep(model.chunk_delay * (len(parts) - 1))
+
+        self.history.append({"role": "user", "parts": [content if isinstance(content, str) else repr(content)]})
+        response = FakeResponse(parts, usage, model.chunk_delay, stream)
+        if not calls:
+            self.history.append({"role": "model", "parts": [response.text]})
+        return response
+
+
+def default_tool_calls(prompt):
+    """Asks for both legs' operation info when the prompt mentions 운항, like Gemini does for round trips."""
+    if "운항" in prompt:
+        return [
+            ("get_flight_operation_info", {"date": "20240206", "departure": "ICN", "arrival": "NRT"}),
+            ("get_flight_operation_info", {"date": "20240210", "departure": "NRT", "arrival": "ICN"}),
+        ]
+    return []
+
+
+def realistic_tool_calls(content):
+    """
+    Picks tool calls from the user's prompt (the last line of the turn message) like Gemini would:
+    schedule, PNR or operation lookups with slots parsed from the text, today's date when none is given.
+    """
+    prompt = str(content).rsplit("\n", 1)[-1]
+    dates = sorted(intent_router.extract_dates(prompt)) or [datetime.now().strftime("%Y%m%d")]
+    codes = []
+    for _, code, _ in intent_router.extract_airports(prompt):
+        if code not in codes:
+            codes.append(code)
+    departure, arrival = (codes + ["GMP", "CJU"])[:2] if len(codes) < 2 else codes[:2]
+    if "스케줄" in prompt or "시간표" in prompt:
+        return [("get_flight_schedule", {"departure": departure, "arrival": arrival, "date": dates[0]})]
+    if "예약" in prompt:
+        names = intent_router.extract_names(prompt) or ("GILDONG", "HONG")
+        pnrs = [t for t in intent_router.PNR_TOKEN_RE.findall(prompt) if not t.isdigit() and t not in names]
+        return [("get_pnr_detail", {"pnr": pnrs[0] if pnrs else "X3AJUP", "first_name": names[0],
+                                    "last_name": names[1], "departure_date": dates[0]})]
+    if "운항" in prompt:
+        return [("get_flight_operation_info", {"date": date, "departure": departure, "arrival": arrival}) for date in dates]
+    return []
+
+
+class FakeGenerativeModel:
+    """
+    Drop-in for genai.GenerativeModel with configurable latency.
+
+    ttft: seconds before the first chunk of every model round-trip
+    chunk_delay: seconds between streamed chunks
+    chunks: number of text chunks per answer
+    tool_calls: callable(prompt) -> [(name, args)] the model requests before answering
+    quota: FakeQuota enforced on every round-trip (raises ResourceExhausted like the real API)
+    error_rate: probability that a round-trip fails with a 503-style error
+    """
+
+    def __init__(self, model_name="gemini-2.5-flash", system_instruction=None, tools=None,
+                 ttft=0.3, chunk_delay=0.05, chunks=20, tool_calls=default_tool_calls,
+                 answer_text="문의하신 내용에 대한 답변입니다. " * 20, quota=None, error_rate=0.0):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.tools = tools
+        self.ttft = ttft
+        self.chunk_delay = chunk_delay
+        self.chunks = chunks
+        self.tool_calls = tool_calls
+        self.answer_text = answer_text.strip()
+        self.quota = quota
+        self.error_rate = error_rate
+        self.errors = 0
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def start_chat(self, history=None, enable_automatic_function_calling=False):
+        return FakeChat(self, history)
@@ -0,0 +1,136 @@
+import math
+import re
+import unicodedata
+from collections import Counter
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+NGRAM_SIZES = (2, 3)
+
+_PUNCT_RE = re.compile(r"[^\w\s]", re.UNICODE)
+
+
+def normalize_text(text):
+    """Lowercases, NFC-normalizes and strips punctuation so Korean/English text tokenizes consistently."""
+    text = unicodedata.normalize("NFC", str(text)).lower()
+    return _PUNCT_RE.sub(" ", text)
+
+
+def tokenize(text):
+    """
+    Splits text into character n-grams per whitespace word.
+    Korean has no reliable word boundaries (particles are glued to nouns),
+    so overlapping 2/3-grams match "수하물은" against "수하물" without a morphological analyzer.
+    """
+    terms = []
+    for word in normalize_text(text).split():
+        if len(word) == 1:
+            terms.append(word)
+            continue
+        padded = f" {word} "
+        for n in NGRAM_SIZES:
+            terms.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return terms
+
+
+def _doc_key(question, answer):
+    return (str(question), str(answer))
+
+
+class FaqIndex:
+    """In-memory BM25 index over FAQ rows (category, question, answer)."""
+
+    def __init__(self):
+        self.docs = {}          # doc_id -> row dict
+        self.doc_terms = {}     # doc_id -> Counter of terms
+        self.doc_len = {}       # doc_id -> number of terms
+        self.postings = {}      # term -> {doc_id: tf}
+        self.keys = {}          # (question, answer) -> doc_id
+        self.total_len = 0
+        self._next_id = 0
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, row):
+        key = _doc_key(row.get("question", ""), row.get("answer", ""))
+        if key in self.keys:
+            return self.keys[key]
+        doc_id = self._next_id
+        self._next_id += 1
+        # Questions are weighted twice since user queries mostly paraphrase them
+        terms = Counter(tokenize(row.get("question", "")) * 2 + tokenize(row.get("answer", "")))
+        self.docs[doc_id] = dict(row)
+        self.doc_terms[doc_id] = terms
+        self.keys[key] = doc_id
+        self.doc_len[doc_id] = sum(terms.values())
+        self.total_len += self.doc_len[doc_id]
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        return doc_id
+
+    def remove(self, doc_id):
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        row = self.docs.pop(doc_id)
+        self.keys.pop(_doc_key(row.get("question", ""), row.get("answer", "")), None)
+        self.total_len -= self.doc_len.pop(doc_id)
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            posting.pop(doc_id, None)
+            if not posting:
+                del self.postings[term]
+
+    def update(self, rows):
+        """
+        Incrementally syncs the index with the given rows.
+        Only added/removed Q&A pairs are (re)tokenized; unchanged rows keep their postings.
+        Returns (added, removed) counts.
+        """
+        wanted = {}
+        for row in rows:
+            wanted[_doc_key(row.get("question", ""), row.get("answer", ""))] = row
+
+        stale = [doc_id for key, doc_id in self.keys.items() if key not in wanted]
+        for doc_id in stale:
+            self.remove(doc_id)
+
+        added = 0
+        for key, row in wanted.items():
+            if key in self.keys:
+                # Category edits don't change scoring, just refresh the stored row
+                self.docs[self.keys[key]] = dict(row)
+            else:
+                self.add(row)
+                added += 1
+        return added, len(stale)
+
+    def search(self, query, k=5):
+        """Returns up to k rows ranked by BM25 score (rows with zero overlap are skipped)."""
+        if not self.docs:
+            return []
+        n_docs = len(self.docs)
+        avgdl = self.total_len / n_docs if n_docs else 0
+        scores = {}
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            df = len(posting)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for doc_id, tf in posting.items():
+                norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[doc_id] / avgdl)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [dict(self.docs[doc_id], score=score) for doc_id, score in ranked]
+
+
+def build_index(rows):
+    index = FaqIndex()
+    index.update(rows)
+    return index
@@ -0,0 +1,218 @@
+import csv
+import hashlib
+import io
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+
+COLUMNS = ['category', 'question', 'answer']
+BUSY_TIMEOUT_MS = 5000
+
+SCRIPTS = [("ko", re.compile(r"[\uac00-\ud7a3\u1100-\u11ff\u3130-\u318f]")),
+           ("ja", re.compile(r"[\u3040-\u30ff]")),
+           ("zh", re.compile(r"[\u4e00-\u9fff]")),
+           ("en", re.compile(r"[A-Za-z]"))]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS faq_entry (
+    id INTEGER PRIMARY KEY,
+    category TEXT NOT NULL,
+    lang TEXT NOT NULL,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS faq_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def detect_lang(text):
+    """Language tag of a FAQ question by its dominant script: ko / ja / zh / en."""
+    counts = [(len(pattern.findall(text)), lang) for lang, pattern in SCRIPTS]
+    # Japanese mixes kana with kanji; any kana beats a kanji majority
+    if counts[1][0] and counts[1][0] >= counts[0][0]:
+        return "ja"
+    count, lang = max(counts)
+    return lang if count else "ko"
+
+
+def format_entry(row):
+    return f"Q: {row['question']}\nA: {row['answer']}\n"
+
+
+def content_version(data):
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def parse_csv(data):
+    """faq.csv bytes -> [{'category', 'question', 'answer', 'lang'}] (blank cells become "")."""
+    rows = []
+    for row in csv.DictReader(io.StringIO(data.decode('utf-8-sig'), newline='')):
+        entry = {column: row.get(column) or "" for column in COLUMNS}
+        entry['lang'] = row.get('lang') or detect_lang(entry['question'])
+        rows.append(entry)
+    return rows
+
+
+def write_csv(path, rows, with_lang=False):
+    """Writes faq.csv atomically (temp file + rename) so readers never see a half-written file."""
+    buffer = io.StringIO(newline='')
+    writer = csv.DictWriter(buffer, fieldnames=COLUMNS + ['lang'] if with_lang else COLUMNS, extrasaction='ignore',
+                            lineterminator='\n')
+    writer.writeheader()
+    writer.writerows(rows)
+    data = buffer.getvalue().encode('utf-8')
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix='.faq-', suffix='.csv')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return data
+
+
+class FaqSnapshot:
+    """
+    One version of the FAQ, compiled in a single pass: the rows, the full prompt text and the
+    prompt text per category and per language.
+    """
+    __slots__ = ("version", "rows", "text", "by_category", "by_lang")
+
+    def __init__(self, version, rows):
+        self.version = version
+        self.rows = rows
+        parts, by_category, by_lang = [], {}, {}
+        for row in rows:
+            entry = format_entry(row)
+            parts.append(entry)
+            by_category.setdefault(row['category'], []).append(entry)
+            by_lang.setdefault(row['lang'], []).append(entry)
+        self.text = "".join(parts)
+        self.by_category = {category: "".join(entries) for category, entries in by_category.items()}
+        self.by_lang = {lang: "".join(entries) for lang, entries in by_lang.items()}
+
+    def slice(self, category=None, lang=None):
+        """Prompt text for one category and/or language (all entries when both are None)."""
+        if category is None and lang is None:
+            return self.text
+        if lang is None:
+            return self.by_category.get(category, "")
+        if category is None:
+            return self.by_lang.get(lang, "")
+        return "".join(format_entry(row) for row in self.rows if row['category'] == category and row['lang'] == lang)
+
+
+class FaqStore:
+    """
+    Compiled copy of faq.csv in SQLite, versioned by a hash of the CSV content.
+    The CSV is parsed only when its content changes (by any process); other processes load the
+    compiled rows. Each version is compiled into a FaqSnapshot once and kept in memory.
+    """
+
+    def __init__(self, path, csv_path):
+        self.path = path
+        self.csv_path = csv_path
+        self.lock = threading.Lock()
+        self.snapshot_cache = None      # (csv signature, FaqSnapshot)
+        self.stats = {"compiles": 0, "loads": 0, "hits": 0}
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.csv_path)
+            return f"{stat.st_mtime_ns}:{stat.st_size}"
+        except OSError:
+            return None
+
+    def snapshot(self):
+        """Returns the FaqSnapshot of the current faq.csv, compiling it if the content changed."""
+        signature = self._signature()
+        with self.lock:
+            cached = self.snapshot_cache
+            if cached is not None and cached[0] == signature:
+                self.stats["hits"] += 1
+                return cached[1]
+            if signature is None:
+                snapshot = FaqSnapshot("empty", [])
+            else:
+                snapshot = self._load_or_compile(signature, cached[1] if cached else None)
+            self.snapshot_cache = (signature, snapshot)
+            return snapshot
+
+    def _load_or_compile(self, signature, previous):
+        conn = self._connect()
+        try:
+            meta = dict(conn.execute("SELECT key, value FROM faq_meta"))
+            if meta.get("source_signature") != signature:
+                with open(self.csv_path, 'rb') as f:
+                    data = f.read()
+                version = content_version(data)
+                if meta.get("version") != version:
+                    return self._compile(conn, version, parse_csv(data), signature)
+                # Touched but unchanged content: the compiled rows are still valid
+                conn.execute("INSERT OR REPLACE INTO faq_meta (key, value) VALUES ('source_signature', ?)", (signature,))
+            if previous is not None and previous.version == meta.get("version"):
+                return previous
+            rows = [{'category': category, 'question': question, 'answer': answer, 'lang': lang}
+                    for category, question, answer, lang in
+                    conn.execute("SELECT category, question, answer, lang FROM faq_entry ORDER BY id")]
+            self.stats["loads"] += 1
+            return FaqSnapshot(meta["version"], rows)
+        finally:
+            conn.close()
+
+    def _compile(self, conn, version, rows, signature):
+        """Replaces the compiled rows and the version in one transaction (readers see old or new, never a mix)."""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM faq_entry")
+            conn.executemany("INSERT INTO faq_entry (id, category, lang, question, answer) VALUES (?, ?, ?, ?, ?)",
+                             [(i, row['category'], row['lang'], row['question'], row['answer'])
+                              for i, row in enumerate(rows)])
+            conn.executemany("INSERT OR REPLACE INTO faq_meta (key, value) VALUES (?, ?)",
+                             [("version", version), ("source_signature", signature or ""), ("rows", str(len(rows)))])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self.stats["compiles"] += 1
+        return FaqSnapshot(version, rows)
+
+    def save(self, rows):
+        """Writes faq.csv atomically and compiles the new version right away; returns the new snapshot."""
+        # An explicit lang column (e.g. from the admin editor) is kept; otherwise it is detected on load
+        with_lang = any(row.get('lang') for row in rows)
+        rows = [{column: "" if row.get(column) is None else str(row.get(column)) for column in COLUMNS + ['lang']}
+                for row in rows]
+        for row in rows:
+            row['lang'] = row['lang'] or detect_lang(row['question'])
+        with self.lock:
+            data = write_csv(self.csv_path, rows, with_lang)
+            signature = self._signature()
+            conn = self._connect()
+            try:
+                snapshot = self._compile(conn, content_version(data), rows, signature)
+            finally:
+                conn.close()
+            self.snapshot_cache = (signature, snapshot)
+        return snapshot
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            snapshot = self.snapshot_cache[1] if self.snapshot_cache else None
+        stats["version"] = snapshot.version if snapshot else None
+        stats["rows"] = len(snapshot.rows) if snapshot else 0
+        return stats
@@ -0,0 +1,205 @@
+import threading
+import time
+from datetime import datetime
+
+import tracing
+import usage_log
+
+# TTLs in seconds. Past dates no longer change; today's data changes as flights depart/arrive.
+PAST_DATE_TTL = 6 * 60 * 60
+FUTURE_DATE_TTL = 5 * 60
+TODAY_TTL = 60
+TODAY_SETTLED_TTL = 10 * 60   # every flight of the day already arrived or cancelled
+TODAY_DISRUPTED_TTL = 30      # delays/diversions in progress, statuses move quickly
+MAX_ENTRIES = 2048
+
+SETTLED_STATUSES = {"도착", "결항", "ARRIVED", "CANCELLED", "CANCELED"}
+DISRUPTED_STATUSES = {"지연", "회항", "DELAYED", "DIVERTED"}
+
+
+def normalize_flight_no(flight_no):
+    """LJ201 / lj 201 / 201 -> '201' (the API's FlightNo is digits only)."""
+    return ''.join(filter(str.isdigit, str(flight_no)))
+
+
+def route_ttl(date, data, now=None):
+    """Picks a TTL from the flight date and the statuses in the cached payload."""
+    today = (now or datetime.now()).strftime("%Y%m%d")
+    if date < today:
+        return PAST_DATE_TTL
+    if date > today:
+        return FUTURE_DATE_TTL
+    statuses = {str(flight.get("Status", "")).strip().upper() for flight in data.get("FlightInfo") or []}
+    if statuses & DISRUPTED_STATUSES:
+        return TODAY_DISRUPTED_TTL
+    if statuses and statuses <= SETTLED_STATUSES:
+        return TODAY_SETTLED_TTL
+    return TODAY_TTL
+
+
+class RouteEntry:
+    __slots__ = ("data", "by_flight_no", "stored_at", "expires_at")
+
+    def __init__(self, data, ttl):
+        self.data = data
+        self.by_flight_no = {}
+        for flight in data.get("FlightInfo") or []:
+            self.by_flight_no.setdefault(normalize_flight_no(flight.get("FlightNo", "")), flight)
+        self.stored_at = time.time()
+        self.expires_at = time.monotonic() + ttl
+
+    @property
+    def stale(self):
+        return self.expires_at <= time.monotonic()
+
+
+class _Inflight:
+    __slots__ = ("event", "entry", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.entry = None
+        self.error = None
+
+
+class FlightOperationCache:
+    """
+    Process-wide cache of getFlightOpererationInfo route responses keyed by (date, departure, arrival, lang).
+    Concurrent misses for the same key share one upstream request.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = {}
+        self.inflight = {}
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0, "evictions": 0, "refreshes": 0,
+                         "stale_served": 0}
+        self.query_counts = {}      # (date, departure, arrival) -> lookups since the last take_query_counts()
+        self.served_age_total = 0.0
+        self.served_age_max = 0.0
+
+    def get_route(self, date, departure, arrival, lang, fetch, allow_stale=False):
+        """
+        Returns the RouteEntry for the key, calling fetch() at most once across concurrent callers.
+        Only payloads containing FlightInfo are cached; errors are raised to every waiting caller.
+        allow_stale serves an expired entry instead of fetching (the upstream is known to be down).
+        """
+        key = (date, departure.upper(), arrival.upper(), lang)
+        with tracing.span("cache.flight_route", route=f"{key[1]}-{key[2]}", date=date) as span:
+            return self._get_route(key, fetch, span, allow_stale)
+
+    def _get_route(self, key, fetch, span, allow_stale):
+        date = key[0]
+        with self.lock:
+            query_key = key[:3]
+            if query_key not in self.query_counts and len(self.query_counts) >= self.max_entries:
+                self.query_counts.clear()   # nobody is reading the counts (no prefetcher running)
+            self.query_counts[query_key] = self.query_counts.get(query_key, 0) + 1
+            entry = self.entries.get(key)
+            if entry is not None and entry.expires_at > time.monotonic():
+                self.counters["hits"] += 1
+                age = time.time() - entry.stored_at
+                self.served_age_total += age
+                self.served_age_max = max(self.served_age_max, age)
+                usage_log.count_cache_hit()
+                span.set(outcome="hit")
+                return entry
+            if entry is not None and allow_stale:
+                self.counters["stale_served"] += 1
+                usage_log.count_cache_hit()
+                span.set(outcome="stale")
+                return entry
+            inflight = self.inflight.get(key)
+            if inflight is not None:
+                self.counters["coalesced"] += 1
+                usage_log.count_cache_hit()
+                leader = False
+                span.set(outcome="coalesced")
+            else:
+                inflight = self.inflight[key] = _Inflight()
+                self.counters["misses"] += 1
+                leader = True
+                span.set(outcome="miss")
+
+        if not leader:
+            inflight.event.wait()
+            if inflight.error is not None:
+                raise inflight.error
+            return inflight.entry
+
+        try:
+            data = fetch()
+            entry = RouteEntry(data, route_ttl(date, data))
+            inflight.entry = entry
+            if "FlightInfo" in data:
+                self._store(key, entry)
+            return entry
+        except Exception as e:
+            inflight.error = e
+            with self.lock:
+                self.counters["errors"] += 1
+            raise
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+            inflight.event.set()
+
+    def refresh(self, date, departure, arrival, lang, data, min_ttl=0):
+        """
+        Stores a payload fetched in the background (prefetch) without counting a lookup.
+        min_ttl keeps the entry servable until the next scheduled refresh, except while a disruption
+        is in progress: then TODAY_DISRUPTED_TTL applies as for any lookup.
+        """
+        if "FlightInfo" not in data:
+            return None
+        ttl = route_ttl(date, data)
+        if ttl != TODAY_DISRUPTED_TTL:
+            ttl = max(ttl, min_ttl)
+        entry = RouteEntry(data, ttl)
+        self._store((date, departure.upper(), arrival.upper(), lang), entry)
+        with self.lock:
+            self.counters["refreshes"] += 1
+        return entry
+
+    def take_query_counts(self):
+        """Returns and resets the per-route lookup counts (read by the prefetch scheduler)."""
+        with self.lock:
+            counts, self.query_counts = self.query_counts, {}
+        return counts
+
+    def _store(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            if len(self.entries) > self.max_entries:
+                # Drop the entries closest to expiry first
+                now = time.monotonic()
+                expired = [k for k, e in self.entries.items() if e.expires_at <= now]
+                for k in expired or [min(self.entries, key=lambda k: self.entries[k].expires_at)]:
+                    del self.entries[k]
+                    self.counters["evictions"] += 1
+
+    def invalidate(self, date=None, departure=None, arrival=None):
+        with self.lock:
+            for key in list(self.entries):
+                if (date is None or key[0] == date) and (departure is None or key[1] == departure.upper()) \
+                        and (arrival is None or key[2] == arrival.upper()):
+                    del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats["entries"] = len(self.entries)
+            # Staleness of what was served from the cache (seconds since the entry was fetched)
+            stats["served_age_avg_s"] = self.served_age_total / stats["hits"] if stats["hits"] else 0.0
+            stats["served_age_max_s"] = self.served_age_max
+        lookups = stats["hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_rate"] = (stats["hits"] + stats["coalesced"]) / lookups if lookups else 0.0
+        return stats
+
+
+flight_operation_cache = FlightOperationCache()
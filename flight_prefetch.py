@@ -0,0 +1,175 @@
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+import flight_cache
+import http_client
+
+# Routes whose operation status spikes during disruptions (both directions are refreshed)
+HOT_ROUTES = [("GMP", "CJU"), ("ICN", "NRT"), ("ICN", "BKK")]
+REQUEST_BUDGET_PER_MINUTE = 12   # upstream calls the prefetcher may spend per rolling minute
+TICK = 5.0                       # seconds between scheduling passes
+MIN_INTERVAL = 30.0              # busiest routes are refreshed at most this often
+MAX_INTERVAL = 10 * 60.0         # and idle hot routes at least this often
+QUERIES_PER_REFRESH = 5.0        # aim for one refresh per this many customer lookups
+TOMORROW_INTERVAL_FACTOR = 3.0   # tomorrow's statuses change slowly
+RATE_HALF_LIFE = 120.0           # seconds; smoothing of the observed lookup rate
+
+
+class _Target:
+    __slots__ = ("date", "departure", "arrival", "rate", "next_due", "last_refresh")
+
+    def __init__(self, date, departure, arrival):
+        self.date = date
+        self.departure = departure
+        self.arrival = arrival
+        self.rate = 0.0           # smoothed lookups per second
+        self.next_due = 0.0       # monotonic; 0 = refresh on the first pass
+        self.last_refresh = None  # wall clock of the last successful refresh
+
+
+class PrefetchScheduler:
+    """
+    Keeps today's and tomorrow's hot routes warm in the flight operation cache.
+    Each target's refresh interval follows its live lookup rate (read from the cache), and the
+    total number of upstream calls stays within a rolling per-minute request budget.
+    """
+
+    def __init__(self, fetch_route, cache=None, hot_routes=HOT_ROUTES, budget_per_minute=REQUEST_BUDGET_PER_MINUTE,
+                 lang="ko", tick=TICK):
+        self.fetch_route = fetch_route    # fetch_route(date, departure, arrival, lang) -> payload
+        self.cache = cache or flight_cache.flight_operation_cache
+        self.hot_routes = set()
+        for departure, arrival in hot_routes:
+            self.hot_routes.add((departure.upper(), arrival.upper()))
+            self.hot_routes.add((arrival.upper(), departure.upper()))
+        self.budget_per_minute = budget_per_minute
+        self.lang = lang
+        self.tick = tick
+        self.targets = {}
+        self.spent = deque()              # monotonic times of recent upstream calls
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.last_pass = None
+        self.metrics = {"refreshes": 0, "errors": 0, "deferred": 0, "refresh_ms_total": 0.0, "refresh_ms_max": 0.0}
+
+    def _sync_targets(self, now_dt):
+        today = now_dt.strftime("%Y%m%d")
+        tomorrow = (now_dt + timedelta(days=1)).strftime("%Y%m%d")
+        wanted = {(date, dep, arr) for date in (today, tomorrow) for dep, arr in self.hot_routes}
+        for key in list(self.targets):
+            if key not in wanted:
+                del self.targets[key]    # yesterday's targets roll off at midnight
+        for key in wanted:
+            if key not in self.targets:
+                self.targets[key] = _Target(*key)
+        return today
+
+    def interval(self, target, today):
+        """Seconds until the next refresh: busier routes more often, bounded by MIN/MAX_INTERVAL."""
+        interval = QUERIES_PER_REFRESH / target.rate if target.rate > 0 else MAX_INTERVAL
+        if target.date != today:
+            interval *= TOMORROW_INTERVAL_FACTOR
+        return min(MAX_INTERVAL, max(MIN_INTERVAL, interval))
+
+    def _update_rates(self, elapsed):
+        counts = self.cache.take_query_counts()
+        decay = 0.5 ** (elapsed / RATE_HALF_LIFE) if elapsed > 0 else 1.0
+        for key, target in self.targets.items():
+            observed = counts.get(key, 0) / elapsed if elapsed > 0 else 0.0
+            target.rate = target.rate * decay + observed * (1 - decay)
+
+    def _take_budget(self, now):
+        while self.spent and self.spent[0] <= now - 60:
+            self.spent.popleft()
+        if len(self.spent) >= self.budget_per_minute:
+            return False
+        self.spent.append(now)
+        return True
+
+    def run_once(self, now_dt=None):
+        """One scheduling pass: refreshes due targets, busiest first, until the budget runs out."""
+        now = time.monotonic()
+        with self.lock:
+            today = self._sync_targets(now_dt or datetime.now())
+            self._update_rates(now - self.last_pass if self.last_pass is not None else 0.0)
+            self.last_pass = now
+            # Busiest first; with no traffic yet, today's routes before tomorrow's
+            due = sorted((t for t in self.targets.values() if t.next_due <= now),
+                         key=lambda t: (t.rate, t.date == today), reverse=True)
+        for target in due:
+            with self.lock:
+                if not self._take_budget(time.monotonic()):
+                    self.metrics["deferred"] += 1
+                    continue
+            if not self._refresh(target, today):
+                break    # upstream is down (circuit open): retry on a later pass
+        return len(due)
+
+    def _refresh(self, target, today):
+        interval = self.interval(target, today)
+        start = time.perf_counter()
+        try:
+            data = self.fetch_route(target.date, target.departure, target.arrival, self.lang)
+            # Keep the entry servable until the following refresh (plus one pass of slack)
+            entry = self.cache.refresh(target.date, target.departure, target.arrival, self.lang, data,
+                                       min_ttl=interval + self.tick)
+            ok = entry is not None
+            if ok and flight_cache.route_ttl(target.date, data) == flight_cache.TODAY_DISRUPTED_TTL:
+                # The entry keeps its short disrupted TTL; refresh as often as allowed to keep it warm
+                interval = MIN_INTERVAL
+        except http_client.CircuitOpenError:
+            return False
+        except Exception as e:
+            print(f"Flight prefetch failed for {target.date} {target.departure}-{target.arrival}: {e}")
+            ok = False
+        cost_ms = (time.perf_counter() - start) * 1000
+        with self.lock:
+            self.metrics["refresh_ms_total"] += cost_ms
+            self.metrics["refresh_ms_max"] = max(self.metrics["refresh_ms_max"], cost_ms)
+            if ok:
+                self.metrics["refreshes"] += 1
+                target.last_refresh = time.time()
+                target.next_due = time.monotonic() + interval
+            else:
+                self.metrics["errors"] += 1
+                target.next_due = time.monotonic() + MIN_INTERVAL
+        return True
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Flight prefetch pass failed: {e}")
+            self.stop_event.wait(self.tick)
+
+    def start(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.stop_event.clear()
+                self.thread = threading.Thread(target=self._run, name="flight-prefetch", daemon=True)
+                self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=self.tick + 1)
+
+    def stats(self):
+        now = time.time()
+        with self.lock:
+            stats = dict(self.metrics)
+            attempts = stats["refreshes"] + stats["errors"]
+            stats["refresh_ms_avg"] = stats["refresh_ms_total"] / attempts if attempts else 0.0
+            stats["requests_last_minute"] = len(self.spent)
+            stats["budget_per_minute"] = self.budget_per_minute
+            stats["targets"] = [{
+                "date": t.date, "route": f"{t.departure}-{t.arrival}",
+                "lookups_per_min": round(t.rate * 60, 2),
+                "age_s": round(now - t.last_refresh, 1) if t.last_refresh else None,
+            } for t in sorted(self.targets.values(), key=lambda t: (t.date, t.departure, t.arrival))]
+        return stats
@@ -0,0 +1,175 @@
+import bisect
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import http_client
+
+PROBE_INTERVAL = 15.0
+PROBE_TIMEOUT = 3.0
+HISTORY_SIZE = 120              # probes kept per endpoint (30 minutes at the default interval)
+DOWN_AFTER = 2                  # consecutive failed probes before an endpoint counts as down
+DEGRADED_ERROR_RATE = 0.2       # over the history
+DEGRADED_LATENCY_MS = 2000.0    # p95 over the history
+LATENCY_BUCKETS_MS = [50, 100, 250, 500, 1000, 2500, 5000]
+
+# Endpoint states; only DOWN makes the tool layer fail fast or serve stale data
+UP = "up"
+DEGRADED = "degraded"
+DOWN = "down"
+UNKNOWN = "unknown"             # never probed, or the last probe is too old to trust
+
+LABELS = {
+    "flight_schedule": "항공 스케줄",
+    "flight_operation_info": "운항 정보",
+    "pnr_detail": "예약 조회",
+    "operation_confirmation": "운항정보 확인서 발송",
+}
+
+
+class UpstreamDown(Exception):
+    """Raised instead of calling an upstream the prober currently reports as down."""
+
+    def __init__(self, name):
+        super().__init__(f"{LABELS.get(name, name)} 서비스가 일시적으로 응답하지 않습니다. 잠시 후 다시 시도해 주세요.")
+        self.name = name
+
+
+def http_probe(url, timeout):
+    """GET through the pooled session, bypassing retries and the circuit breaker so the real state shows."""
+    response = http_client.get_session(url).get(url, timeout=timeout)
+    if response.status_code >= 500:
+        raise RuntimeError(f"HTTP {response.status_code}")
+    return response.status_code
+
+
+def _percentile(values, share):
+    return values[min(len(values) - 1, int(share * len(values)))] if values else None
+
+
+class EndpointHistory:
+    """Ring buffer of one endpoint's probes: (checked_at, ok, latency_ms, status_code or error)."""
+
+    def __init__(self, name, size=HISTORY_SIZE):
+        self.name = name
+        self.samples = deque(maxlen=size)
+        self.consecutive_failures = 0
+
+    def record(self, ok, latency_ms, detail):
+        self.samples.append((time.time(), ok, latency_ms, detail))
+        self.consecutive_failures = 0 if ok else self.consecutive_failures + 1
+
+    def status(self, url):
+        """Summary of the buffer; computed once per probe so readers only copy a dict."""
+        checked_at, ok, latency_ms, detail = self.samples[-1]
+        latencies = sorted(round(sample[2], 1) for sample in self.samples if sample[1])
+        errors = sum(1 for sample in self.samples if not sample[1])
+        error_rate = errors / len(self.samples)
+        histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        for latency in latencies:
+            histogram[bisect.bisect_left(LATENCY_BUCKETS_MS, latency)] += 1
+        p95 = _percentile(latencies, 0.95)
+        if self.consecutive_failures >= DOWN_AFTER:
+            state = DOWN
+        elif not ok or error_rate >= DEGRADED_ERROR_RATE or (p95 or 0) >= DEGRADED_LATENCY_MS:
+            state = DEGRADED
+        else:
+            state = UP
+        return {
+            "name": self.name, "url": url, "state": state, "checked_at": checked_at,
+            "last_ok": ok, "last_latency_ms": round(latency_ms, 1), "last_detail": detail,
+            "consecutive_failures": self.consecutive_failures, "samples": len(self.samples),
+            "error_rate": round(error_rate, 3),
+            "latency_ms": {"p50": _percentile(latencies, 0.5), "p95": p95, "max": latencies[-1] if latencies else None},
+            "histogram": {**{f"<={bound}": count for bound, count in zip(LATENCY_BUCKETS_MS, histogram)},
+                          f">{LATENCY_BUCKETS_MS[-1]}": histogram[-1]},
+        }
+
+
+class HealthProber:
+    """
+    Probes every upstream concurrently on an interval and keeps a bounded latency/error history per
+    endpoint. status()/is_down() only read the summary of the last pass, so the chat tools can ask
+    on every call. targets() -> {name: url} is read on every pass (utils' URLs may be redirected).
+    """
+
+    def __init__(self, targets, probe=http_probe, interval=PROBE_INTERVAL, timeout=PROBE_TIMEOUT,
+                 history_size=HISTORY_SIZE):
+        self.targets = targets
+        self.probe = probe
+        self.interval = interval
+        self.timeout = timeout
+        self.history_size = history_size
+        self.histories = {}
+        self.statuses = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="health-probe")
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def _probe_one(self, url):
+        start = time.perf_counter()
+        try:
+            detail = self.probe(url, self.timeout)
+            ok = True
+        except Exception as e:
+            detail, ok = str(e)[:200], False
+        return ok, (time.perf_counter() - start) * 1000, detail
+
+    def run_once(self):
+        """One pass over every target, all probed at once; returns the new statuses."""
+        targets = dict(self.targets())
+        futures = {name: self.executor.submit(self._probe_one, url) for name, url in targets.items()}
+        results = {name: future.result() for name, future in futures.items()}
+        with self.lock:
+            for name, result in results.items():
+                history = self.histories.get(name)
+                if history is None:
+                    history = self.histories[name] = EndpointHistory(name, self.history_size)
+                history.record(*result)
+                self.statuses[name] = history.status(targets[name])
+            return dict(self.statuses)
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            started = time.monotonic()
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Health probe pass failed: {e}")
+            self.stop_event.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def start(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.stop_event.clear()
+                self.thread = threading.Thread(target=self._run, name="health-prober", daemon=True)
+                self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=self.timeout + 1)
+
+    def _fresh(self, status):
+        return time.time() - status["checked_at"] <= 3 * self.interval + self.timeout
+
+    def status(self, name):
+        """Last summary of one endpoint; UNKNOWN when never probed or older than three intervals."""
+        status = self.statuses.get(name)
+        if status is None:
+            return {"name": name, "state": UNKNOWN}
+        age = time.time() - status["checked_at"]
+        state = status["state"] if self._fresh(status) else UNKNOWN
+        return {**status, "state": state, "age_s": round(age, 1),
+                "checked_at": datetime.fromtimestamp(status["checked_at"]).strftime("%Y-%m-%d %H:%M:%S")}
+
+    def is_down(self, name):
+        status = self.statuses.get(name)
+        return status is not None and status["state"] == DOWN and self._fresh(status)
+
+    def snapshot(self):
+        return {name: self.status(name) for name in list(self.statuses)}
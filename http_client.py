@@ -0,0 +1,193 @@
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import tracing
+
+# User-Agent 헤더 (봇 차단 방지용)
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 16
+
+# Per-endpoint settings: (connect timeout, read timeout) in seconds, retry count, idempotent
+# Only idempotent lookups are retried; the confirmation email must never be sent twice.
+ENDPOINTS = {
+    "flight_schedule": {"timeout": (3.05, 10), "retries": 2, "idempotent": True},
+    "flight_operation_info": {"timeout": (3.05, 10), "retries": 2, "idempotent": True},
+    "pnr_detail": {"timeout": (3.05, 10), "retries": 2, "idempotent": True},
+    "operation_confirmation": {"timeout": (3.05, 20), "retries": 0, "idempotent": False},
+    "health_check": {"timeout": (3.05, 5), "retries": 0, "idempotent": True},
+    "chat_api": {"timeout": (3.05, 120), "retries": 0, "idempotent": False},
+}
+DEFAULT_ENDPOINT = {"timeout": (3.05, 10), "retries": 0, "idempotent": False}
+
+BACKOFF_BASE = 0.2
+BACKOFF_MAX = 2.0
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+# Only these statuses count against the breaker: any other response, 500 included, means the host is
+# up and answering (the chat API returns 500 for a failed turn, which says nothing about the server)
+BREAKER_STATUS_CODES = {502, 503, 504}
+
+# Circuit breaker: open after N consecutive failures, allow one trial call after the cooldown
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_COOLDOWN = 30.0
+
+
+class CircuitOpenError(Exception):
+    """Raised without any network I/O while an upstream's circuit is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        with self.lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+_sessions = {}
+_breakers = {}
+_lock = threading.Lock()
+
+
+def _host_key(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def get_session(url):
+    """Returns the shared keep-alive session for the url's host (extapi / ccs / ccsstg)."""
+    key = _host_key(url)
+    with _lock:
+        session = _sessions.get(key)
+        if session is None:
+            # requests is imported on the first upstream call, not when the app starts
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            session.headers.update(DEFAULT_HEADERS)
+            adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=0)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[key] = session
+        return session
+
+
+def get_breaker(url):
+    key = _host_key(url)
+    with _lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = _breakers[key] = CircuitBreaker()
+        return breaker
+
+
+def breaker_states():
+    """Returns {host: state} for every upstream seen so far."""
+    with _lock:
+        return {host: breaker.state for host, breaker in _breakers.items()}
+
+
+def reset():
+    """Closes pooled connections and clears breaker state (used by verify scripts and stubs)."""
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+        _breakers.clear()
+
+
+def _backoff(attempt):
+    # Full jitter keeps concurrent sessions from retrying in lockstep
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+def request(endpoint, method, url, **kwargs):
+    """
+    Sends a request through the pooled session for url's host.
+    Applies the endpoint's timeouts, retries idempotent calls on connection errors,
+    timeouts and 429/502/503/504 with jittered backoff, and fails fast while the host's circuit is open
+    (opened by connection errors, timeouts and 502/503/504 only).
+    """
+    config = ENDPOINTS.get(endpoint, DEFAULT_ENDPOINT)
+    kwargs.setdefault("timeout", config["timeout"])
+    retries = config["retries"] if config["idempotent"] else 0
+    session = get_session(url)
+    breaker = get_breaker(url)
+    import requests
+
+    with tracing.span("http." + endpoint) as span:
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                raise CircuitOpenError(f"{_host_key(url)} is temporarily unavailable (circuit open)")
+            try:
+                response = session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                breaker.record_failure()
+                if attempt >= retries:
+                    raise
+            except Exception:
+                # Any other error (broken chunked body, too many redirects, invalid URL) must still end
+                # a half-open trial, or allow() would refuse this host until the process restarts
+                breaker.record_failure()
+                raise
+            else:
+                if response.status_code in BREAKER_STATUS_CODES:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= retries:
+                    if span.recording:
+                        # A streamed body is left unread for the caller
+                        span.set(status=response.status_code, attempts=attempt + 1,
+                                 bytes=None if kwargs.get("stream") else len(response.content))
+                    return response
+            time.sleep(_backoff(attempt))
+            attempt += 1
+
+
+def get(endpoint, url, **kwargs):
+    return request(endpoint, "GET", url, **kwargs)
+
+
+def post(endpoint, url, **kwargs):
+    return request(endpoint, "POST", url, **kwargs)
@@ -0,0 +1,240 @@
+import re
+from datetime import datetime, timedelta
+
+# Korean city/airport names customers use instead of IATA codes
+AIRPORT_NAMES = {
+    "인천": "ICN", "김포": "GMP", "제주": "CJU", "부산": "PUS", "김해": "PUS", "대구": "TAE", "광주": "KWJ",
+    "청주": "CJJ", "나리타": "NRT", "도쿄": "NRT", "오사카": "KIX", "간사이": "KIX", "후쿠오카": "FUK",
+    "삿포로": "CTS", "오키나와": "OKA", "방콕": "BKK", "다낭": "DAD", "세부": "CEB", "마닐라": "MNL",
+    "클락": "CRK", "괌": "GUM", "타이베이": "TPE", "홍콩": "HKG", "마카오": "MFM", "나트랑": "CXR",
+    "냐짱": "CXR", "비엔티안": "VTE", "코타키나발루": "BKI", "보홀": "TAG", "싱가포르": "SIN",
+}
+KNOWN_AIRPORTS = set(AIRPORT_NAMES.values()) | {"HND", "NGO", "KMQ", "PVG", "PEK", "TAO", "SGN", "HAN", "DPS", "ITM"}
+# Uppercase three-letter words that are not airports
+NOT_AIRPORTS = {"PNR", "API", "FAQ", "KST", "UTC", "THE", "AND", "YES", "LJS"}
+
+RELATIVE_DAYS = {"그저께": -2, "엊그제": -2, "어제": -1, "오늘": 0, "금일": 0, "내일": 1, "명일": 1, "모레": 2, "글피": 3}
+
+_NB = r"(?<![A-Za-z0-9])"   # ASCII word boundaries; \b fails next to Hangul ("ICN에서")
+_NA = r"(?![A-Za-z0-9])"
+
+FLIGHT_NO_RE = re.compile(_NB + r"(?:LJ|lj|Lj)\s?(\d{2,4})" + _NA)
+COMPACT_DATE_RE = re.compile(_NB + r"(20\d{2})(0[1-9]|1[0-2])(0[1-9]|[12]\d|3[01])" + _NA)
+SEPARATED_DATE_RE = re.compile(r"(20\d{2})\s?[-./년]\s?(\d{1,2})\s?[-./월]\s?(\d{1,2})\s?일?")
+RELATIVE_DATE_RE = re.compile("|".join(sorted(RELATIVE_DAYS, key=len, reverse=True)))
+CODE_RE = re.compile(_NB + r"([A-Za-z]{3})" + _NA)
+AIRPORT_NAME_RE = re.compile("|".join(sorted(AIRPORT_NAMES, key=len, reverse=True)))
+PNR_TOKEN_RE = re.compile(_NB + r"([A-Z0-9]{6})" + _NA)
+SLASH_NAME_RE = re.compile(_NB + r"([A-Za-z]{2,})\s?/\s?([A-Za-z]{2,})" + _NA)
+LABELED_LAST_RE = re.compile(r"(?:성|last\s?name)\s*[:：]?\s*([A-Za-z]{2,})", re.IGNORECASE)
+LABELED_FIRST_RE = re.compile(r"(?:이름|first\s?name)\s*[:：]?\s*([A-Za-z]{2,})", re.IGNORECASE)
+FROM_MARKER_RE = re.compile(r"^\s?에서|^발(?![가-힣])")
+HANGUL_RE = re.compile(r"[가-힣]")
+PROSE_RE = re.compile(r"[a-z]{2,}")
+
+OPERATION_KEYWORDS = ("운항", "지연", "결항", "출발했", "도착했", "도착 시간", "출발 시간", "현황")
+PNR_KEYWORDS = ("예약", "pnr", "PNR", "booking")
+# Requests about something other than a lookup (confirmation e-mails, cancellations, changes, baggage,
+# seats) can carry every lookup slot; they go to the model
+OTHER_INTENT_KEYWORDS = ("확인서", "이메일", "메일", "발송", "보내", "@", "취소", "변경", "환불", "수하물", "좌석", "결제")
+
+
+class Intent:
+    __slots__ = ("tool", "args")
+
+    def __init__(self, tool, args):
+        self.tool = tool
+        self.args = args
+
+    def __repr__(self):
+        return f"Intent({self.tool!r}, {self.args!r})"
+
+    def __eq__(self, other):
+        return isinstance(other, Intent) and (self.tool, self.args) == (other.tool, other.args)
+
+
+def extract_dates(text, now=None):
+    now = now or datetime.now()
+    dates = set()
+    for year, month, day in COMPACT_DATE_RE.findall(text):
+        dates.add(f"{year}{month}{day}")
+    for year, month, day in SEPARATED_DATE_RE.findall(text):
+        try:
+            dates.add(datetime(int(year), int(month), int(day)).strftime("%Y%m%d"))
+        except ValueError:
+            pass
+    for word in RELATIVE_DATE_RE.findall(text):
+        dates.add((now + timedelta(days=RELATIVE_DAYS[word])).strftime("%Y%m%d"))
+    return dates
+
+
+def extract_airports(text):
+    """Returns airport codes in order of appearance as [(position, code, is_departure_marked)]."""
+    found = []
+    for match in CODE_RE.finditer(text):
+        token = match.group(1)
+        code = token.upper()
+        if code in NOT_AIRPORTS or not (token.isupper() or code in KNOWN_AIRPORTS):
+            continue
+        found.append((match.start(), code, bool(FROM_MARKER_RE.match(text[match.end():]))))
+    for match in AIRPORT_NAME_RE.finditer(text):
+        found.append((match.start(), AIRPORT_NAMES[match.group(0)], bool(FROM_MARKER_RE.match(text[match.end():]))))
+    found.sort()
+    # "인천(ICN)" names the same airport twice
+    deduped = []
+    for item in found:
+        if not deduped or deduped[-1][1] != item[1]:
+            deduped.append(item)
+    return deduped
+
+
+def _route_pair(airports):
+    codes = []
+    for _, code, _ in airports:
+        if code not in codes:
+            codes.append(code)
+    if len(codes) != 2:
+        return None
+    marked = [code for _, code, is_from in airports if is_from]
+    if marked and marked[0] == codes[1]:
+        return codes[1], codes[0]
+    return codes[0], codes[1]
+
+
+def extract_names(text):
+    """Returns (first_name, last_name) from 'HONG/GILDONG' or labeled '성 HONG 이름 GILDONG', else None."""
+    slash = SLASH_NAME_RE.search(text)
+    if slash:
+        return slash.group(2).upper(), slash.group(1).upper()
+    last, first = LABELED_LAST_RE.search(text), LABELED_FIRST_RE.search(text)
+    if last and first:
+        return first.group(1).upper(), last.group(1).upper()
+    return None
+
+
+def route(message, now=None):
+    """
+    Returns an Intent when the message asks for a lookup (operation or PNR keyword, nothing else
+    asked) and every slot of one tool is unambiguously present, else None (the message then goes
+    to the model as usual).
+    """
+    text = str(message)
+    # Templated answers are Korean; English prose goes to the model so it can answer in English
+    if not HANGUL_RE.search(text) and PROSE_RE.search(text):
+        return None
+    if any(keyword in text for keyword in OTHER_INTENT_KEYWORDS):
+        return None
+    flight_nos = set(FLIGHT_NO_RE.findall(text))
+    dates = extract_dates(text, now)
+    airports = extract_airports(text)
+
+    if len(dates) != 1:
+        return None
+    date = next(iter(dates))
+
+    is_operation = any(keyword in text for keyword in OPERATION_KEYWORDS)
+    if flight_nos:
+        pair = _route_pair(airports)
+        if not is_operation or len(flight_nos) != 1 or pair is None:
+            return None
+        return Intent("get_flight_operation_detail", {
+            "date": date, "flight_no": f"LJ{next(iter(flight_nos))}", "departure": pair[0], "arrival": pair[1]})
+
+    if any(keyword in text for keyword in PNR_KEYWORDS):
+        names = extract_names(text)
+        if names is None:
+            return None
+        name_tokens = {names[0], names[1]}
+        pnrs = {token for token in PNR_TOKEN_RE.findall(text)
+                if token not in name_tokens and token not in dates and not token.isdigit()}
+        if len(pnrs) != 1:
+            return None
+        return Intent("get_pnr_detail", {
+            "pnr": pnrs.pop(), "first_name": names[0], "last_name": names[1], "departure_date": date})
+
+    if is_operation:
+        pair = _route_pair(airports)
+        if pair is None:
+            return None
+        return Intent("get_flight_operation_info", {"date": date, "departure": pair[0], "arrival": pair[1]})
+
+    return None
+
+
+# --- Templated answers (same formats as the system instruction) ---
+
+def _fmt_date(date):
+    return f"{date[:4]}년 {date[4:6]}월 {date[6:]}일"
+
+
+def render_operation_detail(flight, args):
+    if "error" in flight:
+        return f"⚠️ {flight['error']}"
+    # Instruction 6 response format
+    return (f"LJ{flight.get('FlightNo', '')}편은 {flight.get('DepartureScheduleTime', '-')}에 출발하여"
+            f"({flight.get('DepartureDisplayTitle', '-')}), {flight.get('ArrivalActualTime') or '-'}에 도착했습니다"
+            f"({flight.get('ArrivalDisplayTitle', '-')}). 현재 상태는 {flight.get('Status', '-')}입니다.")
+
+
+def render_operation_info(data, args):
+    if "error" in data:
+        return f"⚠️ {data['error']}"
+    flights = data.get("FlightInfo")
+    if flights is None:
+        return None
+    header = f"{_fmt_date(args['date'])} {args['departure']} → {args['arrival']} 운항 정보"
+    if not flights:
+        return f"{header}: 운항 편이 없습니다."
+    lines = [f"{header} ({len(flights)}편)"]
+    for flight in flights:
+        # Instruction 5: Flight No, Times (Schedule/Actual), Status
+        lines.append(
+            f"- LJ{flight.get('FlightNo', '')}: 출발 {flight.get('DepartureScheduleTime', '-')}"
+            f" (실제 {flight.get('DepartureActualTime') or '-'}), 도착 {flight.get('ArrivalScheduleTime', '-')}"
+            f" (실제 {flight.get('ArrivalActualTime') or '-'}) · {flight.get('Status', '-')}")
+    return "\n".join(lines)
+
+
+def render_pnr_detail(data, args):
+    if "error" in data:
+        return f"⚠️ {data['error']}"
+    guests = data.get("guestDetails")
+    itineraries = data.get("itineraryDetails")
+    if not guests or not itineraries:
+        return None
+    segments = [segment for itinerary in itineraries for segment in itinerary.get("itinerarySegments", [])]
+    flight_lines = []
+    for segment in segments:
+        flight = segment.get("flightNumber") or segment.get("flightNo")
+        departure_time = segment.get("departureDateTime") or segment.get("departureDate")
+        if not flight or not departure_time:
+            # Unknown payload shape: let the model summarize it
+            return None
+        flight_lines.append(f"- {flight} {segment.get('departureAirport', '')} → {segment.get('arrivalAirport', '')}"
+                            f" {str(departure_time).replace('T', ' ')[:16]}")
+    passengers = ", ".join(f"{g.get('lastName', '')}/{g.get('firstName', '')}" for g in guests)
+    # Instruction 4: Flight, Date, Passengers
+    return "\n".join([f"예약번호 {args['pnr']} 예약 내역입니다.", *flight_lines, f"- 탑승객: {passengers}"])
+
+
+RENDERERS = {
+    "get_flight_operation_detail": render_operation_detail,
+    "get_flight_operation_info": render_operation_info,
+    "get_pnr_detail": render_pnr_detail,
+}
+
+
+def answer(message, tools, now=None):
+    """
+    Routes and answers a structured lookup without the model.
+    `tools` maps tool names to the functions exposed to the model.
+    Returns (intent, answer_text) or None when the message should go to the model.
+    """
+    intent = route(message, now)
+    if intent is None or intent.tool not in tools:
+        return None
+    result = tools[intent.tool](**intent.args)
+    text = RENDERERS[intent.tool](result if isinstance(result, dict) else {}, intent.args)
+    if text is None:
+        return None
+    return intent, text
@@ -0,0 +1,180 @@
+import contextvars
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import tracing
+import usage_log
+
+# TTLs in seconds. Only repeats within one conversation (typo fixes, the model re-checking while it
+# summarizes) are meant to be served; a booking can change between visits.
+BOOKING_TTL = 120
+NOT_FOUND_TTL = 30
+MAX_BOOKINGS = 8            # per session
+
+PNR_RE = re.compile(r"[A-Z0-9]{6}")
+MISMATCH_ERROR = "입력하신 여정(출발일) 또는 탑승객 정보가 예약 내역과 일치하지 않습니다."
+
+# The calling session's PnrCache (set by chat_engine per turn; tool_runner copies the context into
+# each tool call). There is no process-wide cache: bookings are only reachable from their session.
+current = contextvars.ContextVar("pnr_cache", default=None)
+
+
+def normalize_pnr(pnr):
+    return str(pnr or "").strip().upper()
+
+
+def normalize_name(name):
+    """'Gil-Dong' / 'GIL DONG' -> 'GILDONG'."""
+    return re.sub(r"[\s\-.'`]", "", str(name or "")).upper()
+
+
+def normalize_date(value):
+    """'2024-02-06T10:00:00' / '20240206' -> '20240206'."""
+    return re.sub(r"\D", "", str(value or ""))[:8]
+
+
+def validate(pnr, first_name, last_name, departure_date):
+    """Error message for arguments that can never match a booking (checked before any request), else None."""
+    if not PNR_RE.fullmatch(pnr):
+        return f"예약번호는 영문 대문자와 숫자 6자리입니다 (입력값: {pnr or '-'})."
+    if not first_name or not last_name:
+        return "탑승객의 성과 이름을 모두 입력해 주세요."
+    try:
+        datetime.strptime(departure_date, "%Y%m%d")
+    except ValueError:
+        return f"출발일은 YYYYMMDD 형식의 올바른 날짜여야 합니다 (입력값: {departure_date or '-'})."
+    return None
+
+
+class Booking:
+    """
+    One getPnrDetail response and its match index (normalized passenger names, departure dates),
+    built once per fetch. found is False for responses without passengers and itineraries.
+    """
+    __slots__ = ("data", "found", "names", "dates", "expires_at")
+
+    def __init__(self, data):
+        self.data = data
+        fields = data if isinstance(data, dict) else {}
+        guests = fields.get("guestDetails", fields.get("Passengers"))
+        itineraries = fields.get("itineraryDetails", fields.get("Journeys"))
+        self.found = isinstance(guests, list) and isinstance(itineraries, list)
+        self.names = set()
+        self.dates = set()
+        if self.found:
+            for guest in guests:
+                self.names.add((normalize_name(guest.get("lastName", guest.get("LastName"))),
+                                normalize_name(guest.get("firstName", guest.get("FirstName")))))
+            for itinerary in itineraries:
+                # getPnrDetail nests segments; the older Journeys shape carries DepartureTime itself
+                for segment in itinerary.get("itinerarySegments", [itinerary]):
+                    departure = (segment.get("departureDateTime") or segment.get("departureDate")
+                                 or segment.get("DepartureTime"))
+                    if departure:
+                        self.dates.add(normalize_date(departure))
+        self.expires_at = time.monotonic() + (BOOKING_TTL if self.found else NOT_FOUND_TTL)
+
+    def matches(self, first_name, last_name, departure_date):
+        return departure_date in self.dates and (normalize_name(last_name), normalize_name(first_name)) in self.names
+
+
+class _Inflight:
+    __slots__ = ("event", "booking", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.booking = None
+        self.error = None
+
+
+class PnrCache:
+    """
+    One session's fetched bookings keyed by PNR. Not-found responses are kept too (shorter TTL), and
+    a name/date mismatch is answered from the cached booking's index, so neither is re-fetched.
+    Concurrent lookups of the same PNR (parallel tool calls) share one request; errors are not cached.
+    """
+
+    def __init__(self, max_bookings=MAX_BOOKINGS):
+        self.max_bookings = max_bookings
+        self.bookings = OrderedDict()
+        self.inflight = {}
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "not_found": 0, "mismatches": 0, "rejected": 0, "coalesced": 0}
+
+    def get(self, pnr, fetch):
+        """Booking for the PNR, calling fetch() when it is not cached (or expired)."""
+        with self.lock:
+            booking = self.bookings.get(pnr)
+            if booking is not None and booking.expires_at > time.monotonic():
+                self.bookings.move_to_end(pnr)
+                self.counters["hits"] += 1
+                usage_log.count_cache_hit()
+                return booking, "hit"
+            inflight = self.inflight.get(pnr)
+            leader = inflight is None
+            if leader:
+                inflight = self.inflight[pnr] = _Inflight()
+                self.counters["misses"] += 1
+            else:
+                self.counters["coalesced"] += 1
+
+        if not leader:
+            inflight.event.wait()
+            if inflight.error is not None:
+                raise inflight.error
+            return inflight.booking, "coalesced"
+
+        try:
+            booking = inflight.booking = Booking(fetch())
+            with self.lock:
+                self.bookings[pnr] = booking
+                self.bookings.move_to_end(pnr)
+                while len(self.bookings) > self.max_bookings:
+                    self.bookings.popitem(last=False)
+            return booking, "miss"
+        except Exception as e:
+            inflight.error = e
+            raise
+        finally:
+            with self.lock:
+                self.inflight.pop(pnr, None)
+            inflight.event.set()
+
+    def count(self, counter):
+        with self.lock:
+            self.counters[counter] += 1
+
+    def get_stats(self):
+        with self.lock:
+            return {**self.counters, "bookings": len(self.bookings)}
+
+
+def lookup(pnr, first_name, last_name, departure_date, fetch, cache=None):
+    """
+    get_pnr_detail for the calling session: validates the arguments, then serves the booking from the
+    session's cache (fetch(pnr) on a miss) and matches the passenger and departure date against it.
+    Returns the booking payload, the upstream's not-found payload, or {"error": ...}.
+    """
+    cache = cache or current.get() or PnrCache()    # outside a chat turn: nothing is kept
+    pnr = normalize_pnr(pnr)
+    departure_date = re.sub(r"[-./]", "", str(departure_date or "").strip())    # 2024-02-06 -> 20240206
+    with tracing.span("cache.pnr") as span:
+        error = validate(pnr, normalize_name(first_name), normalize_name(last_name), departure_date)
+        if error is not None:
+            cache.count("rejected")
+            span.set(outcome="rejected")
+            return {"error": error}
+        booking, outcome = cache.get(pnr, lambda: fetch(pnr))
+        if not booking.found:
+            cache.count("not_found")
+            span.set(outcome=f"{outcome}.not_found")
+            return booking.data
+        if not booking.matches(first_name, last_name, departure_date):
+            cache.count("mismatches")
+            span.set(outcome=f"{outcome}.mismatch")
+            return {"error": MISMATCH_ERROR}
+        span.set(outcome=outcome)
+        return booking.data
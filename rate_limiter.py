@@ -0,0 +1,263 @@
+import hashlib
+import itertools
+import sqlite3
+import threading
+import time
+
+# Gemini quotas: per API key, and for all keys served by this deployment together
+RPM_LIMIT = 10
+TPM_LIMIT = 250000
+GLOBAL_RPM_LIMIT = 60
+GLOBAL_TPM_LIMIT = 1000000
+GLOBAL_KEY = "*"
+
+# Part of the quota that may be spent in a burst; the rest refills evenly, so no sliding
+# window ever sees more than the limit (a full bucket plus a whole window of refill would)
+BURST_FRACTION = 0.2
+
+MAX_QUEUE = 32            # waiting requests per API key and process; more are rejected
+MAX_WAIT = 45.0           # seconds a request may wait before giving up
+AGING_SECONDS = 10.0      # a waiting new conversation is treated like a continuing one after this long
+POLL_INTERVAL = 0.5
+BUSY_TIMEOUT_MS = 5000
+
+PRIORITY_CONTINUING = 0
+PRIORITY_NEW = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_bucket (
+    key TEXT PRIMARY KEY,
+    requests REAL NOT NULL,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class RateLimited(Exception):
+    """The request could not get quota in time (or the queue was full)."""
+
+
+class QueueFull(RateLimited):
+    pass
+
+
+class WaitTimeout(RateLimited):
+    pass
+
+
+def key_id(api_key):
+    """Buckets are stored under a hash, never the API key itself."""
+    return hashlib.sha256(str(api_key).encode("utf-8")).hexdigest()[:16]
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "since")
+
+    def __init__(self, priority, seq):
+        self.priority = priority
+        self.seq = seq
+        self.since = time.monotonic()
+
+    def rank(self, now):
+        priority = PRIORITY_CONTINUING if now - self.since >= AGING_SECONDS else self.priority
+        return priority, self.seq
+
+
+class RateLimiter:
+    """
+    Token buckets (requests/min and tokens/min) per API key plus one global bucket, kept in SQLite
+    so every process serving the app draws from the same quota. Requests that cannot run yet wait
+    in a bounded per-key queue: continuing conversations first, FIFO within a priority, and new
+    conversations age into the front so they are not starved.
+    """
+
+    def __init__(self, path, rpm=RPM_LIMIT, tpm=TPM_LIMIT, global_rpm=GLOBAL_RPM_LIMIT, global_tpm=GLOBAL_TPM_LIMIT,
+                 max_queue=MAX_QUEUE, max_wait=MAX_WAIT, window=60.0):
+        self.path = path
+        self.window = window      # quota period in seconds (limits are per minute)
+        self.rpm, self.tpm = rpm, tpm
+        self.global_rpm, self.global_tpm = global_rpm, global_tpm
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.queues = {}          # key id -> [_Waiter]
+        self.cond = threading.Condition()
+        self.seq = itertools.count()
+        self.last_wait = {}       # key id -> seconds the head of the queue was last told to wait
+        self.stats = {"granted": 0, "waited": 0, "wait_s_total": 0.0, "rejected_full": 0, "timed_out": 0, "exhausted": 0}
+        conn = self._connect()
+        conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def _limits(self, kid):
+        """[(bucket key, (request capacity, per second), (token capacity, per second))]"""
+        limits = []
+        for key, rpm, tpm in ((kid, self.rpm, self.tpm), (GLOBAL_KEY, self.global_rpm, self.global_tpm)):
+            specs = []
+            for limit in (rpm, tpm):
+                capacity = max(1.0, limit * BURST_FRACTION)
+                specs.append((capacity, max(limit - capacity, limit * 0.5) / self.window))
+            limits.append((key, specs[0], specs[1]))
+        return limits
+
+    def _request_interval(self):
+        """Seconds between requests of one key once its burst is spent."""
+        return 1 / self._limits(GLOBAL_KEY)[0][1][1]
+
+    def _try_take(self, kid, tokens):
+        """Takes 1 request + `tokens` from both buckets atomically; returns 0 or the seconds to wait."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            updates, wait = [], 0.0
+            for key, (request_cap, request_rate), (token_cap, token_rate) in self._limits(kid):
+                row = conn.execute("SELECT requests, tokens, updated FROM rate_bucket WHERE key = ?", (key,)).fetchone()
+                requests, available, updated = row if row else (request_cap, token_cap, now)
+                elapsed = max(0.0, now - updated)
+                requests = min(request_cap, requests + elapsed * request_rate)
+                available = min(token_cap, available + elapsed * token_rate)
+                # A request larger than the whole bucket may still run once the bucket is full
+                need = min(tokens, token_cap)
+                if requests < 1:
+                    wait = max(wait, (1 - requests) / request_rate)
+                if available < need:
+                    wait = max(wait, (need - available) / token_rate)
+                updates.append((key, requests - 1, available - tokens, now))
+            if wait > 0:
+                conn.execute("ROLLBACK")
+                return wait
+            conn.executemany("INSERT OR REPLACE INTO rate_bucket (key, requests, tokens, updated) VALUES (?, ?, ?, ?)",
+                             updates)
+            conn.execute("COMMIT")
+            return 0.0
+        finally:
+            conn.close()
+
+    def _adjust(self, kid, requests=0.0, tokens=0.0, drain=False):
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for key, (request_cap, _), (token_cap, _) in self._limits(kid):
+                row = conn.execute("SELECT requests, tokens, updated FROM rate_bucket WHERE key = ?", (key,)).fetchone()
+                current_requests, current_tokens, updated = row if row else (request_cap, token_cap, now)
+                if drain and key != GLOBAL_KEY:
+                    current_requests, updated = 0.0, now
+                conn.execute("INSERT OR REPLACE INTO rate_bucket (key, requests, tokens, updated) VALUES (?, ?, ?, ?)",
+                             (key, min(request_cap, current_requests + requests), min(token_cap, current_tokens + tokens),
+                              updated))
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def estimate_wait(self, api_key, position=None):
+        """Rough seconds until a request queued at `position` (default: the end of the queue) can run."""
+        kid = key_id(api_key)
+        with self.cond:
+            queue = self.queues.get(kid, [])
+            position = len(queue) if position is None else position
+            return self.last_wait.get(kid, 0.0) * bool(queue) + position * self._request_interval()
+
+    def acquire(self, api_key, tokens=0, priority=PRIORITY_NEW, on_wait=None):
+        """
+        Blocks until one request and `tokens` tokens are available for the key (and globally).
+        on_wait(seconds, position) is called while waiting so the UI can show the expected delay.
+        Raises QueueFull or WaitTimeout instead of letting the request hit the upstream quota.
+        """
+        kid = key_id(api_key)
+        start = time.monotonic()
+        deadline = start + self.max_wait
+        with self.cond:
+            queue = self.queues.setdefault(kid, [])
+            if len(queue) >= self.max_queue:
+                self.stats["rejected_full"] += 1
+                raise QueueFull("요청이 많아 대기열이 가득 찼습니다.")
+            waiter = _Waiter(priority, next(self.seq))
+            queue.append(waiter)
+        waited = False
+        try:
+            while True:
+                now = time.monotonic()
+                with self.cond:
+                    ordered = sorted(queue, key=lambda w: w.rank(now))
+                    position = ordered.index(waiter)
+                if position == 0:
+                    wait = self._try_take(kid, tokens)
+                    if wait == 0:
+                        with self.cond:
+                            self.stats["granted"] += 1
+                            if waited:
+                                self.stats["waited"] += 1
+                                self.stats["wait_s_total"] += time.monotonic() - start
+                        return tokens
+                    with self.cond:
+                        self.last_wait[kid] = wait
+                else:
+                    with self.cond:
+                        wait = self.last_wait.get(kid, 0.0) + position * self._request_interval()
+                if now + min(wait, POLL_INTERVAL) >= deadline:
+                    with self.cond:
+                        self.stats["timed_out"] += 1
+                    raise WaitTimeout("요청이 많아 응답이 지연되고 있습니다.")
+                waited = True
+                if on_wait is not None:
+                    on_wait(wait, position)
+                with self.cond:
+                    self.cond.wait(min(wait, POLL_INTERVAL) if position == 0 else POLL_INTERVAL)
+        finally:
+            with self.cond:
+                queue.remove(waiter)
+                self.cond.notify_all()
+
+    def settle(self, api_key, reserved_tokens, actual_tokens):
+        """Corrects the token buckets once the real usage of a turn is known (refund or extra charge)."""
+        if reserved_tokens != actual_tokens:
+            self._adjust(key_id(api_key), tokens=reserved_tokens - actual_tokens)
+
+    def exhausted(self, api_key):
+        """Upstream said the quota is gone (ResourceExhausted): stop this key's requests until it refills."""
+        with self.cond:
+            self.stats["exhausted"] += 1
+        self._adjust(key_id(api_key), drain=True)
+
+    def get_stats(self):
+        with self.cond:
+            stats = dict(self.stats)
+            stats["queued"] = sum(len(queue) for queue in self.queues.values())
+        stats["wait_s_avg"] = stats["wait_s_total"] / stats["waited"] if stats["waited"] else 0.0
+        return stats
+
+
+class LimitedChat:
+    """
+    Wraps a ChatSession so every model round-trip (including tool rounds) goes through the limiter.
+    The first call of a turn reserves the estimated turn tokens; later rounds only take a request.
+    """
+
+    def __init__(self, chat, limiter, api_key, estimated_tokens, priority=PRIORITY_NEW, on_wait=None):
+        self.chat = chat
+        self.limiter = limiter
+        self.api_key = api_key
+        self.estimated_tokens = estimated_tokens
+        self.priority = priority
+        self.on_wait = on_wait
+        self.reserved_tokens = 0
+        self.requests = 0
+
+    def send_message(self, content, **kwargs):
+        tokens = self.estimated_tokens if self.requests == 0 else 0
+        # Tool rounds of a turn already in progress go ahead of new conversations
+        priority = self.priority if self.requests == 0 else PRIORITY_CONTINUING
+        self.reserved_tokens += self.limiter.acquire(self.api_key, tokens, priority, self.on_wait)
+        self.requests += 1
+        return self.chat.send_message(content, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.chat, name)
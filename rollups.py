@@ -0,0 +1,194 @@
+import json
+import math
+from datetime import datetime
+
+# Bucket key = prefix of the 'YYYY-MM-DD HH:MM:SS' timestamp
+GRANULARITIES = {"minute": 16, "hour": 13, "day": 10}
+BUCKET_FORMATS = {"minute": "%Y-%m-%d %H:%M", "hour": "%Y-%m-%d %H", "day": "%Y-%m-%d"}
+
+SKETCH_RELATIVE_ACCURACY = 0.02
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage_rollup (
+    granularity TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    model TEXT NOT NULL,
+    requests INTEGER NOT NULL DEFAULT 0,
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    candidate_tokens INTEGER NOT NULL DEFAULT 0,
+    latency_sketch TEXT,
+    PRIMARY KEY (granularity, bucket, model)
+) WITHOUT ROWID;
+"""
+
+
+class LatencySketch:
+    """
+    Log-bucketed histogram (DDSketch style): quantiles within SKETCH_RELATIVE_ACCURACY,
+    and two sketches merge by adding bucket counts, so hourly/daily percentiles come from minute sketches.
+    """
+
+    def __init__(self, counts=None, relative_accuracy=SKETCH_RELATIVE_ACCURACY):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.counts = counts or {}
+        self.zeros = 0
+
+    @property
+    def count(self):
+        return self.zeros + sum(self.counts.values())
+
+    def add(self, value, n=1):
+        if value is None:
+            return
+        if value <= 0:
+            self.zeros += n
+            return
+        index = math.ceil(math.log(value) / self.log_gamma)
+        self.counts[index] = self.counts.get(index, 0) + n
+
+    def merge(self, other):
+        self.zeros += other.zeros
+        for index, n in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + n
+        return self
+
+    def quantile(self, q):
+        total = self.count
+        if total == 0:
+            return None
+        rank = q * (total - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen > rank:
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.counts) / (self.gamma + 1)
+
+    def to_json(self):
+        data = {str(k): v for k, v in self.counts.items()}
+        if self.zeros:
+            data["z"] = self.zeros
+        return json.dumps(data, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, text):
+        if not text:
+            return cls()
+        data = json.loads(text)
+        zeros = data.pop("z", 0)
+        sketch = cls({int(k): v for k, v in data.items()})
+        sketch.zeros = zeros
+        return sketch
+
+
+def aggregate(entries):
+    """Groups entries (dicts or COLUMNS-ordered tuples) into {(granularity, bucket, model): [requests, prompt, candidate, sketch]}."""
+    groups = {}
+    for entry in entries:
+        if isinstance(entry, dict):
+            timestamp, model = entry["timestamp"], entry["model"]
+            prompt, candidate, latency = entry.get("prompt_tokens") or 0, entry.get("candidate_tokens") or 0, entry.get("latency_ms")
+        else:
+            timestamp, model, prompt, candidate, latency = entry[0], entry[1], entry[2] or 0, entry[3] or 0, entry[4]
+        for granularity, width in GRANULARITIES.items():
+            key = (granularity, timestamp[:width], model)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = [0, 0, 0, LatencySketch()]
+            group[0] += 1
+            group[1] += prompt
+            group[2] += candidate
+            group[3].add(latency)
+    return groups
+
+
+def apply(conn, entries):
+    """
+    Folds a batch of raw entries into the rollup table. Must run inside the same
+    write transaction as the raw insert (BEGIN IMMEDIATE) so sketches merge without lost updates.
+    """
+    for (granularity, bucket, model), (requests, prompt, candidate, sketch) in aggregate(entries).items():
+        row = conn.execute(
+            "SELECT latency_sketch FROM usage_rollup WHERE granularity = ? AND bucket = ? AND model = ?",
+            (granularity, bucket, model)).fetchone()
+        if row is not None and row[0]:
+            sketch.merge(LatencySketch.from_json(row[0]))
+        conn.execute(
+            """INSERT INTO usage_rollup (granularity, bucket, model, requests, prompt_tokens, candidate_tokens, latency_sketch)
+               VALUES (?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (granularity, bucket, model) DO UPDATE SET
+                   requests = requests + excluded.requests,
+                   prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                   candidate_tokens = candidate_tokens + excluded.candidate_tokens,
+                   latency_sketch = excluded.latency_sketch""",
+            (granularity, bucket, model, requests, prompt, candidate, sketch.to_json()))
+
+
+def rebuild(conn, batch_size=100000):
+    """Recomputes all rollups from the raw usage table (used once after importing legacy rows)."""
+    conn.execute("DELETE FROM usage_rollup")
+    cursor = conn.execute("SELECT timestamp, model, prompt_tokens, candidate_tokens, latency_ms FROM usage")
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        apply(conn, rows)
+
+
+def query(conn, granularity="hour", start=None, end=None, model=None, quantiles=(0.5, 0.95, 0.99)):
+    """
+    Returns rollup rows for start <= bucket < end. Cost depends on the number of buckets
+    in the range, not on how many raw rows were logged.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {list(GRANULARITIES)}")
+    sql = "SELECT bucket, model, requests, prompt_tokens, candidate_tokens, latency_sketch FROM usage_rollup WHERE granularity = ?"
+    params = [granularity]
+    if start is not None:
+        sql += " AND bucket >= ?"
+        params.append(_bucket(start, granularity))
+    if end is not None:
+        sql += " AND bucket < ?"
+        params.append(_bucket(end, granularity))
+    if model is not None:
+        sql += " AND model = ?"
+        params.append(model)
+    sql += " ORDER BY bucket, model"
+
+    results = []
+    for bucket, row_model, requests, prompt, candidate, sketch_json in conn.execute(sql, params):
+        sketch = LatencySketch.from_json(sketch_json)
+        row = {"bucket": bucket, "model": row_model, "requests": requests,
+               "prompt_tokens": prompt, "candidate_tokens": candidate}
+        for q in quantiles:
+            row[f"latency_p{int(q * 100)}"] = sketch.quantile(q)
+        results.append(row)
+    return results
+
+
+def merged_latency(conn, granularity, start=None, end=None, model=None, quantiles=(0.5, 0.95, 0.99)):
+    """Merges every sketch in the range into overall latency percentiles."""
+    sql = "SELECT latency_sketch FROM usage_rollup WHERE granularity = ?"
+    params = [granularity]
+    if start is not None:
+        sql += " AND bucket >= ?"
+        params.append(_bucket(start, granularity))
+    if end is not None:
+        sql += " AND bucket < ?"
+        params.append(_bucket(end, granularity))
+    if model is not None:
+        sql += " AND model = ?"
+        params.append(model)
+    sketch = LatencySketch()
+    for (sketch_json,) in conn.execute(sql, params):
+        sketch.merge(LatencySketch.from_json(sketch_json))
+    return {f"p{int(q * 100)}": sketch.quantile(q) for q in quantiles}
+
+
+def _bucket(value, granularity):
+    if isinstance(value, datetime):
+        return value.strftime(BUCKET_FORMATS[granularity])
+    return str(value)[:GRANULARITIES[granularity]]
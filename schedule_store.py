@@ -0,0 +1,251 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import tracing
+import usage_log
+
+# TTLs in seconds: timetables change rarely, today's may still get ad-hoc changes
+PAST_DATE_TTL = 6 * 60 * 60
+FUTURE_DATE_TTL = 30 * 60
+TODAY_TTL = 10 * 60
+MAX_ENTRIES = 4096
+RANGE_MAX_DAYS = 14
+RANGE_MAX_PARALLEL = 4
+
+# Accepted spellings of the /API/Flight item fields
+FLIGHT_NO_KEYS = ("flightNo", "FlightNo", "flightNumber")
+DEPARTURE_TIME_KEYS = ("departureTime", "DepartureTime", "depTime")
+ARRIVAL_TIME_KEYS = ("arrivalTime", "ArrivalTime", "arrTime")
+DURATION_KEYS = ("duration", "Duration", "flightTime")
+COLUMNS = ["flightNo", "departure", "arrival", "duration"]
+
+
+def _first(item, keys):
+    for key in keys:
+        value = item.get(key)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def _minutes(value):
+    """'0705' / '07:05' / '2024-02-06 07:05' -> minutes after midnight (None if unparsable)."""
+    digits = ''.join(filter(str.isdigit, str(value or "")))[-4:]
+    if len(digits) < 3:
+        return None
+    hours, minutes = int(digits[:-2]), int(digits[-2:])
+    return hours * 60 + minutes if hours < 48 and minutes < 60 else None
+
+
+def _hhmm(minutes):
+    return f"{minutes // 60 % 24:02d}:{minutes % 60:02d}"
+
+
+def normalize(payload, departure, arrival):
+    """
+    /API/Flight payload -> [(departure minute, flight no, arrival minute, duration)] sorted by
+    departure time. Items of other routes and items without times are dropped.
+    """
+    items = payload.get("flights") if isinstance(payload, dict) else payload
+    flights = []
+    for item in items or []:
+        if not isinstance(item, dict):
+            continue
+        if (item.get("departure") or departure) != departure or (item.get("arrival") or arrival) != arrival:
+            continue
+        depart, land = _minutes(_first(item, DEPARTURE_TIME_KEYS)), _minutes(_first(item, ARRIVAL_TIME_KEYS))
+        if depart is None:
+            continue
+        try:
+            duration = int(_first(item, DURATION_KEYS))
+        except (TypeError, ValueError):
+            duration = (land - depart) % (24 * 60) if land is not None else None
+        if land is None and duration is not None:
+            land = depart + duration
+        flight_no = str(_first(item, FLIGHT_NO_KEYS) or "")
+        if flight_no.isdigit():
+            flight_no = "LJ" + flight_no
+        flights.append((depart, flight_no, land, duration))
+    flights.sort()
+    return flights
+
+
+def schedule_ttl(date, now=None):
+    today = (now or datetime.now()).strftime("%Y%m%d")
+    if date < today:
+        return PAST_DATE_TTL
+    return TODAY_TTL if date == today else FUTURE_DATE_TTL
+
+
+class ScheduleDay:
+    """One route's timetable for one date, sorted by departure, with the answer figures precomputed."""
+    __slots__ = ("date", "departure", "arrival", "flights", "fastest", "stored_at", "expires_at")
+
+    def __init__(self, date, departure, arrival, flights, ttl):
+        self.date = date
+        self.departure = departure
+        self.arrival = arrival
+        self.flights = flights
+        timed = [flight for flight in flights if flight[3] is not None]
+        # Shortest duration; the earlier departure wins a tie
+        self.fastest = min(timed, key=lambda flight: (flight[3], flight[0])) if timed else None
+        self.stored_at = time.time()
+        self.expires_at = time.monotonic() + ttl
+
+    @property
+    def stale(self):
+        return self.expires_at <= time.monotonic()
+
+    @staticmethod
+    def _flight(flight):
+        if flight is None:
+            return None
+        depart, flight_no, land, duration = flight
+        return {"flightNo": flight_no, "departure": _hhmm(depart),
+                "arrival": _hhmm(land) if land is not None else None, "duration": duration}
+
+    def summary(self, with_flights=True):
+        """Compact answer for the model: count, fastest, earliest/latest and the sorted list."""
+        summary = {"date": self.date, "route": f"{self.departure}-{self.arrival}", "count": len(self.flights)}
+        if self.flights:
+            summary.update(fastest=self._flight(self.fastest), earliest=self._flight(self.flights[0]),
+                           latest=self._flight(self.flights[-1]))
+        if self.stale:
+            # Served past its TTL while the upstream is down
+            summary.update(stale=True, fetched_at=datetime.fromtimestamp(self.stored_at).strftime("%Y-%m-%d %H:%M:%S"))
+        if with_flights:
+            summary["flights"] = {"columns": COLUMNS,
+                                  "rows": [list(self._flight(flight).values()) for flight in self.flights]}
+        return summary
+
+
+class _Inflight:
+    __slots__ = ("event", "day", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.day = None
+        self.error = None
+
+
+class ScheduleStore:
+    """
+    Process-wide cache of normalized /API/Flight schedules keyed by (date, departure, arrival).
+    Concurrent misses for one key share one upstream request; range queries fetch only the
+    missing days, in parallel.
+    """
+
+    def __init__(self, fetch, max_entries=MAX_ENTRIES, max_parallel=RANGE_MAX_PARALLEL):
+        self.fetch = fetch            # fetch(date, departure, arrival) -> /API/Flight payload
+        self.max_entries = max_entries
+        self.max_parallel = max_parallel
+        self.days = {}
+        self.inflight = {}
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0, "evictions": 0, "stale_served": 0}
+
+    def get_day(self, date, departure, arrival, allow_stale=False):
+        """allow_stale serves an expired day instead of fetching (the upstream is known to be down)."""
+        key = (date, departure.upper(), arrival.upper())
+        with tracing.span("cache.schedule_day", route=f"{key[1]}-{key[2]}", date=date) as span:
+            with self.lock:
+                day = self.days.get(key)
+                if day is not None and day.expires_at > time.monotonic():
+                    self.counters["hits"] += 1
+                    usage_log.count_cache_hit()
+                    span.set(outcome="hit")
+                    return day
+                if day is not None and allow_stale:
+                    self.counters["stale_served"] += 1
+                    usage_log.count_cache_hit()
+                    span.set(outcome="stale")
+                    return day
+                inflight = self.inflight.get(key)
+                leader = inflight is None
+                if leader:
+                    inflight = self.inflight[key] = _Inflight()
+                    self.counters["misses"] += 1
+                else:
+                    self.counters["coalesced"] += 1
+                    usage_log.count_cache_hit()
+                span.set(outcome="miss" if leader else "coalesced")
+
+            if not leader:
+                inflight.event.wait()
+                if inflight.error is not None:
+                    raise inflight.error
+                return inflight.day
+
+            try:
+                payload = self.fetch(*key)
+                if isinstance(payload, dict) and payload.get("error"):
+                    raise RuntimeError(payload["error"])
+                day = ScheduleDay(*key, normalize(payload, key[1], key[2]), schedule_ttl(date))
+                inflight.day = day
+                self._store(key, day)
+                return day
+            except Exception as e:
+                inflight.error = e
+                with self.lock:
+                    self.counters["errors"] += 1
+                raise
+            finally:
+                with self.lock:
+                    self.inflight.pop(key, None)
+                inflight.event.set()
+
+    def _store(self, key, day):
+        with self.lock:
+            self.days[key] = day
+            if len(self.days) > self.max_entries:
+                now = time.monotonic()
+                expired = [k for k, d in self.days.items() if d.expires_at <= now]
+                for k in expired or [min(self.days, key=lambda k: self.days[k].expires_at)]:
+                    del self.days[k]
+                    self.counters["evictions"] += 1
+
+    def cached_dates(self, departure, arrival, dates, allow_stale=False):
+        now = time.monotonic()
+        with self.lock:
+            return {date for date in dates
+                    if (day := self.days.get((date, departure.upper(), arrival.upper())))
+                    and (allow_stale or day.expires_at > now)}
+
+    def get_range(self, departure, arrival, start_date, days, allow_stale=False):
+        """
+        Schedules for `days` consecutive dates from start_date: cached days are used as they are,
+        missing ones are fetched concurrently. Returns [(date, ScheduleDay or exception)] in date order.
+        """
+        start = datetime.strptime(start_date, "%Y%m%d")
+        dates = [(start + timedelta(days=i)).strftime("%Y%m%d") for i in range(days)]
+        cached = self.cached_dates(departure, arrival, dates, allow_stale)
+        missing = [date for date in dates if date not in cached]
+
+        def load(date):
+            try:
+                return self.get_day(date, departure, arrival, allow_stale)
+            except Exception as e:
+                return e
+
+        results = {date: load(date) for date in cached}
+        if missing:
+            with ThreadPoolExecutor(max_workers=max(1, min(self.max_parallel, len(missing)))) as pool:
+                # Copy the caller's context so cache hits and trace spans land on the current turn
+                fetched = pool.map(lambda date: contextvars.copy_context().run(load, date), missing)
+                results.update(zip(missing, fetched))
+        return [(date, results[date]) for date in dates]
+
+    def clear(self):
+        with self.lock:
+            self.days.clear()
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats["entries"] = len(self.days)
+        lookups = stats["hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_rate"] = (stats["hits"] + stats["coalesced"]) / lookups if lookups else 0.0
+        return stats
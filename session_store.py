@@ -0,0 +1,138 @@
+import hashlib
+import json
+import sqlite3
+import time
+import uuid
+
+TURN_LEASE_SECONDS = 180.0      # a turn whose worker died unlocks the session after this
+SESSION_TTL = 24 * 60 * 60.0    # sessions idle longer than this are purged
+BUSY_TIMEOUT_MS = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_session (
+    id TEXT PRIMARY KEY,
+    messages TEXT NOT NULL,
+    memory TEXT NOT NULL,
+    turns INTEGER NOT NULL DEFAULT 0,
+    key_hash TEXT NOT NULL,
+    lease_owner TEXT,
+    lease_until REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS chat_session_updated ON chat_session (updated_at);
+"""
+
+
+class SessionNotFound(KeyError):
+    """No session with this id (never created, or purged after SESSION_TTL)."""
+
+
+class SessionBusy(Exception):
+    """Another turn of the same session is still running (on this or another worker)."""
+
+
+def hash_key(api_key):
+    """What a session stores of the API key that created it (never the key itself)."""
+    return hashlib.sha256(str(api_key or "").encode("utf-8")).hexdigest()
+
+
+class SessionStore:
+    """
+    Chat sessions (messages + conversation memory) in SQLite, so any worker process can serve
+    any turn of a session. A turn takes a lease on its session in a transaction: two turns of
+    one session never run at once, even on different workers. A session belongs to the API key
+    that created it: reads and turns with any other key see SessionNotFound / None.
+    """
+
+    def __init__(self, path, lease_seconds=TURN_LEASE_SECONDS, ttl=SESSION_TTL):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.ttl = ttl
+        conn = self._connect()
+        conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def create(self, memory, api_key=None):
+        """Creates an empty session owned by api_key and returns its id."""
+        session_id = uuid.uuid4().hex
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("INSERT INTO chat_session (id, messages, memory, key_hash, created_at, updated_at) "
+                         "VALUES (?, ?, ?, ?, ?, ?)",
+                         (session_id, "[]", json.dumps(memory, ensure_ascii=False), hash_key(api_key), now, now))
+        finally:
+            conn.close()
+        return session_id
+
+    def get(self, session_id, api_key=None):
+        """The session as {"messages", "memory", "turns"} or None (also for another key's session); no lease."""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT messages, memory, turns FROM chat_session WHERE id = ? AND key_hash = ?",
+                               (session_id, hash_key(api_key))).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        return {"messages": json.loads(row[0]), "memory": json.loads(row[1]), "turns": row[2]}
+
+    def begin_turn(self, session_id, owner, api_key=None):
+        """
+        Leases the session to `owner` and returns it. Raises SessionNotFound for an unknown session
+        (or one created with another API key) and SessionBusy while another turn holds the lease.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT messages, memory, turns, lease_until FROM chat_session WHERE id = ? AND key_hash = ?",
+                               (session_id, hash_key(api_key))).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                raise SessionNotFound(session_id)
+            if row[3] is not None and row[3] > now:
+                conn.execute("COMMIT")
+                raise SessionBusy(session_id)
+            conn.execute("UPDATE chat_session SET lease_owner = ?, lease_until = ? WHERE id = ?",
+                         (owner, now + self.lease_seconds, session_id))
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return {"messages": json.loads(row[0]), "memory": json.loads(row[1]), "turns": row[2]}
+
+    def end_turn(self, session_id, owner, session):
+        """Saves the session and releases the lease; a lease that expired and was taken over is left alone."""
+        conn = self._connect()
+        try:
+            conn.execute("UPDATE chat_session SET messages = ?, memory = ?, turns = turns + 1, lease_owner = NULL, "
+                         "lease_until = NULL, updated_at = ? WHERE id = ? AND lease_owner = ?",
+                         (json.dumps(session["messages"], ensure_ascii=False),
+                          json.dumps(session["memory"], ensure_ascii=False), time.time(), session_id, owner))
+        finally:
+            conn.close()
+
+    def purge_idle(self):
+        """Deletes sessions idle for longer than the TTL; returns how many."""
+        conn = self._connect()
+        try:
+            return conn.execute("DELETE FROM chat_session WHERE updated_at < ? AND (lease_until IS NULL OR lease_until < ?)",
+                                (time.time() - self.ttl, time.time())).rowcount
+        finally:
+            conn.close()
+
+    def get_stats(self):
+        conn = self._connect()
+        try:
+            sessions, leased = conn.execute("SELECT COUNT(*), COALESCE(SUM(lease_until > ?), 0) FROM chat_session",
+                                            (time.time(),)).fetchone()
+        finally:
+            conn.close()
+        return {"sessions": sessions, "active_turns": leased}
@@ -0,0 +1,104 @@
+import json
+
+# Lists at least this long are sent as {"columns": [...], "rows": [[...]]} instead of repeating keys
+TABULAR_MIN_ROWS = 3
+
+# Fields the system-instruction formats (instructions 2, 5, 6) actually use
+OPERATION_FIELDS = ("FlightNo", "DepartureScheduleTime", "DepartureActualTime", "ArrivalScheduleTime",
+                    "ArrivalActualTime", "DepartureDisplayTitle", "ArrivalDisplayTitle", "Status")
+
+
+def _pick(item, fields):
+    return {field: item.get(field) for field in fields if item.get(field) not in (None, "")}
+
+
+def _table(items, fields):
+    """Compact encoding for multi-row results; short lists keep the plain key/value form."""
+    if len(items) < TABULAR_MIN_ROWS:
+        return [_pick(item, fields) for item in items]
+    return {"columns": list(fields), "rows": [[item.get(field, "") for field in fields] for item in items]}
+
+
+def _code(value):
+    return str(value or "").strip().upper()
+
+
+def _on_route(item, args, departure_key, arrival_key):
+    departure, arrival = _code(item.get(departure_key)), _code(item.get(arrival_key))
+    return (not departure or departure == _code(args.get("departure"))) and (not arrival or arrival == _code(args.get("arrival")))
+
+
+def project_operation_info(result, args):
+    flights = result.get("FlightInfo")
+    if not isinstance(flights, list):
+        return result
+    flights = [flight for flight in flights if _on_route(flight, args, "Departure", "Arrival")]
+    return _pick({"date": args.get("date"), "route": f"{args.get('departure')}-{args.get('arrival')}",
+                  "as_of": result.get("FetchedAt"), "count": len(flights), "FlightInfo": _table(flights, OPERATION_FIELDS)},
+                 ("date", "route", "as_of", "count", "FlightInfo"))
+
+
+def project_operation_detail(result, args):
+    if "FlightNo" not in result:
+        return result
+    return _pick(result, OPERATION_FIELDS + ("FetchedAt",))
+
+
+def project_pnr_detail(result, args):
+    guests = result.get("guestDetails")
+    itineraries = result.get("itineraryDetails")
+    if not isinstance(guests, list) or not isinstance(itineraries, list):
+        return result
+    flights = []
+    for itinerary in itineraries:
+        for segment in itinerary.get("itinerarySegments", []):
+            flights.append(_pick({
+                "flight": segment.get("flightNumber") or segment.get("flightNo"),
+                "from": segment.get("departureAirport"),
+                "to": segment.get("arrivalAirport"),
+                "departure": segment.get("departureDateTime") or segment.get("departureDate"),
+                "arrival": segment.get("arrivalDateTime"),
+            }, ("flight", "from", "to", "departure", "arrival")))
+    # Instruction 4: Flight, Date, Passengers
+    return {"pnr": result.get("pnrNumber") or args.get("pnr"), "flights": flights,
+            "passengers": [f"{g.get('lastName', '')}/{g.get('firstName', '')}" for g in guests]}
+
+
+def project_operations_bulk(result, args):
+    flights = result.get("flights")
+    if not isinstance(flights, dict):
+        return result
+    fields = ("Departure", "Arrival") + OPERATION_FIELDS[1:]
+    projected = {"routes": result.get("routes", []), "flights": {key: _pick(flight, fields) for key, flight in flights.items()}}
+    if result.get("not_found"):
+        projected["not_found"] = result["not_found"]
+    return projected
+
+
+# The schedule tools need no projection: schedule_store already answers with a compact, route-filtered
+# summary (columns/rows table, no per-flight route codes)
+PROJECTIONS = {
+    "get_flight_operation_info": project_operation_info,
+    "get_flight_operation_detail": project_operation_detail,
+    "get_pnr_detail": project_pnr_detail,
+    "get_flight_operations_bulk": project_operations_bulk,
+}
+
+
+def project(tool_name, args, result):
+    """
+    Reduces a tool result to what the model needs before it goes back into the context.
+    Errors and payloads of an unexpected shape are passed through unchanged.
+    """
+    projection = PROJECTIONS.get(tool_name)
+    if projection is None or not isinstance(result, dict) or "error" in result:
+        return result
+    try:
+        return projection(result, args or {})
+    except (AttributeError, TypeError):
+        return result
+
+
+def serialize(result):
+    """Compact JSON of a tool result, close to what the model sees in the function response."""
+    return json.dumps(result, ensure_ascii=False, separators=(",", ":"), default=str)
@@ -0,0 +1,190 @@
+import asyncio
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import tool_projection
+import tracing
+
+# Deadlines in seconds
+TOOL_CALL_DEADLINE = 15.0
+TURN_DEADLINE = 40.0
+MAX_TOOL_ROUNDS = 5
+MAX_WORKERS = 16
+# Sent with the request after the last allowed tool round so the model answers with what it has
+NO_FUNCTION_CALLS = {"function_calling_config": {"mode": "NONE"}}
+
+# Tool functions run on a shared pool so they keep using the pooled HTTP sessions,
+# flight cache and circuit breakers from http_client / flight_cache.
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="tool")
+
+
+class TurnDeadlineExceeded(Exception):
+    """Raised when a chat turn runs past its overall deadline."""
+
+
+async def _run_call(loop, tools, name, args, timeout):
+    func = tools.get(name)
+    if func is None:
+        return {"error": f"알 수 없는 함수입니다: {name}"}
+    if timeout <= 0:
+        return {"error": f"{name} 호출 시간이 초과되었습니다."}
+    try:
+        # Copy the caller's context so per-turn counters (usage_log.current_turn) reach the worker thread
+        context = contextvars.copy_context()
+        return await asyncio.wait_for(loop.run_in_executor(_executor, lambda: context.run(_call, name, func, args)),
+                                      timeout)
+    except asyncio.TimeoutError:
+        return {"error": f"{name} 호출 시간이 초과되었습니다."}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def _call(name, func, args):
+    with tracing.span("tool." + name) as span:
+        result = func(**args)
+        if span.recording and isinstance(result, dict) and "error" in result:
+            span.set(error=str(result["error"])[:200])
+        return result
+
+
+async def run_tool_calls_async(calls, tools, deadline=None, call_deadline=TOOL_CALL_DEADLINE):
+    """
+    Runs [(name, args), ...] concurrently and returns results in the same order.
+    Each call gets min(call_deadline, time left until `deadline`); a late call yields an error result.
+    """
+    loop = asyncio.get_running_loop()
+    remaining = call_deadline if deadline is None else deadline - time.monotonic()
+    timeout = min(call_deadline, remaining)
+    return await asyncio.gather(*(_run_call(loop, tools, name, args, timeout) for name, args in calls))
+
+
+def run_tool_calls(calls, tools, deadline=None, call_deadline=TOOL_CALL_DEADLINE):
+    """Synchronous entry point for the Streamlit script thread (which has no running event loop)."""
+    return asyncio.run(run_tool_calls_async(calls, tools, deadline, call_deadline))
+
+
+def get_function_calls(response):
+    """Extracts [(name, args)] from a GenerateContentResponse, preserving the model's order."""
+    calls = []
+    for candidate in response.candidates[:1]:
+        for part in candidate.content.parts:
+            if part.function_call and part.function_call.name:
+                calls.append((part.function_call.name, dict(part.function_call.args)))
+    return calls
+
+
+def send_message_with_tools(chat, content, tools, turn_deadline=TURN_DEADLINE):
+    """
+    Sends a message with manual function calling: every round's function calls run concurrently,
+    their responses go back to the model in one message, until the model answers with text.
+    The response to the MAX_TOOL_ROUNDS-th round is requested with function calling disabled.
+    Returns (final_response, usage) where usage sums token counts over all model round-trips.
+    """
+    tool_map = {func.__name__: func for func in tools}
+    start = time.monotonic()
+    deadline = start + turn_deadline
+    usage = _new_usage()
+
+    response = _send(chat, content, 0)
+    _add_usage(usage, response)
+    for round_index in range(1, MAX_TOOL_ROUNDS + 1):
+        calls = get_function_calls(response)
+        if not calls:
+            break
+        response = _send(chat, _run_round(calls, tool_map, deadline, usage), round_index,
+                         final=round_index == MAX_TOOL_ROUNDS)
+        _add_usage(usage, response)
+
+    # Nothing is shown before the whole answer is ready, so first byte == total
+    usage["ttfb_ms"] = usage["total_ms"] = (time.monotonic() - start) * 1000
+    return response, usage
+
+
+def stream_message_with_tools(chat, content, tools, usage, turn_deadline=TURN_DEADLINE):
+    """
+    Streaming variant of send_message_with_tools: yields text chunks as they arrive.
+    Function calls found in a finished stream round run concurrently and their responses
+    start the next streamed round; the round after the MAX_TOOL_ROUNDS-th tool round is streamed
+    with function calling disabled. Token counts and ttfb/total latency are written into `usage`
+    once the generator is exhausted.
+    """
+    tool_map = {func.__name__: func for func in tools}
+    start = time.monotonic()
+    deadline = start + turn_deadline
+    usage.update(_new_usage())
+
+    for round_index in range(MAX_TOOL_ROUNDS + 1):
+        # Not entered as the current span: the generator shares its context with the consumer
+        span = tracing.span("model_round", round=round_index, stream=True)
+        render_s = 0.0
+        final = round_index == MAX_TOOL_ROUNDS
+        if final:
+            response = chat.send_message(content, stream=True, tool_config=NO_FUNCTION_CALLS)
+        else:
+            response = chat.send_message(content, stream=True)
+        for chunk in response:
+            for candidate in chunk.candidates[:1]:
+                for part in candidate.content.parts:
+                    if part.text:
+                        if usage["ttfb_ms"] is None:
+                            usage["ttfb_ms"] = (time.monotonic() - start) * 1000
+                        yielded = time.perf_counter()
+                        yield part.text
+                        # Time the consumer (UI rendering) spent before asking for the next chunk
+                        render_s += time.perf_counter() - yielded
+
+        # Usage metadata and the merged parts are only complete after the stream ends
+        _add_usage(usage, response)
+        if span.recording:
+            span.set(render_ms=round(render_s * 1000, 3), **_round_tokens(response))
+        span.end()
+        calls = get_function_calls(response)
+        if not calls or final:
+            break
+        content = _run_round(calls, tool_map, deadline, usage)
+
+    usage["total_ms"] = (time.monotonic() - start) * 1000
+
+
+def _run_round(calls, tool_map, deadline, usage):
+    """Runs one round of function calls and builds the function_response parts for the model."""
+    import google.generativeai as genai
+
+    if time.monotonic() >= deadline:
+        raise TurnDeadlineExceeded("응답 시간이 초과되었습니다.")
+    with tracing.span("tool_round", calls=len(calls)):
+        results = run_tool_calls(calls, tool_map, deadline=deadline)
+        usage["tool_calls"] += len(calls)
+        # Only the fields the answer formats use go back into the context
+        return [
+            genai.protos.Part(function_response=genai.protos.FunctionResponse(
+                name=name, response={"result": tool_projection.project(name, args, result)}))
+            for (name, args), result in zip(calls, results)
+        ]
+
+
+def _send(chat, content, round_index, final=False):
+    with tracing.span("model_round", round=round_index, stream=False) as span:
+        response = chat.send_message(content, tool_config=NO_FUNCTION_CALLS) if final else chat.send_message(content)
+        if span.recording:
+            span.set(**_round_tokens(response))
+        return response
+
+
+def _round_tokens(response):
+    metadata = getattr(response, "usage_metadata", None)
+    if not metadata:
+        return {}
+    return {"prompt_tokens": metadata.prompt_token_count or 0, "candidate_tokens": metadata.candidates_token_count or 0}
+
+
+def _new_usage():
+    return {"prompt_tokens": 0, "candidate_tokens": 0, "tool_calls": 0, "ttfb_ms": None, "total_ms": None}
+
+
+def _add_usage(usage, response):
+    metadata = getattr(response, "usage_metadata", None)
+    if metadata:
+        usage["prompt_tokens"] += metadata.prompt_token_count or 0
+        usage["candidate_tokens"] += metadata.candidates_token_count or 0
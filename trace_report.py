@@ -0,0 +1,53 @@
+"""
+Aggregates sampled chat-turn traces: the slowest turns with their per-stage breakdown, and
+p50/p95/total latency per stage and per span, with each top-level stage's share of turn time.
+
+    python trace_report.py                    # traces.jsonl
+    python trace_report.py --last 500 --top 5
+    python trace_report.py --json
+"""
+import tracing
+import argparse
+import json
+
+
+def format_report(summary):
+    lines = [f"Turns traced: {summary['turns']}"]
+    if not summary["turns"]:
+        return "\n".join(lines)
+    turn = summary["turn_ms"]
+    lines.append(f"Turn latency: p50 {turn['p50_ms']:.1f} ms, p95 {turn['p95_ms']:.1f} ms")
+
+    lines.append("\nShare of turn time (top-level stages):")
+    for name, share in summary["top_level_share"].items():
+        lines.append(f"  {name:<32} {share * 100:5.1f}%")
+
+    lines.append("\nPer span:")
+    lines.append(f"  {'span':<32} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'total ms':>11}")
+    for name, row in sorted(summary["spans"].items(), key=lambda kv: -kv[1]["total_ms"]):
+        lines.append(f"  {name:<32} {row['count']:>6} {row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['total_ms']:>11.1f}")
+
+    lines.append("\nSlowest turns:")
+    for trace in summary["slowest"]:
+        breakdown = ", ".join(f"{name} {ms:.0f}" for name, ms in sorted(trace["breakdown"].items(), key=lambda kv: -kv[1]))
+        lines.append(f"  {trace['trace_id']} {trace['duration_ms']:>9.1f} ms  [{trace['attrs'].get('source', '?')}]  {breakdown}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", default=tracing.TRACE_FILE)
+    parser.add_argument("--last", type=int, help="only the most recent N traces")
+    parser.add_argument("--top", type=int, default=10, help="slowest turns to list")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args()
+
+    summary = tracing.summarize(tracing.load_traces(args.file, args.last), args.top)
+    if args.json:
+        print(json.dumps(summary, indent=4, ensure_ascii=False))
+    else:
+        print(format_report(summary))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+import contextvars
+import itertools
+import json
+import os
+import random
+import statistics
+import threading
+import time
+import uuid
+from collections import deque
+
+SAMPLE_RATE = 0.1          # share of turns traced; sampled-out turns only pay one random() call
+TRACE_FILE = 'traces.jsonl'
+RING_SIZE = 200            # most recent traces kept in memory for the admin view
+TRACE_MAX_BYTES = 20 * 1024 * 1024   # TRACE_FILE is rotated to TRACE_FILE.1 past this size
+TRACE_BACKUPS = 3                    # rotated files kept (TRACE_FILE.1 .. TRACE_FILE.3)
+
+_current = contextvars.ContextVar("trace_span", default=None)
+_span_ids = itertools.count(1)
+
+
+class _NoopSpan:
+    """Returned when the turn is not sampled: every operation is a no-op."""
+    recording = False
+
+    def set(self, **attrs):
+        pass
+
+    def end(self, error=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NOOP = _NoopSpan()
+
+
+class Span:
+    __slots__ = ("trace", "id", "parent_id", "name", "attrs", "start", "finish", "token")
+    recording = True
+
+    def __init__(self, trace, parent_id, name, attrs):
+        self.trace = trace
+        self.id = next(_span_ids)
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.finish = None
+        self.token = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end(exc_type.__name__ if exc_type else None)
+        return False
+
+    def end(self, error=None):
+        if self.finish is not None:
+            return
+        self.finish = time.perf_counter()
+        if error:
+            self.attrs["error"] = error
+        if self.token is not None:
+            try:
+                _current.reset(self.token)
+            except ValueError:
+                pass    # ended from another context (e.g. a generator finished elsewhere)
+        if self.parent_id is None:
+            self.trace.emit()
+
+    def to_dict(self, t0):
+        return {"id": self.id, "parent": self.parent_id, "name": self.name,
+                "start_ms": round((self.start - t0) * 1000, 3),
+                "duration_ms": round(((self.finish or time.perf_counter()) - self.start) * 1000, 3),
+                "attrs": self.attrs}
+
+
+class Trace:
+    def __init__(self):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.started_at = time.time()
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def add(self, span):
+        with self.lock:
+            self.spans.append(span)
+        return span
+
+    def to_dict(self):
+        with self.lock:
+            spans = list(self.spans)
+        root = spans[0]
+        return {"trace_id": self.trace_id, "span_id": root.id, "name": root.name, "started_at": self.started_at,
+                "duration_ms": round(((root.finish or time.perf_counter()) - root.start) * 1000, 3),
+                "attrs": root.attrs, "spans": [span.to_dict(root.start) for span in spans[1:]]}
+
+    def emit(self):
+        record = self.to_dict()
+        for sink in _sinks:
+            try:
+                sink.write(record)
+            except Exception as e:
+                print(f"Error writing trace: {e}")
+
+
+class RingBufferSink:
+    def __init__(self, size=RING_SIZE):
+        self.traces = deque(maxlen=size)
+
+    def write(self, record):
+        self.traces.append(record)
+
+
+class JsonlSink:
+    """
+    Appends traces to one file handle per process (reopened after a fork or when another process
+    rotated the file) and rotates the file by size, keeping `backups` older files.
+    """
+
+    def __init__(self, path=TRACE_FILE, max_bytes=TRACE_MAX_BYTES, backups=TRACE_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.file = None
+        self.pid = None
+        self.lock = threading.Lock()
+
+    def _open(self):
+        if self.file is not None and self.pid == os.getpid():
+            try:
+                if os.stat(self.path).st_ino == os.fstat(self.file.fileno()).st_ino:
+                    return
+            except FileNotFoundError:
+                pass
+            self.file.close()   # rotated (or removed) by another process
+        self.file = open(self.path, "a", encoding="utf-8")
+        self.pid = os.getpid()
+
+    def _rotate(self):
+        self.file.close()
+        self.file = None
+        for index in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{index}"):
+                os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str)
+        with self.lock:
+            self._open()
+            self.file.write(line + "\n")
+            self.file.flush()
+            if self.file.tell() >= self.max_bytes:
+                self._rotate()
+
+    def close(self):
+        with self.lock:
+            if self.file is not None and self.pid == os.getpid():
+                self.file.close()
+            self.file = None
+
+
+ring_buffer = RingBufferSink()
+_sinks = [ring_buffer, JsonlSink()]
+sample_rate = SAMPLE_RATE
+
+
+def configure(rate=None, path=None, ring_size=None):
+    """Changes the sampling rate and sinks. path=False keeps traces in memory only."""
+    global sample_rate, ring_buffer, _sinks
+    if rate is not None:
+        sample_rate = rate
+    if ring_size is not None:
+        ring_buffer = RingBufferSink(ring_size)
+    sinks = [ring_buffer]
+    file_sink = next((sink for sink in _sinks if isinstance(sink, JsonlSink)), None)
+    if path is not False:
+        sinks.append(JsonlSink(path) if path else (file_sink or JsonlSink()))
+    if file_sink is not None and file_sink not in sinks:
+        file_sink.close()
+    _sinks = sinks
+
+
+def start_trace(name, **attrs):
+    """
+    Starts a sampled trace whose root span becomes current; returns NOOP when sampled out.
+    Use as a context manager, or call .end() (the trace is written when the root span ends).
+    """
+    if sample_rate <= 0 or (sample_rate < 1 and random.random() >= sample_rate):
+        return NOOP
+    trace = Trace()
+    root = trace.add(Span(trace, None, name, attrs))
+    root.token = _current.set(root)
+    return root
+
+
+def span(name, **attrs):
+    """Child span of the current span (context manager); NOOP outside a sampled trace."""
+    parent = _current.get()
+    if parent is None:
+        return NOOP
+    return parent.trace.add(Span(parent.trace, parent.id, name, attrs))
+
+
+def current():
+    return _current.get() or NOOP
+
+
+# --- Aggregation (admin view / trace_report.py) ---
+
+def load_traces(path=TRACE_FILE, limit=None):
+    traces = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                traces.append(json.loads(line))
+    return traces[-limit:] if limit else traces
+
+
+def stage_of(span_name):
+    """Groups spans into stages: 'tool.get_pnr_detail' -> 'tool', 'http.pnr_detail' -> 'http'."""
+    return span_name.split(".", 1)[0]
+
+
+def summarize(traces, top=10):
+    """
+    Slowest turns with their top-level breakdown, plus per-stage and per-span latency
+    (count, p50, p95, total) and each top-level stage's share of turn time.
+    """
+    by_name, by_stage, turn_total = {}, {}, 0.0
+    top_level = {}
+    for trace in traces:
+        turn_total += trace["duration_ms"]
+        for s in trace["spans"]:
+            by_name.setdefault(s["name"], []).append(s["duration_ms"])
+            by_stage.setdefault(stage_of(s["name"]), []).append(s["duration_ms"])
+            if s["parent"] == trace["span_id"]:
+                top_level[s["name"]] = top_level.get(s["name"], 0.0) + s["duration_ms"]
+
+    def describe(values):
+        cuts = statistics.quantiles(values, n=20) if len(values) > 1 else values * 19
+        return {"count": len(values), "p50_ms": round(statistics.median(values), 2), "p95_ms": round(cuts[18], 2),
+                "total_ms": round(sum(values), 2)}
+
+    slowest = []
+    for trace in sorted(traces, key=lambda t: t["duration_ms"], reverse=True)[:top]:
+        breakdown = {}
+        for s in trace["spans"]:
+            if s["parent"] == trace["span_id"]:
+                breakdown[s["name"]] = round(breakdown.get(s["name"], 0.0) + s["duration_ms"], 2)
+        slowest.append({"trace_id": trace["trace_id"], "duration_ms": trace["duration_ms"],
+                        "attrs": trace["attrs"], "breakdown": breakdown})
+    return {
+        "turns": len(traces),
+        "turn_ms": describe([t["duration_ms"] for t in traces]) if traces else None,
+        "top_level_share": {name: round(total / turn_total, 3) for name, total in
+                            sorted(top_level.items(), key=lambda kv: -kv[1])} if turn_total else {},
+        "stages": {name: describe(values) for name, values in sorted(by_stage.items())},
+        "spans": {name: describe(values) for name, values in sorted(by_name.items())},
+        "slowest": slowest,
+    }
+
@@ -0,0 +1,254 @@
+import atexit
+import contextvars
+import csv
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import rollups
+
+FLUSH_INTERVAL = 1.0     # an entry is written at most this many seconds after it was logged
+BATCH_SIZE = 200         # flush early once this many entries are buffered
+BUSY_TIMEOUT_MS = 5000   # wait this long for another process' write lock
+_FLUSH = object()        # queued by flush(): write the buffered entries now
+
+COLUMNS = ['timestamp', 'model', 'prompt_tokens', 'candidate_tokens',
+           'latency_ms', 'ttfb_ms', 'tool_calls', 'cache_hits']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage (
+    timestamp TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    candidate_tokens INTEGER NOT NULL DEFAULT 0,
+    latency_ms REAL,
+    ttfb_ms REAL,
+    tool_calls INTEGER NOT NULL DEFAULT 0,
+    cache_hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS usage_timestamp ON usage (timestamp);
+"""
+
+# Per-turn counters shared with tool threads (tool_runner copies the context into each call)
+current_turn = contextvars.ContextVar("current_turn", default=None)
+
+
+def start_turn():
+    """Starts per-turn counters for the calling context and returns them."""
+    turn = {"cache_hits": 0}
+    current_turn.set(turn)
+    return turn
+
+
+def count_cache_hit(n=1):
+    turn = current_turn.get()
+    if turn is not None:
+        turn["cache_hits"] += n
+
+
+def connect(path):
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000)
+    # WAL lets readers (dashboards) run while another process appends
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    conn.executescript(SCHEMA)
+    conn.executescript(rollups.SCHEMA)
+    return conn
+
+
+def ensure_rollups(conn):
+    """Backfills rollups once when raw rows exist without them (e.g. right after the CSV import)."""
+    if conn.execute("SELECT 1 FROM usage_rollup LIMIT 1").fetchone() or \
+            not conn.execute("SELECT 1 FROM usage LIMIT 1").fetchone():
+        return
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        if not conn.execute("SELECT 1 FROM usage_rollup LIMIT 1").fetchone():
+            rollups.rebuild(conn)
+
+
+def _read_csv_rows(csv_path):
+    """Rows of the legacy CSV; malformed lines are skipped with a warning instead of failing the import."""
+    rows, skipped = [], []
+    with open(csv_path, newline='', encoding='utf-8', errors='replace') as f:
+        reader = csv.DictReader(f)
+        try:
+            for r in reader:
+                try:
+                    if not r.get('timestamp') or not r.get('model'):
+                        raise ValueError("missing timestamp or model")
+                    rows.append((r['timestamp'], r['model'], int(r.get('prompt_tokens') or 0),
+                                 int(r.get('candidate_tokens') or 0)))
+                except (TypeError, ValueError):
+                    skipped.append(reader.line_num)
+        except csv.Error as e:
+            print(f"Stopped reading {csv_path} at line {reader.line_num}: {e}")
+    if skipped:
+        print(f"Skipped {len(skipped)} malformed row(s) in {csv_path} (lines {', '.join(map(str, skipped[:10]))})")
+    return rows
+
+
+def import_csv(conn, csv_path):
+    """One-time import of the legacy usage_log.csv into an empty store."""
+    if not os.path.exists(csv_path) or conn.execute("SELECT 1 FROM usage LIMIT 1").fetchone():
+        return 0
+    rows = _read_csv_rows(csv_path)
+    with conn:
+        # Re-check under the write lock: processes starting together must not both import the file
+        conn.execute("BEGIN IMMEDIATE")
+        if conn.execute("SELECT 1 FROM usage LIMIT 1").fetchone():
+            return 0
+        conn.executemany("INSERT INTO usage (timestamp, model, prompt_tokens, candidate_tokens) VALUES (?, ?, ?, ?)", rows)
+    return len(rows)
+
+
+class UsageLogger:
+    """
+    Buffers usage entries in memory and appends them to SQLite from a background thread.
+    Each batch is one transaction (raw rows + minute/hour/day rollups), so concurrent
+    Streamlit sessions and other processes never interleave partial rows.
+    """
+
+    def __init__(self, path, legacy_csv=None):
+        self.path = path
+        self.legacy_csv = legacy_csv
+        self.queue = queue.Queue()
+        self.flushed = threading.Condition()
+        self.pending = 0
+        self.thread = None
+        self.lock = threading.Lock()
+        self.stats = {"logged": 0, "written": 0, "batches": 0, "errors": 0}
+
+    def _ensure_writer(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name="usage-log-writer", daemon=True)
+                self.thread.start()
+
+    def log(self, entry):
+        """Queues an entry (dict with COLUMNS keys); never blocks on disk I/O."""
+        self._ensure_writer()
+        with self.flushed:
+            self.pending += 1
+            self.stats["logged"] += 1
+        self.queue.put(entry)
+
+    def flush(self, timeout=5.0):
+        """Blocks until every queued entry has been written (the writer does not wait out FLUSH_INTERVAL)."""
+        if self.thread is None:
+            return
+        with self.flushed:
+            if self.pending == 0:
+                return
+            self.queue.put(_FLUSH)
+            self.flushed.wait_for(lambda: self.pending == 0, timeout)
+
+    def _open(self):
+        conn = connect(self.path)
+        if self.legacy_csv:
+            try:
+                import_csv(conn, self.legacy_csv)
+            except (OSError, sqlite3.Error) as e:
+                print(f"Error importing {self.legacy_csv}: {e}")
+        ensure_rollups(conn)
+        return conn
+
+    def _run(self):
+        # Nothing may end this loop: a dead writer would be restarted by every log() and make
+        # every flush() wait out its timeout. A failed batch is counted and dropped.
+        conn = None
+        while True:
+            batch = []
+            item = self.queue.get()
+            # Collect whatever else arrives within FLUSH_INTERVAL of the first entry (not of the last one:
+            # steady traffic would otherwise hold the batch until BATCH_SIZE)
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            while item is not _FLUSH:
+                batch.append(item)
+                if len(batch) >= BATCH_SIZE:
+                    break
+                try:
+                    item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if not batch:
+                continue
+            try:
+                conn = conn or self._open()
+                self._write(conn, batch)
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"Error writing usage logs: {e}")
+            finally:
+                with self.flushed:
+                    self.pending -= len(batch)
+                    self.flushed.notify_all()
+
+    def _write(self, conn, batch):
+        rows = [tuple(entry.get(column) for column in COLUMNS) for entry in batch]
+        with conn:
+            # Take the write lock up front: raw rows and rollups of a batch commit together
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(f"INSERT INTO usage ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})", rows)
+            rollups.apply(conn, rows)
+        self.stats["written"] += len(rows)
+        self.stats["batches"] += 1
+
+
+def query(path, start=None, end=None, columns=COLUMNS):
+    """
+    Returns (columns, rows) for entries with start <= timestamp < end.
+    The range is applied in SQL against the timestamp index, so old rows are never read.
+    """
+    if not os.path.exists(path):
+        return list(columns), []
+    sql = f"SELECT {', '.join(columns)} FROM usage"
+    clauses, params = [], []
+    if start is not None:
+        clauses.append("timestamp >= ?")
+        params.append(_to_text(start))
+    if end is not None:
+        clauses.append("timestamp < ?")
+        params.append(_to_text(end))
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY timestamp"
+    conn = connect(path)
+    try:
+        return list(columns), conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+def _to_text(value):
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    return str(value)
+
+
+_loggers = {}
+_loggers_lock = threading.Lock()
+
+
+def get_logger(path, legacy_csv=None):
+    """Returns the process-wide logger for the given database path."""
+    with _loggers_lock:
+        logger = _loggers.get(path)
+        if logger is None:
+            logger = _loggers[path] = UsageLogger(path, legacy_csv)
+            atexit.register(logger.flush)
+        return logger
+
+
+def query_rollups(path, granularity="hour", start=None, end=None, model=None):
+    """Pre-aggregated token sums, request counts and latency percentiles per bucket."""
+    if not os.path.exists(path):
+        return []
+    conn = connect(path)
+    try:
+        return rollups.query(conn, granularity, start, end, model)
+    finally:
+        conn.close()
@@ -1,69 +1,328 @@
-import pandas as pd
+import hashlib
 import os
-from datetime import datetime
-from io import BytesIO
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 
-import requests
+import answer_cache
+import chat_history
+import email_queue
+import faq_index
+import faq_store
+import flight_cache
+import flight_prefetch
+import health
+import http_client
+import pnr_cache
+import rate_limiter
+import schedule_store
+import session_store
+import usage_log
 
 FAQ_FILE = 'faq.csv'
-USAGE_LOG_FILE = 'usage_log.csv'
+FAQ_STORE_FILE = 'faq_store.db'  # compiled, versioned copy of FAQ_FILE
+USAGE_LOG_FILE = 'usage_log.csv'  # legacy log, imported into USAGE_DB_FILE once
+USAGE_DB_FILE = 'usage_log.db'
+RATE_LIMIT_DB_FILE = 'rate_limit.db'  # token buckets shared by every app process
+EMAIL_QUEUE_DB_FILE = 'email_queue.db'  # operation-confirmation email jobs
+SESSION_DB_FILE = 'chat_sessions.db'  # chat sessions served by chat_server.py workers
+HISTORY_DB_FILE = 'chat_history.db'  # older chat messages of the Streamlit sessions
 BOT_RULES_FILE = 'bot_rules.txt'
 FLIGHT_API_BASE_URL = "http://extapi.jinair.com"
 OPERATION_CONFIRMATION_API_URL = "https://ccsstg.jinair.com/event/sendOperationConfirmation"
 FLIGHT_OPERATION_INFO_API_URL = "https://ccs.jinair.com/event/getFlightOpererationInfo"
 
-def load_faq_data():
-    """Loeads FAQ data from CSV into a Pandas DataFrame."""
-    if not os.path.exists(FAQ_FILE):
-        return pd.DataFrame(columns=['category', 'question', 'answer'])
+# "retrieval": inject only the top-k relevant FAQ pairs per turn, "full": dump the whole FAQ
+FAQ_CONTEXT_MODE = "retrieval"
+FAQ_TOP_K = 5
+
+# Bulk operation lookups: at most this many queries per call, fetched this many routes at a time
+BULK_MAX_QUERIES = 20
+BULK_MAX_PARALLEL = 4
+
+# Keep today's/tomorrow's hot routes (flight_prefetch.HOT_ROUTES) warm in the background
+PREFETCH_ENABLED = True
+
+# Probe the upstreams in the background; while one is down its tools answer from stale cache or fail fast
+HEALTH_PROBE_ENABLED = True
+
+# Render assistant answers chunk by chunk instead of waiting for the full response
+STREAM_RESPONSES = True
+
+# Base URL of chat_server.py (e.g. http://127.0.0.1:8600): the Streamlit app only renders, the
+# turns run in the server's workers. Empty runs the chat pipeline inside the Streamlit process.
+CHAT_API_URL = os.environ.get("CHAT_API_URL", "")
+
+SYSTEM_INSTRUCTION_TEMPLATE = """Role: JinAir Agent. Lang: Korean.
+    Instruction: 기본적으로 한국어로 답변하세요. 단, 사용자가 다른 언어로 질문하면 그 언어에 맞춰 답변하세요.
+Rules: {rules}
+FAQ:
+{faq}
+
+    Instr:
+    1. Source: FAQ only. Else "죄송합니다. 제공된 정보에는 해당 내용이 없습니다." (translated).
+    2. Flight Query: Use `get_flight_schedule` (several days, e.g. "next 7 days": `get_flight_schedule_range`). count/fastest/earliest/latest are precomputed; use them as given. Format: "N flights. Fastest: [F] [T]. List: ..." (translated)
+    3. Operation Confirmation: Ask for Date (YYYYMMDD), Flight Num, and Email. Use `send_operation_confirmation`. It queues the email and returns a job id (접수번호); give it to the user. For "was it sent?" use `get_operation_confirmation_status` with the job id; status is only given by job id, never looked up by email.
+    4. PNR Lookup: Ask for 6-char PNR, First Name, Last Name, and Departure Date (YYYYMMDD). Use `get_pnr_detail`. Summarize: Flight, Date, Passengers.
+    5. Flight Operation Info (Route): Ask for Date (YYYYMMDD), Departure (Code), Arrival (Code). Use `get_flight_operation_info`. Report: Flight No, Times (Schedule/Actual), Status.
+    6. Flight Operation Detail (Flight No): Ask for Date (YYYYMMDD), Flight No (e.g., LJ201), Departure (Code), Arrival (Code). Use `get_flight_operation_detail`. 
+       - Response Format: "[FlightNo]편은 [DepartureScheduleTime]에 출발하여([DepartureDisplayTitle]), [ArrivalActualTime]에 도착했습니다([ArrivalDisplayTitle]). 현재 상태는 [Status]입니다."
+       - Translate titles/status to Korean naturally.
+    7. Be concise. Link URLs.
+    8. Date Conversion: If the user provides relative dates like "오늘", "내일", "어제", "모레" or days of the week, automatically calculate the target date based on the "Current Time" given with the user's message and convert it to YYYYMMDD format before calling any tools.
+    9. Multiple Dates/Routes (round trip, "this week"): Use `get_flight_operations_bulk` once with every (date, route[, flight no]) query instead of repeated single lookups. Report per flight as in 5/6.
+"""
+
+# Shown in the system instruction when FAQ entries are passed per turn instead
+RETRIEVED_FAQ_NOTE = "각 질문과 함께 전달되는 [관련 FAQ] 항목을 참고하세요."
+
+_faq_store = None
+_faq_index = None
+_faq_index_version = None
+_system_prefix = None
+_answer_cache = None
+_flight_prefetcher = None
+_rate_limiter = None
+_email_queue = None
+_session_store = None
+_health_prober = None
+_history_store = None
+_schedule_store = None
+_turn_tokens_estimate = None   # (computed_at, tokens)
+_answer_cache_signature = None
+_answer_cache_content = None
+prompt_metrics = {"prefix_builds": 0, "prefix_hits": 0, "model_builds": 0, "last_prefix_build_ms": 0.0, "last_setup_ms": 0.0}
+
+def get_faq_store():
+    """Process-wide compiled FAQ store (re-compiled only when faq.csv content changes)."""
+    global _faq_store
+    if _faq_store is None:
+        _faq_store = faq_store.FaqStore(FAQ_STORE_FILE, FAQ_FILE)
+    return _faq_store
+
+def get_faq_snapshot():
+    """Current FAQ version: rows plus prompt text (full, per category, per language)."""
     try:
-        return pd.read_csv(FAQ_FILE)
+        return get_faq_store().snapshot()
+    except Exception as e:
+        # e.g. the store database is not writable: parse faq.csv directly
+        print(f"Error loading FAQ store: {e}")
+    try:
+        with open(FAQ_FILE, 'rb') as f:
+            data = f.read()
+        return faq_store.FaqSnapshot(faq_store.content_version(data), faq_store.parse_csv(data))
     except Exception as e:
         print(f"Error loading FAQ data: {e}")
-        return pd.DataFrame(columns=['category', 'question', 'answer'])
+        return faq_store.FaqSnapshot("empty", [])
+
+def load_faq_data():
+    """Loeads FAQ data into a Pandas DataFrame (admin page; the chat path uses load_faq_rows)."""
+    import pandas as pd
+
+    rows = [{column: row[column] for column in faq_store.COLUMNS} for row in get_faq_snapshot().rows]
+    return pd.DataFrame.from_records(rows, columns=faq_store.COLUMNS)
 
 def save_faq_data(df):
-    """Saves the DataFrame to CSV."""
-    df.to_csv(FAQ_FILE, index=False)
-
-def get_faq_as_text():
-    """Formats the FAQ data into a string for the LLM system instruction."""
-    df = load_faq_data()
-    if df.empty:
-        return "FAQ 데이터가 없습니다."
-    
-    faq_text = ""
-    for index, row in df.iterrows():
-        faq_text += f"Q: {row['question']}\nA: {row['answer']}\n"
-    return faq_text
-
-def log_usage(model_name, prompt_tokens, candidate_tokens):
-    """Logs API usage to a CSV file."""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    new_entry = pd.DataFrame([{
-        'timestamp': timestamp,
+    """Saves the DataFrame to CSV (atomically) and compiles the new FAQ version."""
+    snapshot = get_faq_store().save(_faq_rows(df))
+    # Keep the retrieval index in sync; only changed rows get re-tokenized
+    _sync_faq_index(snapshot)
+
+def _faq_rows(df):
+    return df.fillna("").to_dict("records")
+
+def load_faq_rows():
+    """FAQ rows as {'category', 'question', 'answer', 'lang'} dicts (no pandas)."""
+    return get_faq_snapshot().rows
+
+def get_faq_as_text(category=None, lang=None):
+    """Formats the FAQ data (optionally one category/language) into a string for the LLM system instruction."""
+    text = get_faq_snapshot().slice(category, lang)
+    return text or "FAQ 데이터가 없습니다."
+
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+def get_faq_index():
+    """Returns the process-wide FAQ retrieval index, building it on first use."""
+    _sync_faq_index(get_faq_snapshot())
+    return _faq_index
+
+def _sync_faq_index(snapshot):
+    global _faq_index, _faq_index_version
+    if _faq_index is None:
+        _faq_index = faq_index.build_index(snapshot.rows)
+    elif snapshot.version != _faq_index_version:
+        # A new FAQ version (saved here or by another process); sync incrementally
+        _faq_index.update(snapshot.rows)
+    _faq_index_version = snapshot.version
+
+def get_relevant_faq_text(query, k=FAQ_TOP_K):
+    """Formats only the top-k FAQ pairs relevant to the query for the system instruction."""
+    hits = get_faq_index().search(query, k=k)
+    if not hits:
+        return "관련 FAQ가 없습니다."
+    return "".join(f"Q: {row['question']}\nA: {row['answer']}\n" for row in hits)
+
+def build_system_instruction(faq_content, rules_content):
+    """Fills the system instruction template with FAQ and bot rules."""
+    return SYSTEM_INSTRUCTION_TEMPLATE.format(
+        rules=rules_content,
+        faq=faq_content
+    )
+
+def get_system_prefix():
+    """
+    Returns (version, system_instruction) for the static part of the prompt.
+    Rebuilt only when bot_rules.txt (or faq.csv in "full" mode) changes on disk;
+    the version is a content hash, so identical content keeps the same version.
+    """
+    global _system_prefix
+    signature = (
+        FAQ_CONTEXT_MODE,
+        _file_signature(BOT_RULES_FILE),
+        get_faq_snapshot().version if FAQ_CONTEXT_MODE == "full" else None
+    )
+    if _system_prefix is not None and _system_prefix[0] == signature:
+        prompt_metrics["prefix_hits"] += 1
+        return _system_prefix[1], _system_prefix[2]
+
+    start = time.perf_counter()
+    faq_content = get_faq_as_text() if FAQ_CONTEXT_MODE == "full" else RETRIEVED_FAQ_NOTE
+    instruction = build_system_instruction(faq_content, load_bot_rules())
+    version = hashlib.sha256(instruction.encode("utf-8")).hexdigest()[:12]
+    _system_prefix = (signature, version, instruction)
+    prompt_metrics["prefix_builds"] += 1
+    prompt_metrics["last_prefix_build_ms"] = (time.perf_counter() - start) * 1000
+    return version, instruction
+
+def get_answer_cache():
+    """
+    Returns the process-wide FAQ answer cache. It is cleared whenever the FAQ or bot rules
+    content changes (save_faq_data / save_bot_rules, or an edit from another process).
+    """
+    global _answer_cache, _answer_cache_signature, _answer_cache_content
+    if _answer_cache is None:
+        _answer_cache = answer_cache.AnswerCache(faq_lookup=lambda question: get_faq_index().search(question, k=3))
+    signature = (_file_signature(FAQ_FILE), _file_signature(BOT_RULES_FILE))
+    if signature != _answer_cache_signature:
+        digest = hashlib.sha256()
+        for path in (FAQ_FILE, BOT_RULES_FILE):
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    digest.update(f.read())
+        content = digest.hexdigest()
+        if _answer_cache_content is not None and content != _answer_cache_content:
+            _answer_cache.clear()
+        _answer_cache_signature, _answer_cache_content = signature, content
+    return _answer_cache
+
+def lookup_cached_answer(question):
+    """Returns a cached answer for a standalone FAQ question, or None if the model has to answer."""
+    return get_answer_cache().lookup(question)
+
+def remember_answer(question, answer, model_ms=None):
+    """Caches a model answer for a FAQ question (only call for turns without tool calls)."""
+    return get_answer_cache().store(question, answer, model_ms)
+
+def get_answer_cache_stats():
+    """Returns hit rate, latency saved and eviction counters of the answer cache."""
+    return get_answer_cache().stats()
+
+def build_turn_message(prompt, current_time_str, faq_content=None, memory_context=None):
+    """Wraps the user prompt with per-turn context (current time, retrieved FAQ, conversation memory) so the system instruction stays stable."""
+    context = f"[현재 시각 (Current Time): {current_time_str}]\n"
+    if faq_content:
+        context += f"[관련 FAQ]\n{faq_content}"
+    if memory_context:
+        context += f"{memory_context}\n"
+    return f"{context}\n{prompt}"
+
+def estimate_tokens(text):
+    """
+    Rough token estimate for offline comparisons (no API call).
+    Hangul/CJK characters are counted ~1 token each, other text ~4 chars per token.
+    """
+    text = str(text)
+    cjk = sum(1 for ch in text if ord(ch) >= 0x1100)
+    return cjk + (len(text) - cjk + 3) // 4
+
+def log_usage(model_name, prompt_tokens, candidate_tokens, latency_ms=None, ttfb_ms=None, tool_calls=0, cache_hits=0):
+    """Queues a usage entry; a background writer appends it to the SQLite usage log in batches."""
+    usage_log.get_logger(USAGE_DB_FILE, legacy_csv=USAGE_LOG_FILE).log({
+        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         'model': model_name,
         'prompt_tokens': prompt_tokens,
-        'candidate_tokens': candidate_tokens
-    }])
+        'candidate_tokens': candidate_tokens,
+        'latency_ms': latency_ms,
+        'ttfb_ms': ttfb_ms,
+        'tool_calls': tool_calls,
+        'cache_hits': cache_hits
+    })
 
-    if not os.path.exists(USAGE_LOG_FILE):
-        new_entry.to_csv(USAGE_LOG_FILE, index=False)
-    else:
-        new_entry.to_csv(USAGE_LOG_FILE, mode='a', header=False, index=False)
+def load_usage_data(start=None, end=None):
+    """Loads usage logs (optionally only start <= timestamp < end) from the SQLite usage log."""
+    import pandas as pd
 
-def load_usage_data():
-    """Loads usage logs from CSV."""
-    if not os.path.exists(USAGE_LOG_FILE):
-        return pd.DataFrame(columns=['timestamp', 'model', 'prompt_tokens', 'candidate_tokens'])
     try:
-        df = pd.read_csv(USAGE_LOG_FILE)
+        # Make entries still sitting in this process' buffer visible
+        usage_log.get_logger(USAGE_DB_FILE, legacy_csv=USAGE_LOG_FILE).flush()
+        columns, rows = usage_log.query(USAGE_DB_FILE, start, end)
+        df = pd.DataFrame.from_records(rows, columns=columns)
         df['timestamp'] = pd.to_datetime(df['timestamp'])
         return df
     except Exception as e:
         print(f"Error loading usage logs: {e}")
-        return pd.DataFrame(columns=['timestamp', 'model', 'prompt_tokens', 'candidate_tokens'])
+        return pd.DataFrame(columns=usage_log.COLUMNS)
+
+def load_usage_rollups(granularity="hour", days=7, model=None):
+    """
+    Loads pre-aggregated usage (requests, token sums, latency p50/p95/p99) per minute/hour/day
+    for the last `days` days without scanning raw log rows.
+    """
+    import pandas as pd
+
+    try:
+        usage_log.get_logger(USAGE_DB_FILE, legacy_csv=USAGE_LOG_FILE).flush()
+        start = datetime.now() - timedelta(days=days)
+        rows = usage_log.query_rollups(USAGE_DB_FILE, granularity, start=start, model=model)
+        return pd.DataFrame(rows, columns=['bucket', 'model', 'requests', 'prompt_tokens', 'candidate_tokens',
+                                           'latency_p50', 'latency_p95', 'latency_p99'])
+    except Exception as e:
+        print(f"Error loading usage rollups: {e}")
+        return pd.DataFrame(columns=['bucket', 'model', 'requests', 'prompt_tokens', 'candidate_tokens'])
+
+def get_rate_limiter():
+    """Process-wide Gemini rate limiter (buckets live in RATE_LIMIT_DB_FILE, shared across processes)."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = rate_limiter.RateLimiter(RATE_LIMIT_DB_FILE)
+    return _rate_limiter
+
+def estimate_turn_tokens(model='gemini-2.5-flash', default=2000):
+    """
+    Tokens to reserve for one chat turn: the average prompt+candidate tokens per logged turn
+    over the last hour (from the rollups), refreshed at most once a minute.
+    """
+    global _turn_tokens_estimate
+    now = time.monotonic()
+    if _turn_tokens_estimate is not None and now - _turn_tokens_estimate[0] < 60:
+        return _turn_tokens_estimate[1]
+    tokens = default
+    try:
+        rows = usage_log.query_rollups(USAGE_DB_FILE, "minute", start=datetime.now() - timedelta(hours=1), model=model)
+        requests = sum(row['requests'] for row in rows)
+        if requests:
+            tokens = int(sum(row['prompt_tokens'] + row['candidate_tokens'] for row in rows) / requests)
+    except Exception as e:
+        print(f"Error estimating turn tokens: {e}")
+    _turn_tokens_estimate = (now, tokens)
+    return tokens
 
 def load_bot_rules():
     """Loads custom bot rules from a text file."""
@@ -87,11 +346,36 @@ def save_bot_rules(rules_text):
         print(f"Error saving bot rules: {e}")
         return False
 
+def _health_targets():
+    return {
+        "flight_schedule": FLIGHT_API_BASE_URL,
+        "flight_operation_info": FLIGHT_OPERATION_INFO_API_URL,
+        "pnr_detail": PNR_DETAIL_API_URL,
+        "operation_confirmation": OPERATION_CONFIRMATION_API_URL,
+    }
+
+def start_health_prober():
+    """Starts (once per process) the background probe of every upstream."""
+    global _health_prober
+    if _health_prober is None:
+        _health_prober = health.HealthProber(_health_targets)
+    return _health_prober.start()
+
+def get_upstream_health():
+    """Per-upstream state, latency percentiles/histogram and error rate from the last probe pass (no I/O)."""
+    return _health_prober.snapshot() if _health_prober is not None else {}
+
+def _upstream_down(name):
+    return _health_prober is not None and _health_prober.is_down(name)
+
 def check_api_status(url):
-    """Checks if the API is reachable."""
+    """Checks if the API is reachable (from the last background probe when there is a recent one)."""
+    for status in get_upstream_health().values():
+        if status.get("url") == url and status["state"] != health.UNKNOWN:
+            return status["last_ok"], status["last_detail"], status["last_latency_ms"] / 1000
     try:
-        response = requests.get(url, timeout=5)
-        return True, response.status_code, response.elapsed.total_seconds()
+        start = time.perf_counter()
+        return True, health.http_probe(url, 5), time.perf_counter() - start
     except Exception as e:
         return False, str(e), 0
 
@@ -108,78 +392,165 @@ def send_operation_confirmation_api(flight_date: str, flight_number: str, email:
         "requestBy": "진에어 고객서비스센터"
     }
     try:
-        response = requests.post(url, json=payload)
+        response = http_client.post("operation_confirmation", url, json=payload)
         return response.json()
     except Exception as e:
         return {"error": str(e)}
 
-PNR_DETAIL_API_URL = "https://ccs.jinair.com/event/getPnrDetail"
+def _connection_not_established(error):
+    """True when a requests.ConnectionError failed before sending (refused, unreachable, name resolution)."""
+    from urllib3.exceptions import NewConnectionError
 
-def get_pnr_detail_api(pnr: str, first_name: str, last_name: str, departure_date: str):
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+def _deliver_operation_confirmation(flight_date, flight_number, email):
     """
-    예약 상세 조회 API 호출 함수
+    Sends one queued confirmation. Returns (outcome, detail) for email_queue: retry only when the
+    request certainly did not reach the service (no connection, 503, 429), since the email must never
+    be sent twice. Any other 5xx may have come after the email went out, so it fails the job.
     """
-    url = PNR_DETAIL_API_URL
+    import requests
+
+    if _upstream_down("operation_confirmation"):
+        # Not sent at all: back off and try again once the service answers probes
+        return email_queue.OUTCOME_RETRY, str(health.UpstreamDown("operation_confirmation"))
+    url = OPERATION_CONFIRMATION_API_URL
     payload = {
-        "searchNumber": pnr
+        "flightDate": flight_date,
+        "flightNumber": flight_number,
+        "searchFlightId": "0",
+        "email": email,
+        "requestBy": "진에어 고객서비스센터"
     }
-    
-    # User-Agent 헤더 추가 (봇 차단 방지용)
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+    try:
+        response = http_client.post("operation_confirmation", url, json=payload)
+    except (http_client.CircuitOpenError, requests.ConnectTimeout) as e:
+        return email_queue.OUTCOME_RETRY, str(e)
+    except requests.Timeout as e:
+        return email_queue.OUTCOME_FAILED, f"응답 시간 초과 (발송 여부 확인 필요): {e}"
+    except requests.ConnectionError as e:
+        if _connection_not_established(e):
+            return email_queue.OUTCOME_RETRY, str(e)
+        # Aborted / reset after the request went out: the email may have been sent
+        return email_queue.OUTCOME_FAILED, f"연결 끊김 (발송 여부 확인 필요): {e}"
+    if response.status_code in (429, 503):
+        return email_queue.OUTCOME_RETRY, f"HTTP {response.status_code}"
+    if response.status_code >= 500:
+        return email_queue.OUTCOME_FAILED, f"HTTP {response.status_code} (발송 여부 확인 필요)"
+    try:
+        body = response.json()
+    except ValueError:
+        body = {}
+    if response.status_code >= 400 or (isinstance(body, dict) and body.get("error")):
+        return email_queue.OUTCOME_FAILED, (body.get("error") if isinstance(body, dict) else None) or f"HTTP {response.status_code}"
+    return email_queue.OUTCOME_SENT, None
+
+def get_email_queue():
+    """Process-wide operation-confirmation queue; its worker threads start on first use."""
+    global _email_queue
+    if _email_queue is None:
+        _email_queue = email_queue.EmailQueue(EMAIL_QUEUE_DB_FILE, _deliver_operation_confirmation).start()
+    return _email_queue
+
+def enqueue_operation_confirmation(flight_date: str, flight_number: str, email: str):
+    """Queues a confirmation email and returns at once with the job id (the same job for a repeated request)."""
+    date, number, address = email_queue.normalize_request(flight_date, flight_number, email)
+    if len(date) != 8:
+        return {"error": "탑승일은 YYYYMMDD 형식이어야 합니다."}
+    if not address or "@" not in address or "." not in address.split("@")[-1]:
+        return {"error": "이메일 주소 형식이 올바르지 않습니다."}
+    try:
+        job, created = get_email_queue().enqueue(date, number, address)
+    except Exception as e:
+        return {"error": str(e)}
+    return {"job_id": job["id"], "status": job["status"], "duplicate": not created,
+            "flight_date": job["flight_date"], "flight_number": job["flight_number"], "email": job["email"]}
+
+def _job_status(job):
+    return {
+        "job_id": job["id"], "status": job["status"], "attempts": job["attempts"],
+        "flight_date": job["flight_date"], "flight_number": job["flight_number"], "email": job["email"],
+        "requested_at": datetime.fromtimestamp(job["created_at"]).strftime("%Y-%m-%d %H:%M:%S"),
+        "sent_at": datetime.fromtimestamp(job["sent_at"]).strftime("%Y-%m-%d %H:%M:%S") if job["sent_at"] else None,
+        "error": job["last_error"] if job["status"] != email_queue.SENT else None,
     }
 
+def get_operation_confirmation_status(job_id: str = None):
+    """
+    Status of a queued confirmation by job id only: the id is handed to whoever queued the email, while
+    looking jobs up by address would let anyone list another customer's requests.
+    """
+    if not job_id:
+        return {"error": "발송 접수번호가 필요합니다."}
     try:
-        response = requests.post(url, json=payload, headers=headers)
-        data = response.json()
-        
-        # Validation Logic
-        if "Passengers" in data and "Journeys" in data:
-            # Check date (first journey's departure date)
-            # Assuming Journey structure has DepartureTime like "2024-02-06T10:00:00"
-            date_match = False
-            for journey in data["Journeys"]:
-                dep_time_str = journey.get("DepartureTime", "")
-                if dep_time_str.replace("-", "").startswith(departure_date):
-                    date_match = True
-                    break
-                    
-            name_match = False
-            for passenger in data["Passengers"]:
-                # Assuming Passenger structure has FirstName and LastName
-                api_first = passenger.get("FirstName", "").upper()
-                api_last = passenger.get("LastName", "").upper()
-                if api_first == first_name.upper() and api_last == last_name.upper():
-                    name_match = True
-                    break
-                    
-            if not date_match or not name_match:
-                return {"error": "입력하신 여정(출발일) 또는 탑승객 정보가 예약 내역과 일치하지 않습니다."}
-                
-        return data
-        
+        job = get_email_queue().get(job_id)
     except Exception as e:
         return {"error": str(e)}
+    if job is None:
+        return {"error": f"접수번호 {job_id}를 찾을 수 없습니다."}
+    return _job_status(job)
 
-def get_flight_operation_info_api(date: str, departure: str, arrival: str):
+PNR_DETAIL_API_URL = "https://ccs.jinair.com/event/getPnrDetail"
+
+def _fetch_pnr_detail(pnr: str):
+    if _upstream_down("pnr_detail"):
+        raise health.UpstreamDown("pnr_detail")
+    payload = {
+        "searchNumber": pnr
+    }
+    response = http_client.post("pnr_detail", PNR_DETAIL_API_URL, json=payload)
+    return response.json()
+
+def get_pnr_detail_api(pnr: str, first_name: str, last_name: str, departure_date: str):
     """
-    운항 정보 조회 API 호출 함수
+    예약 상세 조회 API 호출 함수
+    형식이 잘못된 입력은 API 호출 없이 거절하고, 조회한 예약은 현재 대화(세션) 안에서만 잠시 캐시합니다.
     """
-    url = FLIGHT_OPERATION_INFO_API_URL
+    try:
+        return pnr_cache.lookup(pnr, first_name, last_name, departure_date, _fetch_pnr_detail)
+    except Exception as e:
+        return {"error": str(e)}
+
+def _fetch_flight_operation_route(date: str, departure: str, arrival: str, lang: str = "ko"):
+    if _upstream_down("flight_operation_info"):
+        raise health.UpstreamDown("flight_operation_info")
+    # Payload excludes 'flight' key as it causes issues/empty response
     payload = {
-        "lang": "ko",
+        "lang": lang,
         "date": date,
         "departure": departure,
         "arrival": arrival
     }
-    
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-    }
+    response = http_client.post("flight_operation_info", FLIGHT_OPERATION_INFO_API_URL, json=payload)
+    return response.json()
+
+def _get_flight_operation_route(date: str, departure: str, arrival: str, lang: str = "ko"):
+    """
+    Route 단위 운항 정보를 공유 캐시에서 가져옵니다 (동일 키 동시 요청은 1회 호출로 합쳐짐).
+    API 장애 중에는 만료된 캐시라도 반환합니다 (없으면 즉시 오류).
+    """
+    return flight_cache.flight_operation_cache.get_route(
+        date, departure, arrival, lang, lambda: _fetch_flight_operation_route(date, departure, arrival, lang),
+        allow_stale=_upstream_down("flight_operation_info"))
+
+def _fetched_at(entry):
+    return datetime.fromtimestamp(entry.stored_at).strftime("%Y-%m-%d %H:%M:%S")
+
+def _freshness(entry):
+    """FetchedAt, plus Stale when the entry is served past its TTL because the upstream is down."""
+    return {"FetchedAt": _fetched_at(entry), "Stale": True} if entry.stale else {"FetchedAt": _fetched_at(entry)}
 
+def get_flight_operation_info_api(date: str, departure: str, arrival: str):
+    """
+    운항 정보 조회 API 호출 함수
+    """
     try:
-        response = requests.post(url, json=payload, headers=headers)
-        return response.json()
+        entry = _get_flight_operation_route(date, departure, arrival)
+        if "FlightInfo" not in entry.data:
+            return entry.data
+        # Served from the (possibly prefetched) cache: say how fresh it is
+        return {**entry.data, **_freshness(entry)}
     except Exception as e:
         return {"error": str(e)}
 
@@ -188,34 +559,16 @@ def get_flight_operation_info_api(date: str, departure: str, arrival: str):
 def get_flight_operation_info_detail_api(date: str, flight_no: str, departure: str, arrival: str):
     """
     운항 정보 상세 조회 API 호출 함수 (편명, 출발지, 도착지 필수)
-    API는 Route 기반으로 조회하므로, 전체 조회 후 편명으로 필터링하여 반환합니다.
+    API는 Route 기반으로 조회하므로, 캐시된 Route 응답의 편명 인덱스에서 찾아 반환합니다.
     """
-    url = FLIGHT_OPERATION_INFO_API_URL
-    # Payload excludes 'flight' key as it causes issues/empty response
-    payload = {
-        "lang": "ko",
-        "date": date,
-        "departure": departure,
-        "arrival": arrival
-    }
-    
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-    }
-
     try:
-        response = requests.post(url, json=payload, headers=headers)
-        data = response.json()
+        entry = _get_flight_operation_route(date, departure, arrival)
         
-        # Filter for the specific flight number
-        target_flight_num = ''.join(filter(str.isdigit, flight_no)) # Extract numbers only (e.g. LJ201 -> 201)
-        
-        if "FlightInfo" in data:
-            for flight in data["FlightInfo"]:
-                # FlightNo in API is usually just number string like "201"
-                api_flight_no = flight.get("FlightNo", "")
-                if api_flight_no == target_flight_num:
-                    return flight
+        if "FlightInfo" in entry.data:
+            # FlightNo in API is usually just number string like "201" (LJ201 -> 201)
+            flight = entry.by_flight_no.get(flight_cache.normalize_flight_no(flight_no))
+            if flight is not None:
+                return {**flight, **_freshness(entry)}
                     
             return {"error": f"해당 편명({flight_no})을 찾을 수 없습니다."}
         else:
@@ -224,4 +577,161 @@ def get_flight_operation_info_detail_api(date: str, flight_no: str, departure: s
     except Exception as e:
         return {"error": str(e)}
 
+def _bulk_fetch_route(key):
+    date, departure, arrival = key
+    try:
+        entry = _get_flight_operation_route(date, departure, arrival)
+    except Exception as e:
+        return {"error": str(e)}
+    if "FlightInfo" not in entry.data:
+        return {"error": entry.data.get("error") or "운항 정보를 가져오지 못했습니다."}
+    return entry
+
+def get_flight_operations_bulk_api(queries):
+    """
+    여러 (날짜, 출발지, 도착지[, 편명]) 운항 정보를 한 번에 조회합니다.
+    Same routes are fetched once (flight-number queries share their route), distinct routes run
+    concurrently with at most BULK_MAX_PARALLEL upstream calls. Returns flights merged into one
+    index keyed "LJ{FlightNo}/{date}", plus per-route status and unmatched flight numbers.
+    """
+    if len(queries) > BULK_MAX_QUERIES:
+        return {"error": f"한 번에 최대 {BULK_MAX_QUERIES}건까지 조회할 수 있습니다."}
+    wanted = {}   # route key -> set of flight numbers, or None for the whole route
+    for query in queries:
+        date, departure, arrival = str(query[0]).strip(), str(query[1]).strip().upper(), str(query[2]).strip().upper()
+        flight_no = flight_cache.normalize_flight_no(query[3]) if len(query) > 3 and query[3] else None
+        key = (date, departure, arrival)
+        if flight_no is None:
+            wanted[key] = None
+        elif key not in wanted:
+            wanted[key] = {flight_no}
+        elif wanted[key] is not None:
+            wanted[key].add(flight_no)
+
+    keys = list(wanted)
+    with ThreadPoolExecutor(max_workers=max(1, min(BULK_MAX_PARALLEL, len(keys)))) as pool:
+        # Copy the caller's context so cache hits are counted on the current turn
+        fetched = list(pool.map(lambda key: contextvars.copy_context().run(_bulk_fetch_route, key), keys))
+
+    routes, flights, not_found = [], {}, []
+    for (date, departure, arrival), result in zip(keys, fetched):
+        route = {"date": date, "departure": departure, "arrival": arrival}
+        if isinstance(result, dict):
+            routes.append({**route, "error": result["error"]})
+            continue
+        numbers = wanted[(date, departure, arrival)]
+        selected = result.by_flight_no if numbers is None else {n: result.by_flight_no.get(n) for n in sorted(numbers)}
+        for number, flight in selected.items():
+            if flight is None:
+                not_found.append(f"LJ{number}/{date}")
+            else:
+                key = f"LJ{number}/{date}"
+                if key in flights:
+                    # Same number on another route that day: keep both
+                    key = f"{key}/{departure}-{arrival}"
+                flights[key] = {**flight, "FlightDate": date, "Departure": departure, "Arrival": arrival}
+        routes.append({**route, "count": sum(1 for flight in selected.values() if flight is not None),
+                       "fetched_at": _fetched_at(result), **({"stale": True} if result.stale else {})})
+    return {"routes": routes, "flights": flights, "not_found": not_found}
+
+def _fetch_flight_schedule(date: str, departure: str, arrival: str):
+    if _upstream_down("flight_schedule"):
+        raise health.UpstreamDown("flight_schedule")
+    params = {
+        'departure': departure,
+        'arrival': arrival,
+        'date': date,
+        'lang': 'ko'
+    }
+    response = http_client.get("flight_schedule", f"{FLIGHT_API_BASE_URL}/API/Flight", params=params)
+    return response.json()
+
+def get_history_store():
+    """Process-wide on-disk store of older chat messages; its reaper frees idle sessions' memory."""
+    global _history_store
+    if _history_store is None:
+        _history_store = chat_history.HistoryStore(HISTORY_DB_FILE)
+    return _history_store
+
+def new_chat_history():
+    """Message list of a new chat session: recent messages in memory, older ones in HISTORY_DB_FILE."""
+    return chat_history.ChatHistory(get_history_store())
+
+def get_session_store():
+    """Process-wide chat session store (shared by every chat_server.py worker)."""
+    global _session_store
+    if _session_store is None:
+        _session_store = session_store.SessionStore(SESSION_DB_FILE)
+    return _session_store
+
+def get_schedule_store():
+    """Process-wide cache of normalized flight schedules."""
+    global _schedule_store
+    if _schedule_store is None:
+        _schedule_store = schedule_store.ScheduleStore(_fetch_flight_schedule)
+    return _schedule_store
+
+def get_flight_schedule_api(departure: str, arrival: str, date: str):
+    """
+    항공 스케줄 조회: 출발시각 순으로 정렬된 목록과 편수/최단 소요/첫편/막편 요약을 반환합니다.
+    """
+    try:
+        return get_schedule_store().get_day(str(date).strip(), departure.strip(), arrival.strip(),
+                                            allow_stale=_upstream_down("flight_schedule")).summary()
+    except Exception as e:
+        return {"error": str(e)}
+
+def get_flight_schedule_range_api(departure: str, arrival: str, start_date: str, days: int = 7):
+    """
+    기간 스케줄 조회: 날짜별 요약(편수/최단 소요/첫편/막편)과 기간 전체의 최단 소요 편을 반환합니다.
+    Cached days are reused; only missing days are fetched (concurrently).
+    """
+    try:
+        days = int(days)
+    except (TypeError, ValueError):
+        return {"error": "조회 기간(days)은 숫자여야 합니다."}
+    if not 1 <= days <= schedule_store.RANGE_MAX_DAYS:
+        return {"error": f"한 번에 최대 {schedule_store.RANGE_MAX_DAYS}일까지 조회할 수 있습니다."}
+    try:
+        results = get_schedule_store().get_range(departure.strip().upper(), arrival.strip().upper(),
+                                                 str(start_date).strip(), days,
+                                                 allow_stale=_upstream_down("flight_schedule"))
+    except ValueError:
+        return {"error": "시작일은 YYYYMMDD 형식이어야 합니다."}
+    summaries, fastest = [], None
+    for date, day in results:
+        if isinstance(day, Exception):
+            summaries.append({"date": date, "error": str(day)})
+            continue
+        summaries.append(day.summary(with_flights=False))
+        if day.fastest is not None and (fastest is None or day.fastest[3] < fastest[1]["duration"]):
+            fastest = (date, day.summary(with_flights=False)["fastest"])
+    return {"route": f"{departure.strip().upper()}-{arrival.strip().upper()}", "days": summaries,
+            "total_count": sum(day.get("count", 0) for day in summaries),
+            "fastest": {"date": fastest[0], **fastest[1]} if fastest else None}
+
+def get_schedule_cache_stats():
+    return get_schedule_store().stats()
+
+def get_flight_operation_cache_stats():
+    """Returns hit/miss/coalesce counters of the flight operation cache."""
+    return flight_cache.flight_operation_cache.stats()
+
+def start_flight_prefetch(hot_routes=None, budget_per_minute=None):
+    """Starts (once per process) the background refresh of today's/tomorrow's hot routes."""
+    global _flight_prefetcher
+    if _flight_prefetcher is None:
+        _flight_prefetcher = flight_prefetch.PrefetchScheduler(
+            _fetch_flight_operation_route,
+            hot_routes=hot_routes or flight_prefetch.HOT_ROUTES,
+            budget_per_minute=budget_per_minute or flight_prefetch.REQUEST_BUDGET_PER_MINUTE)
+    return _flight_prefetcher.start()
 
+def get_flight_prefetch_stats():
+    """Refresh counts/cost of the prefetcher and staleness of what the cache served."""
+    cache = flight_cache.flight_operation_cache.stats()
+    stats = _flight_prefetcher.stats() if _flight_prefetcher is not None else {"running": False}
+    stats["served_age_avg_s"] = cache["served_age_avg_s"]
+    stats["served_age_max_s"] = cache["served_age_max_s"]
+    stats["cache_hit_rate"] = cache["hit_rate"]
+    return stats
@@ -0,0 +1,29 @@
+import answer_cache
+import json
+
+def verify_answer_cache():
+    cache = answer_cache.AnswerCache()
+    cache.store("기내 수하물 무게 제한이 어떻게 되나요?", "기내 수하물은 10kg까지 무료입니다.", 1200)
+    cache.store("유아 항공 요금은 얼마인가요?", "국내선 유아 요금은 성인 운임의 10%입니다.", 1200)
+    cache.store("수하물 15kg 초과 요금이 얼마예요?", "초과 1kg당 2,000원입니다.", 1200)
+
+    # 1. Rewordings of a remembered question are served
+    for question in ["기내수하물 무게 제한 어떻게 되나요", "유아 항공 요금 얼마예요?", "수하물 15kg 초과 요금은 얼마인가요"]:
+        answer = cache.lookup(question)
+        print(f"Hit: {question} -> {answer}")
+        assert answer is not None, question
+
+    # 2. Similar wording that asks something else, or different numbers, is not
+    for question in ["위탁 수하물 무게 제한이 어떻게 되나요?", "소아 항공 요금은 얼마인가요?", "수하물 20kg 초과 요금이 얼마예요?"]:
+        print(f"Miss: {question}")
+        assert cache.lookup(question) is None, question
+
+    # 3. Personal questions and answers carrying personal data never enter the cache
+    assert not cache.store("제 예약 이메일이 뭐였죠?", "hong@example.com 입니다.")
+    assert not cache.store("환불 규정 알려주세요", "홍길동님, 환불은 출발 전까지 가능합니다.")
+    assert cache.lookup("제 이름이 뭐라고 했죠?") is None
+    print(json.dumps(cache.stats(), ensure_ascii=False))
+    print("✅ Success: answer cache serves rewordings only.")
+
+if __name__ == "__main__":
+    verify_answer_cache()
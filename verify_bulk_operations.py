@@ -0,0 +1,36 @@
+import utils
+import fakes
+import json
+import time
+
+def verify_bulk_operations():
+    with fakes.StubUpstream(latency=0.2) as stub:
+        stub.point_utils_at()
+        # A week of round trips ICN <-> NRT, plus flight-number queries on routes already listed
+        queries = []
+        for day in range(6, 11):
+            queries.append((f"202402{day:02d}", "ICN", "NRT"))
+            queries.append((f"202402{day:02d}", "NRT", "ICN"))
+        queries += [("20240206", "ICN", "NRT", "LJ203"), ("20240206", "icn", "nrt"), ("20240207", "ICN", "BKK", "LJ201"),
+                    ("20240207", "ICN", "BKK", "LJ999")]
+
+        start = time.perf_counter()
+        result = utils.get_flight_operations_bulk_api(queries)
+        elapsed = time.perf_counter() - start
+
+        distinct_routes = len(result["routes"])
+        print(f"{len(queries)} queries -> {distinct_routes} routes, {stub.call_count()} upstream call(s), "
+              f"peak parallel {stub.peak_in_flight}, {elapsed:.2f}s (serial would be ~{distinct_routes * 0.2:.2f}s)")
+        print(f"Merged flights: {len(result['flights'])}, not found: {result['not_found']}")
+        print(json.dumps(result["routes"][:3], indent=4, ensure_ascii=False))
+
+        ok = (stub.call_count() == distinct_routes == 11
+              and stub.peak_in_flight <= utils.BULK_MAX_PARALLEL
+              and "LJ201/20240207" in result["flights"] and result["not_found"] == ["LJ999/20240207"])
+        if ok:
+            print("✅ Deduplicated, bounded and merged into one flight-number index.")
+        else:
+            print("❌ Bulk lookup did not behave as expected.")
+
+if __name__ == "__main__":
+    verify_bulk_operations()
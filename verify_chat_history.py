@@ -0,0 +1,55 @@
+import chat_engine
+import chat_history
+import conversation_memory
+import fakes
+import utils
+import os
+import tempfile
+
+TURNS = 60      # 120 messages: several spills past chat_history.WINDOW
+
+def prompt(i):
+    return f"{i}번째 문의입니다. 기내 반입 규정이 궁금해요. 2월 {i % 28 + 1}일 김포 출발 LJ{300 + i} 탑승 예정입니다."
+
+def verify_chat_history():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = chat_history.HistoryStore(os.path.join(tmp, "chat_history.db"))
+        loads = []
+        load = store.load
+        store.load = lambda *args: loads.append(args) or load(*args)
+
+        _, system_instruction = utils.get_system_prefix()
+        model = fakes.FakeGenerativeModel(system_instruction=system_instruction, tools=chat_engine.TOOLS, ttft=0.0,
+                                          chunk_delay=0.0)
+        session = {"messages": chat_history.ChatHistory(store), "memory": conversation_memory.new_memory()}
+        plain = {"messages": [], "memory": conversation_memory.new_memory()}
+
+        # 1. Normal turns never read the spill store, even long after the first messages went to disk
+        for i in range(TURNS):
+            chat_engine.run_turn(session, prompt(i), model)
+            chat_engine.run_turn(plain, prompt(i), model)
+        history = session["messages"]
+        print(f"{len(history)} messages, {history.offset} on disk, {len(history.recent)} in memory; "
+              f"spill store reads during turns: {len(loads)}")
+        assert history.offset > 0 and store.get_stats()["spilled"] > 0
+        assert not loads, loads
+
+        # 2. The model sees the same history and memory as with a plain in-memory list
+        history.append({"role": "user", "content": prompt(TURNS)})
+        plain["messages"].append({"role": "user", "content": prompt(TURNS)})
+        spilled = chat_engine.prepare_model_turn(history, session["memory"], prompt(TURNS))
+        in_memory = chat_engine.prepare_model_turn(plain["messages"], plain["memory"], prompt(TURNS))
+        assert spilled[0] == in_memory[0] and session["memory"] == plain["memory"], (spilled[0], in_memory[0])
+        assert not loads
+
+        # 3. A reclaimed session reads its window back once; the next turn again reads nothing
+        history.reclaim()
+        chat_engine.run_turn(session, prompt(TURNS + 1), model)
+        reads = len(loads)
+        chat_engine.run_turn(session, prompt(TURNS + 2), model)
+        print(f"After reclaim: {reads} read(s) to resume, {len(loads) - reads} on the next turn")
+        assert reads == 1 and len(loads) == reads
+        print("✅ Success: chat turns only read the in-memory window.")
+
+if __name__ == "__main__":
+    verify_chat_history()
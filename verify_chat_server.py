@@ -0,0 +1,101 @@
+import chat_client
+import fakes
+import http_client
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+def start_server(upstream, data_dir, model_ttft=0.0):
+    server = subprocess.Popen([sys.executable, "chat_server.py", "--port", "0", "--fake-model", "--model-ttft",
+                               str(model_ttft), "--chunk-delay", "0", "--upstream", upstream, "--data-dir", data_dir],
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)))
+    url = json.loads(server.stdout.readline())["listening"]
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            http_client.get("health_check", url + "/healthz")
+            return server, url
+        except Exception:
+            if time.monotonic() > deadline:
+                server.terminate()
+                raise
+            time.sleep(0.1)
+
+def verify_chat_server():
+    with tempfile.TemporaryDirectory() as tmp, fakes.StubUpstream() as stub:
+        server, url = start_server(stub.url, tmp)
+        try:
+            owner, other = chat_client.ChatClient(url, "key-owner"), chat_client.ChatClient(url, "key-other")
+
+            # 1. The key that created a session reads it and runs its turns
+            session_id = owner.create_session()
+            answer = "".join(owner.stream_turn(session_id, "수하물 규정 알려주세요"))
+            transcript = owner.get_session(session_id)
+            print(f"Owner: {transcript['turns']} turn(s), {len(transcript['messages'])} messages")
+            assert answer and transcript["turns"] == 1 and len(transcript["messages"]) == 2, transcript
+
+            # 2. Any other key (or none) gets 404 for both the transcript and new turns
+            for client in (other, chat_client.ChatClient(url)):
+                for attempt in (lambda: client.get_session(session_id),
+                                lambda: "".join(client.stream_turn(session_id, "이전 대화 보여줘"))):
+                    try:
+                        attempt()
+                    except chat_client.ChatAPIError as e:
+                        assert e.status == 404, e.status
+                    else:
+                        raise AssertionError("another key reached the session")
+            assert owner.get_session(session_id)["turns"] == 1
+            print("Other keys: 404 for the transcript and for turns")
+
+            # 3. --data-dir holds every SQLite file the server writes; nothing lands in the working directory
+            created = sorted(name for name in os.listdir(tmp) if name.endswith(".db"))
+            print(f"Data dir: {created}")
+            assert "chat_sessions.db" in created and "faq_store.db" in created, created
+        finally:
+            server.terminate()
+            server.wait()
+            http_client.reset()
+        print("✅ Success: chat server sessions are bound to their API key.")
+
+def verify_graceful_shutdown():
+    with tempfile.TemporaryDirectory() as tmp, fakes.StubUpstream() as stub:
+        # A turn running when SIGTERM arrives finishes, and idle keep-alive connections close quietly
+        server, url = start_server(stub.url, tmp, model_ttft=1.0)
+        client = chat_client.ChatClient(url, "key-owner")
+        session_id = client.create_session()
+        idle = chat_client.ChatClient(url, "key-idle")
+        idle.create_session()       # leaves a keep-alive connection open
+        answer = []
+        turn = threading.Thread(target=lambda: answer.append("".join(client.stream_turn(session_id, "수하물 규정 알려주세요"))))
+        turn.start()
+        time.sleep(0.3)
+        start = time.perf_counter()
+        server.terminate()
+        server.wait(timeout=20)
+        turn.join()
+        stderr = server.stderr.read()
+        http_client.reset()
+        print(f"Shutdown: {time.perf_counter() - start:.1f}s, in-flight answer {len(answer[0]) if answer else 0} chars")
+        assert answer and answer[0], "the running turn should finish"
+        assert "CancelledError" not in stderr and "Traceback" not in stderr, stderr
+
+        # Its lease was released: the next worker serves the session's next turn at once
+        server, url = start_server(stub.url, tmp)
+        try:
+            client = chat_client.ChatClient(url, "key-owner")
+            assert "".join(client.stream_turn(session_id, "국내선 수하물은요?"))
+            assert client.get_session(session_id)["turns"] == 2
+        finally:
+            server.terminate()
+            server.wait()
+            http_client.reset()
+        print("✅ Success: SIGTERM lets running turns finish and release their sessions.")
+
+if __name__ == "__main__":
+    verify_chat_server()
+    verify_graceful_shutdown()
@@ -0,0 +1,126 @@
+import chat_engine
+import email_queue
+import fakes
+import http_client
+import utils
+import json
+import os
+import socket
+import threading
+import tempfile
+import time
+
+def wait_for(queue, job_id, statuses, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.02)
+    return queue.get(job_id)
+
+def verify_email_queue():
+    with tempfile.TemporaryDirectory() as tmp, fakes.StubUpstream(latency=0.5) as stub:
+        stub.point_utils_at()
+        http_client.reset()
+        utils.EMAIL_QUEUE_DB_FILE = os.path.join(tmp, "email_queue.db")
+        utils._email_queue = None
+        path = fakes.OPERATION_CONFIRMATION_PATH
+        queue = utils.get_email_queue()
+        queue.backoff_base = 0.05
+
+        # 1. The tool returns at once with a job id while the upstream takes 0.5s
+        start = time.perf_counter()
+        result = chat_engine.send_operation_confirmation("20240703", "LJ507", "Hong@Example.com")
+        enqueue_ms = (time.perf_counter() - start) * 1000
+        print(f"Enqueue: {json.dumps(result, ensure_ascii=False)} in {enqueue_ms:.1f} ms")
+        assert "job_id" in result and enqueue_ms < 200, "enqueue should not wait for the email service"
+
+        # 2. A double submit / model retry with different formatting gets the same job
+        again = utils.enqueue_operation_confirmation("20240703", "lj 507", "hong@example.com ")
+        assert again["job_id"] == result["job_id"] and again["duplicate"], again
+        job = wait_for(queue, result["job_id"], {email_queue.SENT, email_queue.FAILED})
+        print(f"Status via chat tool: {json.dumps(chat_engine.get_operation_confirmation_status(result['job_id']), ensure_ascii=False)}")
+        assert job["status"] == email_queue.SENT and stub.call_count(path) == 1, (job, stub.calls)
+
+        # 3. 503s are retried with backoff until the send goes through
+        stub.latency = 0.0
+        stub.fail_next = 2
+        retried = utils.enqueue_operation_confirmation("20240704", "LJ201", "kim@example.com")
+        job = wait_for(queue, retried["job_id"], {email_queue.SENT, email_queue.FAILED})
+        print(f"Retried job: status={job['status']} attempts={job['attempts']}")
+        assert job["status"] == email_queue.SENT and job["attempts"] == 3, job
+
+        # 4. A service that stays down fails the job after MAX_ATTEMPTS; a new request is then accepted
+        stub.error_rate = 1.0
+        down = utils.enqueue_operation_confirmation("20240705", "LJ301", "lee@example.com")
+        job = wait_for(queue, down["job_id"], {email_queue.SENT, email_queue.FAILED})
+        print(f"Upstream down: status={job['status']} attempts={job['attempts']} error={job['last_error']}")
+        assert job["status"] == email_queue.FAILED and job["attempts"] == email_queue.MAX_ATTEMPTS, job
+        stub.error_rate = 0.0
+        http_client.reset()
+        assert not utils.enqueue_operation_confirmation("20240705", "LJ301", "lee@example.com")["duplicate"]
+
+        # 5. An unknown outcome (e.g. read timeout after the request went out) is never retried
+        calls = []
+        def ambiguous(*args):
+            calls.append(args)
+            return email_queue.OUTCOME_FAILED, "응답 시간 초과 (발송 여부 확인 필요)"
+        side = email_queue.EmailQueue(os.path.join(tmp, "side.db"), ambiguous, backoff_base=0.01)
+        job, _ = side.enqueue("20240706", "LJ1", "park@example.com")
+        side.run_once()
+        assert side.get(job["id"])["status"] == email_queue.FAILED and len(calls) == 1 and not side.run_once()
+
+        # 6. A 500 may come after the email went out: failed at once, only 503/429 are retried
+        stub.fail_status, stub.fail_next = 500, 1
+        before = stub.call_count(path)
+        broken = utils.enqueue_operation_confirmation("20240707", "LJ401", "choi@example.com")
+        job = wait_for(queue, broken["job_id"], {email_queue.SENT, email_queue.FAILED})
+        print(f"HTTP 500: status={job['status']} attempts={job['attempts']} error={job['last_error']}")
+        assert job["status"] == email_queue.FAILED and job["attempts"] == 1 and stub.call_count(path) - before == 1, job
+        stub.fail_status = 503
+
+        # 7. Status is given by job id only, never listed by email address
+        assert "error" in utils.get_operation_confirmation_status(None)
+        assert "error" in utils.get_operation_confirmation_status("NOSUCHJOB1")
+        assert utils.get_operation_confirmation_status(result["job_id"])["status"] == email_queue.SENT
+
+        # 8. Two processes' workers on one database: every job is sent exactly once
+        before = stub.call_count(path)
+        queues = [email_queue.EmailQueue(utils.EMAIL_QUEUE_DB_FILE, utils._deliver_operation_confirmation,
+                                         poll_interval=0.05).start() for _ in range(2)]
+        ids = [queues[i % 2].enqueue("20240710", f"LJ{100 + i}", f"user{i}@example.com")[0]["id"] for i in range(20)]
+        jobs = [wait_for(queues[0], job_id, {email_queue.SENT, email_queue.FAILED}) for job_id in ids]
+        for q in queues:
+            q.stop()
+        sent = stub.call_count(path) - before
+        print(f"Shared database: {sum(j['status'] == email_queue.SENT for j in jobs)}/20 sent, {sent} upstream calls")
+        assert sent == 20 and all(j["status"] == email_queue.SENT for j in jobs)
+
+        # 9. A connection that never opened is retried; one dropped after the request went out is not
+        refused = socket.socket()
+        refused.bind(("127.0.0.1", 0))
+        refused_url = f"http://127.0.0.1:{refused.getsockname()[1]}{path}"
+        refused.close()
+        dropping = socket.create_server(("127.0.0.1", 0))
+        def accept_and_drop():
+            while True:
+                conn, _ = dropping.accept()
+                conn.recv(65536)
+                conn.close()
+        threading.Thread(target=accept_and_drop, daemon=True).start()
+        outcomes = {}
+        for name, url in (("refused", refused_url), ("dropped", f"http://127.0.0.1:{dropping.getsockname()[1]}{path}")):
+            utils.OPERATION_CONFIRMATION_API_URL = url
+            outcomes[name] = utils._deliver_operation_confirmation("20240711", "LJ1", "jung@example.com")
+        dropping.close()
+        print(f"Connection errors: {outcomes}")
+        assert outcomes["refused"][0] == email_queue.OUTCOME_RETRY, outcomes
+        assert outcomes["dropped"][0] == email_queue.OUTCOME_FAILED and "발송 여부 확인 필요" in outcomes["dropped"][1]
+
+        queue.stop()
+        print(f"Queue stats: {json.dumps(queue.get_stats(), ensure_ascii=False)}")
+        print("✅ Success: email queue verified.")
+
+if __name__ == "__main__":
+    verify_email_queue()
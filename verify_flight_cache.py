@@ -0,0 +1,27 @@
+import utils
+import fakes
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+def verify_flight_cache():
+    with fakes.StubUpstream(latency=0.2) as stub:
+        stub.point_utils_at()
+        date, departure, arrival = "20240206", "GMP", "CJU"
+
+        # 50 customers asking about the same route at once -> one upstream POST
+        with ThreadPoolExecutor(max_workers=50) as pool:
+            results = list(pool.map(lambda _: utils.get_flight_operation_info_api(date, departure, arrival), range(50)))
+        print(f"50 concurrent route lookups -> {stub.call_count()} upstream call(s)")
+
+        # Flight-number lookups reuse the cached route response
+        detail = utils.get_flight_operation_info_detail_api(date, "LJ203", departure, arrival)
+        print(f"Detail lookup -> {stub.call_count()} upstream call(s) total, FlightNo: {detail.get('FlightNo')}")
+
+        print(json.dumps(utils.get_flight_operation_cache_stats(), indent=4))
+        if stub.call_count() == 1 and all("FlightInfo" in r for r in results):
+            print("✅ Route and detail lookups shared a single upstream request.")
+        else:
+            print("❌ Cache did not collapse the lookups.")
+
+if __name__ == "__main__":
+    verify_flight_cache()
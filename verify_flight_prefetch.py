@@ -0,0 +1,67 @@
+import utils
+import fakes
+import flight_cache
+import flight_prefetch
+import json
+import time
+from datetime import datetime
+
+def verify_flight_prefetch():
+    with fakes.StubUpstream(latency=0.3) as stub:
+        stub.point_utils_at()
+        cache = flight_cache.flight_operation_cache
+        cache.clear()
+        today = datetime.now().strftime("%Y%m%d")
+        budget = 8
+        scheduler = flight_prefetch.PrefetchScheduler(utils._fetch_flight_operation_route, cache=cache, budget_per_minute=budget)
+
+        # First pass: 12 targets (3 routes x 2 directions x today/tomorrow) but only `budget` calls allowed
+        scheduler.run_once()
+        print(f"First pass: {stub.call_count()} upstream call(s) for {len(scheduler.targets)} targets (budget {budget}/min)")
+        within_budget = stub.call_count() <= budget
+
+        # Customers hammer GMP-CJU today; the warm entry answers without upstream latency
+        calls_before = stub.call_count()
+        start = time.perf_counter()
+        for _ in range(200):
+            result = utils.get_flight_operation_info_api(today, "GMP", "CJU")
+        warm_ms = (time.perf_counter() - start) * 1000 / 200
+        print(f"Warm lookups: {warm_ms:.3f} ms each, {stub.call_count() - calls_before} upstream call(s), "
+              f"FetchedAt {result.get('FetchedAt')}")
+
+        # Next pass sees the lookup rate: the busy route gets a shorter interval than an idle one
+        time.sleep(0.5)
+        scheduler.run_once()
+        busy = scheduler.targets[(today, "GMP", "CJU")]
+        idle = scheduler.targets[(today, "NRT", "ICN")]
+        print(f"Interval busy GMP-CJU: {scheduler.interval(busy, today):.0f}s, idle NRT-ICN: {scheduler.interval(idle, today):.0f}s")
+
+        stats = scheduler.stats()
+        stats.update({k: v for k, v in cache.stats().items() if k.startswith("served_age")})
+        print(json.dumps({k: v for k, v in stats.items() if k != "targets"}, indent=4))
+
+        if within_budget and warm_ms < 5 and "FetchedAt" in result and \
+                scheduler.interval(busy, today) < scheduler.interval(idle, today):
+            print("✅ Hot routes served warm, refresh rate follows demand within the request budget.")
+        else:
+            print("❌ Prefetch did not behave as expected.")
+
+def verify_disrupted_route():
+    # An idle hot route (MAX_INTERVAL) with a delay in progress must not be served for the whole interval
+    today = datetime.now().strftime("%Y%m%d")
+    payload = {"FlightInfo": [{"FlightNo": "301", "Departure": "GMP", "Arrival": "CJU", "Status": "지연"},
+                              {"FlightNo": "303", "Departure": "GMP", "Arrival": "CJU", "Status": "출발"}]}
+    cache = flight_cache.FlightOperationCache()
+    scheduler = flight_prefetch.PrefetchScheduler(lambda *args: payload, cache=cache, hot_routes=[("GMP", "CJU")])
+    scheduler.run_once()
+    target = scheduler.targets[(today, "GMP", "CJU")]
+    assert scheduler.interval(target, today) == flight_prefetch.MAX_INTERVAL
+    ttl = cache.entries[(today, "GMP", "CJU", "ko")].expires_at - time.monotonic()
+    next_refresh = target.next_due - time.monotonic()
+    print(f"Disrupted route: servable for {ttl:.0f}s, next refresh in {next_refresh:.0f}s")
+    assert ttl <= flight_cache.TODAY_DISRUPTED_TTL and next_refresh <= flight_prefetch.MIN_INTERVAL, (ttl, next_refresh)
+    print("✅ Prefetched disrupted routes keep the disrupted TTL.")
+
+if __name__ == "__main__":
+    verify_flight_prefetch()
+    verify_disrupted_route()
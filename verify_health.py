@@ -0,0 +1,79 @@
+import fakes
+import flight_cache
+import health
+import http_client
+import utils
+import json
+import time
+
+def verify_health():
+    with fakes.StubUpstream(latency=0.3) as stub:
+        stub.point_utils_at()
+        http_client.reset()
+        flight_cache.flight_operation_cache.clear()
+        utils.get_schedule_store().clear()
+        prober = utils._health_prober = health.HealthProber(utils._health_targets, interval=60)
+
+        # 1. All four upstreams are probed at once: one pass takes one latency, not four
+        start = time.perf_counter()
+        statuses = prober.run_once()
+        pass_ms = (time.perf_counter() - start) * 1000
+        states = ", ".join(f"{name}={status['state']}" for name, status in statuses.items())
+        print(f"Probe pass: {len(statuses)} endpoints in {pass_ms:.0f} ms ({states})")
+        assert len(statuses) == 4 and pass_ms < 4 * 300 * 0.75, pass_ms
+        assert all(s["state"] == health.UP for s in statuses.values()), statuses
+
+        # 2. Reads are instant and the history stays bounded
+        start = time.perf_counter()
+        for _ in range(10000):
+            utils._upstream_down("flight_operation_info")
+        print(f"is_down: {(time.perf_counter() - start) * 100:.2f} us per call")
+        small = health.HealthProber(utils._health_targets, probe=lambda url, timeout: 200, history_size=5)
+        for _ in range(12):
+            small.run_once()
+        assert all(len(h.samples) == 5 for h in small.histories.values())
+        print(f"Status: {json.dumps(prober.status('pnr_detail'), ensure_ascii=False)}")
+
+        # 3. Warm the caches, then take the upstream down: after DOWN_AFTER failed probes it is down
+        today = time.strftime("%Y%m%d")
+        assert "FlightInfo" in utils.get_flight_operation_info_api(today, "GMP", "CJU")
+        assert "error" not in utils.get_flight_schedule_api("GMP", "CJU", today)
+        stub.latency = 0.0
+        stub.error_rate = 1.0
+        for _ in range(health.DOWN_AFTER):
+            prober.run_once()
+        assert prober.is_down("flight_operation_info") and prober.is_down("pnr_detail"), prober.snapshot()
+        # Let the cached entries expire
+        for entry in flight_cache.flight_operation_cache.entries.values():
+            entry.expires_at = 0
+        for day in utils.get_schedule_store().days.values():
+            day.expires_at = 0
+
+        # 4. Tools serve stale data or fail fast without touching the upstream
+        calls = stub.call_count()
+        start = time.perf_counter()
+        stale = utils.get_flight_operation_info_api(today, "GMP", "CJU")
+        schedule = utils.get_flight_schedule_api("GMP", "CJU", today)
+        missing = utils.get_flight_operation_info_api(today, "ICN", "BKK")
+        pnr = utils.get_pnr_detail_api("X3AJUP", "GILDONG", "HONG", "20240206")
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"Stale operation info: Stale={stale.get('Stale')} FetchedAt={stale.get('FetchedAt')}")
+        print(f"Stale schedule: stale={schedule.get('stale')} count={schedule.get('count')}")
+        print(f"Uncached route: {missing}")
+        print(f"PNR: {pnr}")
+        print(f"4 tool calls in {elapsed_ms:.1f} ms, {stub.call_count() - calls} upstream calls")
+        assert stale.get("Stale") and "FlightInfo" in stale and schedule.get("stale") and schedule["count"] > 0
+        assert "error" in missing and "error" in pnr and stub.call_count() == calls and elapsed_ms < 50
+
+        # 5. Recovery: the next good probe lifts the down state
+        stub.error_rate = 0.0
+        prober.run_once()
+        http_client.reset()
+        fresh = utils.get_flight_operation_info_api(today, "GMP", "CJU")
+        assert not prober.is_down("flight_operation_info") and "FlightInfo" in fresh and not fresh.get("Stale")
+        print(f"Cache stats: {json.dumps(utils.get_flight_operation_cache_stats())}")
+        utils._health_prober = None
+        print("✅ Success: health prober verified.")
+
+if __name__ == "__main__":
+    verify_health()
@@ -0,0 +1,125 @@
+import flight_cache
+import utils
+import http_client
+import fakes
+import time
+
+def fresh_route_lookup():
+    """Operation info lookup that reaches the upstream (the route cache would answer repeats)."""
+    flight_cache.flight_operation_cache.clear()
+    return utils.get_flight_operation_info_api("20240206", "GMP", "CJU")
+
+def verify_pooling(stub):
+    http_client.reset()
+    before = stub.call_count()
+    for _ in range(20):
+        fresh_route_lookup()
+    requests_sent = stub.call_count() - before
+    print(f"20 lookups -> {requests_sent} requests over {len(stub.connections)} connection(s)")
+    assert requests_sent == 20, requests_sent
+    assert len(stub.connections) == 1, "New connection per call."
+    print("✅ Connections reused.")
+
+def verify_retry(stub):
+    http_client.reset()
+    before = stub.call_count()
+    stub.fail_next = 2
+    result = fresh_route_lookup()
+    attempts = stub.call_count() - before
+    print(f"2 forced 503s -> {attempts} attempts, FlightInfo present: {'FlightInfo' in result}")
+    assert attempts == 3 and "FlightInfo" in result, (attempts, result)
+
+    before = stub.call_count()
+    stub.fail_next = 1
+    result = utils.send_operation_confirmation_api("20240703", "LJ507", "test@example.com")
+    attempts = stub.call_count() - before
+    print(f"Non-idempotent confirmation attempts on 503: {attempts} (expected 1)")
+    assert attempts == 1, attempts
+    print("✅ Idempotent lookups retried, confirmation sent once.")
+
+def verify_timeout(stub):
+    http_client.reset()
+    http_client.ENDPOINTS["flight_operation_info"]["timeout"] = (1, 0.2)
+    stub.latency = 0.5
+    try:
+        start = time.perf_counter()
+        result = fresh_route_lookup()
+        elapsed = time.perf_counter() - start
+    finally:
+        stub.latency = 0.0
+        http_client.ENDPOINTS["flight_operation_info"]["timeout"] = (3.05, 10)
+    print(f"Slow upstream -> {elapsed:.2f}s, result: {result}")
+    # Every attempt gives up after the 0.2 s read timeout instead of waiting 0.5 s for the answer
+    retries = http_client.ENDPOINTS["flight_operation_info"]["retries"]
+    assert "error" in result, result
+    assert 0.2 <= elapsed < 0.5 * (retries + 1), elapsed
+    print("✅ Read timeout enforced.")
+
+def verify_circuit_breaker(stub):
+    # A 500 is the host answering (e.g. a failed chat turn): it never opens the breaker
+    http_client.reset()
+    stub.fail_status, stub.fail_next = 500, http_client.BREAKER_FAILURE_THRESHOLD * 2
+    try:
+        for _ in range(http_client.BREAKER_FAILURE_THRESHOLD * 2):
+            http_client.post("chat_api", stub.url + fakes.OPERATION_CONFIRMATION_PATH, json={})
+    finally:
+        stub.fail_status, stub.fail_next = 503, 0
+    assert http_client.breaker_states().get(stub.url) == "closed", http_client.breaker_states()
+
+    http_client.reset()
+    stub.error_rate = 1.0
+    try:
+        for _ in range(http_client.BREAKER_FAILURE_THRESHOLD):
+            utils.get_pnr_detail_api("X3AJUP", "GILDONG", "HONG", "20240206")
+        states = http_client.breaker_states()
+        print("Breaker states:", states)
+
+        before = stub.call_count()
+        start = time.perf_counter()
+        result = utils.get_pnr_detail_api("X3AJUP", "GILDONG", "HONG", "20240206")
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        calls = stub.call_count() - before
+    finally:
+        stub.error_rate = 0.0
+    print(f"While open -> {calls} upstream calls in {elapsed_ms:.1f}ms, result: {result}")
+    assert states.get(stub.url) == "open", states
+    assert calls == 0 and "error" in result and elapsed_ms < 50, (calls, elapsed_ms, result)
+    print("✅ Circuit breaker fails fast.")
+
+def verify_half_open_trial(stub):
+    # A trial call that fails with a non-transport error re-opens the breaker for one cooldown only
+    import requests
+
+    http_client.reset()
+    url = stub.url + fakes.PNR_DETAIL_PATH
+    breaker = http_client.get_breaker(url)
+    breaker.cooldown = 0.05
+    breaker.opened_at = time.monotonic() - 1    # cooldown over: the next call is the trial
+    session = http_client.get_session(url)
+    def broken(*args, **kwargs):
+        raise requests.exceptions.ChunkedEncodingError("connection broken mid-body")
+    session.request = broken
+    try:
+        http_client.post("pnr_detail", url, json={})
+    except requests.exceptions.ChunkedEncodingError:
+        pass
+    else:
+        raise AssertionError("the trial error should reach the caller")
+    finally:
+        del session.request
+    time.sleep(0.1)
+    result = http_client.post("pnr_detail", url, json={"searchNumber": "X3AJUP"})
+    print(f"Trial failed with ChunkedEncodingError -> next trial after cooldown: HTTP {result.status_code}, "
+          f"breaker {breaker.state}")
+    assert result.status_code == 200 and breaker.state == "closed", (result.status_code, breaker.state)
+    print("✅ Half-open trial errors never leave the breaker stuck.")
+
+if __name__ == "__main__":
+    with fakes.StubUpstream() as stub:
+        stub.point_utils_at()
+        verify_pooling(stub)
+        verify_retry(stub)
+        verify_timeout(stub)
+        verify_circuit_breaker(stub)
+        verify_half_open_trial(stub)
+    http_client.reset()
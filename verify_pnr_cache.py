@@ -0,0 +1,89 @@
+import chat_engine
+import fakes
+import http_client
+import pnr_cache
+import utils
+import contextvars
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+PNR_PATH = fakes.PNR_DETAIL_PATH
+
+def in_session(cache, *args):
+    """utils.get_pnr_detail_api as a tool call of the session owning `cache`."""
+    context = contextvars.copy_context()
+    context.run(pnr_cache.current.set, cache)
+    return context.run(utils.get_pnr_detail_api, *args)
+
+def verify_pnr_cache():
+    with fakes.StubUpstream(latency=0.05) as stub:
+        stub.point_utils_at()
+        http_client.reset()
+        stub.unknown_pnrs.add("ZZ9ZZ9")
+        session_a, session_b = pnr_cache.PnrCache(), pnr_cache.PnrCache()
+
+        # 1. Malformed PNRs, dates and names are refused before any request
+        for args in [("X3AJ", "GILDONG", "HONG", "20240206"), ("X3AJUP!", "GILDONG", "HONG", "20240206"),
+                     ("X3AJUP", "GILDONG", "HONG", "20240231"), ("X3AJUP", "GILDONG", "HONG", "2월 6일"),
+                     ("X3AJUP", "", "HONG", "20240206")]:
+            result = in_session(session_a, *args)
+            print(f"Rejected {args}: {result['error']}")
+            assert "error" in result
+        assert stub.call_count(PNR_PATH) == 0
+
+        # 2. One fetch per booking: typo, correction and the model re-checking are served from the index
+        start = time.perf_counter()
+        first = in_session(session_a, "X3AJUP", "GILDONG", "HONG", "20240206")
+        miss_ms = (time.perf_counter() - start) * 1000
+        typo = in_session(session_a, "X3AJUP", "GILDONG", "HONG", "20240207")
+        wrong_name = in_session(session_a, "X3AJUP", "GILDONG", "KIM", "20240206")
+        start = time.perf_counter()
+        again = in_session(session_a, "x3ajup", "Gil-Dong", "hong", "2024-02-06")
+        hit_ms = (time.perf_counter() - start) * 1000
+        companion = in_session(session_a, "X3AJUP", "CHUNHYANG", "SEONG", "20240206")
+        print(f"Booking: miss {miss_ms:.1f} ms, hit {hit_ms:.2f} ms; typo -> {typo}")
+        assert first["pnrNumber"] == "X3AJUP" and again is first and companion is first
+        assert typo["error"] == wrong_name["error"] == pnr_cache.MISMATCH_ERROR
+        assert stub.call_count(PNR_PATH) == 1, stub.call_count(PNR_PATH)
+
+        # 3. Not found is cached too (shorter TTL)
+        missing = [in_session(session_a, "ZZ9ZZ9", "GILDONG", "HONG", "20240206") for _ in range(3)]
+        print(f"Not found: {missing[0]}")
+        assert missing[0].get("resultCode") == "NOT_FOUND" and stub.call_count(PNR_PATH) == 2
+
+        # 4. Another session never sees session A's bookings, nor does a lookup outside any session
+        in_session(session_b, "X3AJUP", "GILDONG", "HONG", "20240206")
+        assert stub.call_count(PNR_PATH) == 3
+        assert pnr_cache.current.get() is None
+        utils.get_pnr_detail_api("X3AJUP", "GILDONG", "HONG", "20240206")
+        assert stub.call_count(PNR_PATH) == 4
+
+        # 5. Parallel calls in one session share a request; expiry re-fetches
+        session_c = pnr_cache.PnrCache()
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(lambda _: in_session(session_c, "Q1W2E3", "GILDONG", "HONG", "20240206"), range(4)))
+        assert all(r["pnrNumber"] == "Q1W2E3" for r in results) and stub.call_count(PNR_PATH) == 5
+        for booking in session_a.bookings.values():
+            booking.expires_at = 0
+        in_session(session_a, "X3AJUP", "GILDONG", "HONG", "20240206")
+        assert stub.call_count(PNR_PATH) == 6
+        print(f"Session A: {json.dumps(session_a.get_stats())}")
+        print(f"Session C: {json.dumps(session_c.get_stats())}")
+
+        # 6. Through chat turns: the same conversation asks twice, a second conversation fetches its own
+        _, system_instruction = utils.get_system_prefix()
+        model = fakes.FakeGenerativeModel(system_instruction=system_instruction, tools=chat_engine.TOOLS, ttft=0.0,
+                                          chunk_delay=0.0, tool_calls=fakes.realistic_tool_calls)
+        calls = stub.call_count(PNR_PATH)
+        first_session, second_session = chat_engine.new_session(), chat_engine.new_session()
+        for session in (first_session, first_session, second_session):
+            chat_engine.run_turn(session, "예약번호 A1B2C3 HONG/GILDONG 20240206 출발 예약 확인해주세요", model)
+        print(f"Chat turns: {stub.call_count(PNR_PATH) - calls} upstream calls for 3 turns in 2 sessions")
+        assert stub.call_count(PNR_PATH) - calls == 2
+        assert "A1B2C3" in first_session["pnr_cache"].bookings and "A1B2C3" in second_session["pnr_cache"].bookings
+        assert first_session["pnr_cache"].bookings["A1B2C3"] is not second_session["pnr_cache"].bookings["A1B2C3"]
+        print("✅ Success: PNR cache verified.")
+
+if __name__ == "__main__":
+    verify_pnr_cache()
@@ -0,0 +1,85 @@
+import fakes
+import rate_limiter
+import tool_runner
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+API_KEY = "test-key"
+WINDOW = 2.0      # seconds standing in for the one-minute quota period
+RPM = 6
+
+def run_sessions(model, limiter, sessions, continuing=()):
+    """Each session sends one message; returns (outcomes, grant order of session ids)."""
+    order = []
+    def session(i):
+        chat = model.start_chat(history=[])
+        if limiter is not None:
+            priority = rate_limiter.PRIORITY_CONTINUING if i in continuing else rate_limiter.PRIORITY_NEW
+            chat = rate_limiter.LimitedChat(chat, limiter, API_KEY, 100, priority)
+        try:
+            tool_runner.send_message_with_tools(chat, f"질문 {i}", [])
+            order.append(i)
+            return "ok"
+        except fakes.ResourceExhausted:
+            return "quota_exceeded"
+        except rate_limiter.RateLimited:
+            return "rejected"
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        outcomes = list(pool.map(session, range(sessions)))
+    return {k: outcomes.count(k) for k in set(outcomes)}, order
+
+def new_model():
+    return fakes.FakeGenerativeModel(ttft=0.01, chunk_delay=0.0, tool_calls=lambda prompt: [],
+                                     quota=fakes.FakeQuota(rpm=RPM, tpm=100000, window=WINDOW))
+
+def acquire_many(path, n, results):
+    limiter = rate_limiter.RateLimiter(path, rpm=RPM, window=WINDOW, max_wait=60)
+    for _ in range(n):
+        limiter.acquire(API_KEY, 10)
+        results.append(time.time())
+
+def verify_rate_limiter():
+    with tempfile.TemporaryDirectory() as tmp:
+        sessions = 18
+        without, _ = run_sessions(new_model(), None, sessions)
+        print(f"Without limiter: {without}")
+
+        limiter = rate_limiter.RateLimiter(os.path.join(tmp, "rl.db"), rpm=RPM, window=WINDOW, max_wait=30)
+        start = time.perf_counter()
+        with_limiter, _ = run_sessions(new_model(), limiter, sessions)
+        print(f"With limiter: {with_limiter} in {time.perf_counter() - start:.1f}s, stats {json.dumps(limiter.get_stats())}")
+
+        # New (0-5) and continuing (6-11) conversations queue up together
+        limiter = rate_limiter.RateLimiter(os.path.join(tmp, "prio.db"), rpm=RPM, window=WINDOW, max_wait=30)
+        continuing = set(range(6, 12))
+        _, order = run_sessions(new_model(), limiter, 12, continuing)
+        positions = {i: n for n, i in enumerate(order)}
+        continuing_avg = sum(positions[i] for i in continuing) / len(continuing)
+        new_avg = sum(positions[i] for i in positions if i not in continuing) / (len(order) - len(continuing))
+        print(f"Grant order: {order} -> average position continuing {continuing_avg:.1f}, new {new_avg:.1f}")
+
+        # Two processes share one bucket through SQLite: grants in any window stay within RPM
+        path = os.path.join(tmp, "shared.db")
+        with multiprocessing.Manager() as manager:
+            grants = manager.list()
+            procs = [multiprocessing.Process(target=acquire_many, args=(path, 8, grants)) for _ in range(2)]
+            for p in procs:
+                p.start()
+            for p in procs:
+                p.join()
+            times = sorted(grants)
+        worst = max(sum(1 for t in times if s <= t < s + WINDOW) for s in times)
+        print(f"Cross-process: {len(times)} grants, max {worst} in any {WINDOW:.0f}s window (limit {RPM})")
+
+        if without.get("quota_exceeded") and with_limiter == {"ok": sessions} and worst <= RPM \
+                and continuing_avg < new_avg:
+            print("✅ Requests were delayed instead of failing, with priority and a shared cross-process quota.")
+        else:
+            print("❌ Rate limiting did not behave as expected.")
+
+if __name__ == "__main__":
+    verify_rate_limiter()
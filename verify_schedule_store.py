@@ -0,0 +1,79 @@
+import chat_engine
+import fakes
+import http_client
+import schedule_store
+import tool_projection
+import utils
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+def verify_schedule_store():
+    with fakes.StubUpstream(latency=0.2) as stub:
+        stub.point_utils_at()
+        http_client.reset()
+        utils._schedule_store = None
+        path = fakes.FLIGHT_SCHEDULE_PATH
+
+        # 1. Summary matches a brute-force computation over the raw payload
+        raw = fakes.sample_flight_schedule("GMP", "CJU", "20240206")
+        summary = chat_engine.get_flight_schedule("GMP", "CJU", "20240206")
+        print(json.dumps({k: v for k, v in summary.items() if k != "flights"}, ensure_ascii=False))
+        flights = raw["flights"]
+        fastest = min(flights, key=lambda f: (f["duration"], f["departureTime"]))
+        assert summary["count"] == len(flights)
+        assert summary["fastest"]["flightNo"] == fastest["flightNo"]
+        assert summary["earliest"]["departure"].replace(":", "") == min(f["departureTime"] for f in flights)
+        assert summary["latest"]["departure"].replace(":", "") == max(f["departureTime"] for f in flights)
+        departures = [row[1] for row in summary["flights"]["rows"]]
+        assert departures == sorted(departures)
+        raw_size = len(tool_projection.serialize(raw))
+        summary_size = len(tool_projection.serialize(tool_projection.project("get_flight_schedule", {}, summary)))
+        print(f"Tool result: raw {raw_size} chars -> summary {summary_size} chars")
+
+        # 2. Unsorted items, 'HH:MM' times, missing durations and other routes are normalized
+        messy = {"flights": [
+            {"flightNo": "LJ9", "departure": "GMP", "arrival": "CJU", "departureTime": "21:30", "arrivalTime": "22:40"},
+            {"flightNo": "303", "departure": "GMP", "arrival": "CJU", "departureTime": "0615", "arrivalTime": "0720"},
+            {"flightNo": "LJ5", "departure": "ICN", "arrival": "NRT", "departureTime": "0900", "arrivalTime": "1100"},
+            {"flightNo": "LJ7", "departure": "GMP", "arrival": "CJU", "departureTime": "23:50", "arrivalTime": "00:55"},
+        ]}
+        day = schedule_store.ScheduleDay("20240206", "GMP", "CJU", schedule_store.normalize(messy, "GMP", "CJU"), 60)
+        rows = day.summary()["flights"]["rows"]
+        print(f"Normalized: {rows}")
+        assert [row[0] for row in rows] == ["LJ303", "LJ9", "LJ7"] and rows[2][3] == 65
+
+        # 3. 7-day range with 3 days cached: only the 4 missing days are fetched, concurrently
+        start = datetime(2024, 3, 1)
+        for i in (0, 2, 4):
+            utils.get_flight_schedule_api("GMP", "CJU", (start + timedelta(days=i)).strftime("%Y%m%d"))
+        before, stub.peak_in_flight = stub.call_count(path), 0
+        t0 = time.perf_counter()
+        week = chat_engine.get_flight_schedule_range("GMP", "CJU", "20240301", 7)
+        elapsed = time.perf_counter() - t0
+        fetched = stub.call_count(path) - before
+        print(f"Range: {len(week['days'])} days, {week['total_count']} flights, fastest {week['fastest']}, "
+              f"{fetched} upstream calls, peak {stub.peak_in_flight} in flight, {elapsed * 1000:.0f} ms")
+        assert fetched == 4 and stub.peak_in_flight > 1 and elapsed < 4 * 0.2
+        assert [d["date"] for d in week["days"]] == [(start + timedelta(days=i)).strftime("%Y%m%d") for i in range(7)]
+
+        # 4. Concurrent lookups of one uncached day share one upstream request
+        before = stub.call_count(path)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda _: utils.get_flight_schedule_api("ICN", "NRT", "20240310"), range(8)))
+        print(f"8 concurrent lookups -> {stub.call_count(path) - before} upstream call(s)")
+        assert stub.call_count(path) - before == 1
+
+        # 5. Errors are returned to the model, not cached
+        stub.fail_next = 3
+        failed = utils.get_flight_schedule_api("PUS", "CJU", "20240311")
+        assert "error" in failed, failed
+        assert "error" not in utils.get_flight_schedule_api("PUS", "CJU", "20240311")
+        assert "error" in utils.get_flight_schedule_range_api("GMP", "CJU", "20240301", 30)
+
+        print(f"Stats: {utils.get_schedule_cache_stats()}")
+        print("✅ Success: schedule store verified.")
+
+if __name__ == "__main__":
+    verify_schedule_store()
@@ -0,0 +1,42 @@
+import tracing
+import os
+import tempfile
+
+def write_turns(count):
+    for i in range(count):
+        with tracing.start_trace("turn", turn=i):
+            with tracing.span("model_round", round=0):
+                pass
+
+def verify_tracing():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "traces.jsonl")
+        tracing.configure(rate=1.0, path=path)
+        sink = next(sink for sink in tracing._sinks if isinstance(sink, tracing.JsonlSink))
+        sink.max_bytes = 4096
+
+        # 1. One handle for every sampled turn (no reopen on the request path)
+        write_turns(3)
+        handle = sink.file
+        write_turns(3)
+        assert sink.file is handle and len(tracing.load_traces(path)) == 6
+
+        # 2. The file is rotated by size and only TRACE_BACKUPS older files are kept
+        write_turns(500)
+        files = sorted(name for name in os.listdir(tmp))
+        sizes = {name: os.path.getsize(os.path.join(tmp, name)) for name in files}
+        print(f"Trace files after 506 turns: {sizes}")
+        assert files == ["traces.jsonl"] + [f"traces.jsonl.{i}" for i in range(1, tracing.TRACE_BACKUPS + 1)], files
+        assert all(size < sink.max_bytes + 1024 for size in sizes.values()), sizes
+        assert tracing.load_traces(path)[-1]["attrs"]["turn"] == 499
+
+        # 3. A file rotated away by another process is reopened, not written to under its old name
+        os.replace(path, path + ".moved")
+        write_turns(1)
+        assert os.path.exists(path) and len(tracing.load_traces(path)) == 1
+        tracing.configure(rate=tracing.SAMPLE_RATE, path=False)
+        assert sink.file is None
+        print("✅ Success: trace file kept open and rotated by size.")
+
+if __name__ == "__main__":
+    verify_tracing()